@@ -0,0 +1,147 @@
+"""
+End-to-end request deadlines for fan-out endpoints.
+
+A Deadline is created once per request and passed down into every source
+call (SerpAPI, praw, OpenAI/Gemini, Twitter) so their network timeouts never
+outlive the request. SourceTracker runs the sources against that deadline
+and records a per-source status: 'ok', 'timeout' or 'error', plus duration.
+"""
+
+import threading
+import time
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+
+from api.spans import span
+
+
+# Extra time collect() waits past the deadline, so a source that stopped at the
+# deadline can still hand back the partial results it had
+PARTIAL_GRACE_SECONDS = 0.1
+
+
+class PartialResults(Exception):
+    """
+    Raised by a source that failed part-way. ``partial`` is what it had gathered
+    so far, if it has anything to return.
+    """
+
+    def __init__(self, message="", partial=None):
+        super().__init__(message)
+        self.partial = partial
+
+
+class DeadlineExceeded(PartialResults):
+    """Raised by a source that gives up because the request deadline has passed."""
+
+
+class Deadline:
+    def __init__(self, seconds):
+        self.started = time.monotonic()
+        self.expires_at = self.started + seconds
+
+    def remaining(self):
+        """Seconds left before the deadline (never negative)"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+    def timeout(self, cap):
+        """Network timeout for one call: the source's own cap, bounded by the time left"""
+        return max(0.1, min(cap, self.remaining()))
+
+    def check(self, what="request"):
+        """Raise DeadlineExceeded if the deadline has passed"""
+        if self.expired:
+            raise DeadlineExceeded(f"Deadline exceeded during {what}")
+
+
+def timeout_for(deadline, cap):
+    """Network timeout for a call that may or may not have a deadline"""
+    return deadline.timeout(cap) if deadline else cap
+
+
+class SourceTracker:
+    """Runs sources against a Deadline and records their status and duration."""
+
+    def __init__(self, deadline):
+        self.deadline = deadline
+        self.statuses = {}
+        self._started = {}
+        self._lock = threading.Lock()
+
+    def _record(self, name, status, started):
+        """
+        Record a source's status once: whichever comes first of the source
+        finishing (run) and the request giving up on it (collect) wins.
+        """
+        with self._lock:
+            if name in self.statuses:
+                return
+            self.statuses[name] = {
+                'status': status,
+                'start': round(started - self.deadline.started, 3),
+                'duration': round(time.monotonic() - started, 3),
+            }
+
+    def _statuses(self):
+        with self._lock:
+            return dict(self.statuses)
+
+    def run(self, name, fn, *args, **kwargs):
+        """
+        Call fn, recording its status. Exceptions are recorded and re-raised,
+        except a PartialResults carrying results: those are returned (status
+        'timeout' or 'error', so the response is partial and not cached).
+        """
+        started = self._started[name] = time.monotonic()
+        try:
+            with span(name):
+                result = fn(*args, **kwargs)
+        except PartialResults as e:
+            self._record(name, 'timeout' if isinstance(e, DeadlineExceeded) else 'error', started)
+            if e.partial is not None:
+                return e.partial
+            raise
+        except Exception:
+            self._record(name, 'error', started)
+            raise
+        # Sources that swallow their own (deadline-capped) timeouts return nothing
+        # late; results that made it back are ok even if the deadline has since passed
+        self._record(name, 'timeout' if self.deadline.expired and not result else 'ok', started)
+        return result
+
+    def collect(self, name, future, default):
+        """
+        Wait for a future submitted via run() until the deadline. Returns its
+        result, or default if it timed out or failed.
+        """
+        try:
+            return future.result(timeout=self.deadline.remaining() + PARTIAL_GRACE_SECONDS)
+        except FuturesTimeoutError:
+            self._record(name, 'timeout', self._started.get(name, self.deadline.started))
+            print(f"⏱️ Source '{name}' missed the request deadline")
+        except Exception as e:
+            self._record(name, 'error', self._started.get(name, self.deadline.started))
+            print(f"⚠️ Source '{name}' failed: {e}")
+        return default
+
+    @property
+    def complete(self):
+        """True if every tracked source finished ok (safe to cache)"""
+        return all(s['status'] == 'ok' for s in self._statuses().values())
+
+    def summary(self):
+        """Per-source {'status', 'duration'} map for API responses"""
+        return {
+            name: {'status': s['status'], 'duration': s['duration']}
+            for name, s in self._statuses().items()
+        }
+
+    def timings(self):
+        """Per-source {'start', 'duration'} offsets relative to the deadline start"""
+        return {
+            name: {'start': s['start'], 'duration': s['duration']}
+            for name, s in self._statuses().items()
+        }
@@ -0,0 +1,106 @@
+"""
+Process-wide I/O execution layer for fan-out endpoints.
+
+Instead of each request (and each source) creating its own ThreadPoolExecutor,
+all fan-out goes through two long-lived bounded pools:
+
+- the source pool runs per-request source tasks (Reddit, web, Substack,
+  Twitter, summary). These may wait on sub-tasks.
+- the I/O pool runs leaf sub-tasks inside a source (fetching comments,
+  LLM summaries, per-account Twitter searches, RSS feeds). Leaf tasks never
+  wait on other tasks, so the two pools can't starve each other. A leaf that
+  fans out again runs its sub-tasks inline.
+
+host_slot() limits concurrent calls per upstream host across the whole
+process, so a burst of requests can't open dozens of parallel connections
+to one API. Context variables are propagated into pool threads.
+"""
+
+import contextvars
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+SOURCE_WORKERS = int(os.getenv('IO_SOURCE_WORKERS', '16'))
+IO_WORKERS = int(os.getenv('IO_WORKERS', '32'))
+
+# Max concurrent in-flight calls per upstream host (matched by domain suffix)
+HOST_LIMITS = {
+    'serpapi.com': 6,
+    'reddit.com': 4,
+    'api.openai.com': 8,
+    'generativelanguage.googleapis.com': 4,
+    'api.twitter.com': 4,
+}
+DEFAULT_HOST_LIMIT = int(os.getenv('IO_DEFAULT_HOST_LIMIT', '4'))
+
+_source_pool = ThreadPoolExecutor(max_workers=SOURCE_WORKERS, thread_name_prefix='source')
+_io_pool = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix='io')
+
+_host_semaphores = {}
+_host_lock = threading.Lock()
+_leaf = threading.local()
+
+
+def _run_in_context(ctx, fn, args, kwargs, leaf):
+    _leaf.active = leaf
+    try:
+        return ctx.run(fn, *args, **kwargs)
+    finally:
+        _leaf.active = False
+
+
+def _completed(fn, args, kwargs):
+    future = Future()
+    try:
+        future.set_result(fn(*args, **kwargs))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def submit_source(fn, *args, **kwargs):
+    """Submit a per-request source task to the shared source pool"""
+    ctx = contextvars.copy_context()
+    return _source_pool.submit(_run_in_context, ctx, fn, args, kwargs, False)
+
+
+def submit(fn, *args, **kwargs):
+    """
+    Submit a leaf I/O sub-task to the shared I/O pool. Called from inside a
+    leaf task, fn runs inline instead (its Future is already done).
+    """
+    if getattr(_leaf, 'active', False):
+        return _completed(fn, args, kwargs)
+    ctx = contextvars.copy_context()
+    return _io_pool.submit(_run_in_context, ctx, fn, args, kwargs, True)
+
+
+def map_concurrent(fn, items):
+    """Run fn over items as leaf I/O tasks and return results in order (exceptions propagate)"""
+    futures = [submit(fn, item) for item in items]
+    return [future.result() for future in futures]
+
+
+def _host_key(url_or_host):
+    host = urlparse(url_or_host).hostname if '://' in url_or_host else url_or_host
+    host = (host or '').lower()
+    for known in HOST_LIMITS:
+        if host == known or host.endswith('.' + known):
+            return known
+    return host[4:] if host.startswith('www.') else host
+
+
+@contextmanager
+def host_slot(url_or_host):
+    """Hold one of the host's concurrency slots for the duration of a call"""
+    key = _host_key(url_or_host)
+    with _host_lock:
+        semaphore = _host_semaphores.get(key)
+        if semaphore is None:
+            semaphore = threading.BoundedSemaphore(HOST_LIMITS.get(key, DEFAULT_HOST_LIMIT))
+            _host_semaphores[key] = semaphore
+    with semaphore:
+        yield
@@ -0,0 +1,103 @@
+"""
+Write-behind queue for search logging.
+
+Requests enqueue their search log entries (and request span rows) and return
+immediately; a single background thread per SearchLogger drains the queue
+and writes entries in batches (one transaction per batch and kind, see
+SearchLogger.log_searches and log_request_spans_batch). A batch is flushed
+when it reaches SEARCH_LOG_BATCH_SIZE entries or when
+SEARCH_LOG_FLUSH_SECONDS have passed since its first entry, and whatever is
+queued is written on interpreter shutdown.
+"""
+
+import atexit
+import os
+import queue
+import threading
+import time
+
+BATCH_SIZE = int(os.getenv('SEARCH_LOG_BATCH_SIZE', '100'))
+FLUSH_SECONDS = float(os.getenv('SEARCH_LOG_FLUSH_SECONDS', '1.0'))
+QUEUE_MAX = int(os.getenv('SEARCH_LOG_QUEUE_MAX', '10000'))
+
+_STOP = object()
+
+# Entry kind -> name of the SearchLogger method that writes a batch of them
+WRITERS = {
+    'search': 'log_searches',
+    'spans': 'log_request_spans_batch',
+}
+
+
+class SearchLogWriter:
+    def __init__(self, logger, batch_size=BATCH_SIZE, flush_seconds=FLUSH_SECONDS, queue_max=QUEUE_MAX):
+        self.logger = logger
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._queue = queue.Queue(maxsize=queue_max)
+        self._thread = None
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='search-log-writer', daemon=True)
+                self._thread.start()
+
+    def enqueue(self, entry, kind='search'):
+        """
+        Queue one entry (a dict of the keyword arguments of log_search, or of
+        log_request_spans for kind 'spans'). Never blocks.
+        """
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((kind, entry))
+        except queue.Full:
+            print(f"⚠️ Search log queue full, dropping entry for: {str(entry.get('query'))[:50]}")
+
+    def _next_batch(self):
+        """Block for the first entry, then collect until the batch is full or the interval passes"""
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+        batch = [first]
+        flush_at = time.monotonic() + self.flush_seconds
+        while len(batch) < self.batch_size:
+            try:
+                entry = self._queue.get(timeout=max(0, flush_at - time.monotonic()))
+            except queue.Empty:
+                break
+            if entry is _STOP:
+                return batch, True
+            batch.append(entry)
+        return batch, False
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = self._next_batch()
+            by_kind = {}
+            for kind, entry in batch:
+                by_kind.setdefault(kind, []).append(entry)
+            for kind, entries in by_kind.items():
+                try:
+                    getattr(self.logger, WRITERS[kind])(entries)
+                except Exception as e:
+                    print(f"⚠️ Failed to write {len(entries)} {kind} log entries: {e}")
+            # One task_done per entry taken (plus the stop marker) so flush() can join()
+            for _ in range(len(batch) + stopping):
+                self._queue.task_done()
+
+    def flush(self):
+        """Block until every entry queued so far has been written"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def close(self, timeout=10):
+        """Write what is queued and stop the writer thread"""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
@@ -4,7 +4,6 @@ Generates AI-powered meta-analysis of article discourse and converts to audio us
 """
 
 import os
-import base64
 from dotenv import load_dotenv
 from summarize import get_openai_client
 import google.generativeai as genai
@@ -152,7 +151,7 @@ def text_to_speech_openai(text):
         text: The commentary text to convert to audio
     
     Returns:
-        dict with 'audio' (base64 encoded) and 'mime_type', or None on failure
+        dict with 'audio' (raw bytes) and 'mime_type', or None on failure
     """
     try:
         client = get_openai_client()
@@ -172,13 +171,10 @@ def text_to_speech_openai(text):
         
         # Get audio bytes
         audio_data = response.content
-        
-        # Encode to base64
-        audio_base64 = base64.b64encode(audio_data).decode('utf-8')
         print(f"✅ Audio generated: {len(audio_data)} bytes")
         
         return {
-            'audio': audio_base64,
+            'audio': audio_data,
             'mime_type': 'audio/mp3'
         }
         
@@ -198,7 +194,7 @@ def text_to_speech_gemini(text):
         text: The commentary text to convert to audio
     
     Returns:
-        dict with 'audio' (base64 encoded) and 'mime_type', or None on failure
+        dict with 'audio' (raw bytes) and 'mime_type', or None on failure
     """
     # Check if we should use Gemini TTS (opt-in via env var since it's experimental)
     use_gemini_tts = os.getenv("USE_GEMINI_TTS", "").lower() == "true"
@@ -229,12 +225,10 @@ def text_to_speech_gemini(text):
                         if hasattr(part, 'inline_data') and part.inline_data:
                             audio_data = part.inline_data.data
                             mime_type = part.inline_data.mime_type or "audio/mp3"
-                            
-                            audio_base64 = base64.b64encode(audio_data).decode('utf-8')
                             print(f"✅ Gemini audio generated: {len(audio_data)} bytes")
                             
                             return {
-                                'audio': audio_base64,
+                                'audio': audio_data,
                                 'mime_type': mime_type
                             }
             
@@ -264,7 +258,7 @@ def generate_audio_commentary(article, web_results, reddit_results):
         reddit_results: list of reddit discussions
     
     Returns:
-        dict with 'text', 'audio' (base64), 'mime_type'
+        dict with 'text', 'audio' (raw bytes), 'mime_type'
     """
     # Step 1: Generate the text commentary
     commentary_text = generate_meta_commentary(article, web_results, reddit_results)
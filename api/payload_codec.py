@@ -0,0 +1,131 @@
+"""
+Compressed storage format for cached JSON payloads (cached_searches).
+
+A stored payload is a header (format version byte, CRC-32 and length of the
+JSON) followed by the raw-deflate compressed JSON object without its closing
+brace. The deflate data is flushed to a byte boundary, so a cache hit can be
+served without decoding: splice_gzip() wraps the stored bytes in a gzip
+stream, adding a prefix before the object and extra fields (e.g. "stale")
+and a suffix after it, compressing only those few bytes. splice_json() does
+the same uncompressed, for clients that don't accept gzip.
+
+Legacy entries (plain JSON text) are still read by decode() and re-encoded
+on the fly by the splice functions.
+"""
+
+import json
+import struct
+import zlib
+
+FORMAT_V1 = 1
+
+_HEADER = struct.Struct('<BII')  # version, crc32, length of the stored JSON
+_GZIP_HEADER = b'\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff'  # deflate, no mtime, unknown OS
+_CRC_POLY = 0xEDB88320
+
+
+def encode(obj):
+    """Encode a JSON-serializable dict into the stored (compressed) format"""
+    data = json.dumps(obj, separators=(',', ':')).encode()
+    if not data.startswith(b'{'):
+        raise ValueError('cached payloads must be JSON objects')
+    body = data[:-1]  # without the closing brace, so fields can be appended
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+    deflated = compressor.compress(body) + compressor.flush(zlib.Z_FULL_FLUSH)
+    return _HEADER.pack(FORMAT_V1, zlib.crc32(body), len(body)) + deflated
+
+
+def is_encoded(blob):
+    return isinstance(blob, bytes) and blob[:1] == bytes([FORMAT_V1])
+
+
+def _parts(blob):
+    """(crc32, length, raw deflate data) of a stored payload, re-encoding legacy text"""
+    if not is_encoded(blob):
+        blob = encode(json.loads(blob))
+    _, crc, length = _HEADER.unpack_from(blob)
+    return crc, length, blob[_HEADER.size:]
+
+
+def _inflate(deflated):
+    return zlib.decompressobj(-15).decompress(deflated)
+
+
+def decode(blob):
+    """Decode a stored payload (either format) back into a dict"""
+    if not is_encoded(blob):
+        return json.loads(blob)
+    return json.loads(_inflate(blob[_HEADER.size:]) + b'}')
+
+
+def _closing(length, fields, suffix):
+    """Bytes that append fields to the stored object, close it, then add suffix"""
+    extra = ','.join(f'{json.dumps(key)}:{json.dumps(value)}' for key, value in (fields or {}).items())
+    if extra and length > 1:  # length 1 is an empty object: just "{"
+        extra = ',' + extra
+    return extra.encode() + b'}' + suffix
+
+
+def splice_json(blob, fields=None, prefix=b'', suffix=b''):
+    """prefix + stored object with fields appended + suffix, as JSON bytes"""
+    crc, length, deflated = _parts(blob)
+    return prefix + _inflate(deflated) + _closing(length, fields, suffix)
+
+
+def splice_gzip(blob, fields=None, prefix=b'', suffix=b''):
+    """Same bytes as splice_json, as a gzip stream built around the stored deflate data"""
+    crc, length, deflated = _parts(blob)
+    closing = _closing(length, fields, suffix)
+
+    # Each segment is an independent, byte-aligned deflate run; only the last is final
+    head = zlib.compressobj(6, zlib.DEFLATED, -15)
+    head_bytes = head.compress(prefix) + head.flush(zlib.Z_FULL_FLUSH) if prefix else b''
+    tail = zlib.compressobj(6, zlib.DEFLATED, -15)
+    tail_bytes = tail.compress(closing) + tail.flush()
+
+    total_crc = zlib.crc32(closing, crc32_combine(zlib.crc32(prefix), crc, length))
+    size = len(prefix) + length + len(closing)
+    return (_GZIP_HEADER + head_bytes + deflated + tail_bytes
+            + struct.pack('<II', total_crc, size & 0xFFFFFFFF))
+
+
+def _multmodp(a, b):
+    """Multiply a(x) by b(x) modulo the CRC-32 polynomial (reflected bit order)"""
+    m = 1 << 31
+    product = 0
+    while True:
+        if a & m:
+            product ^= b
+            if a & (m - 1) == 0:
+                break
+        m >>= 1
+        b = (b >> 1) ^ _CRC_POLY if b & 1 else b >> 1
+    return product
+
+
+def _x2n_table():
+    """x^(2^k) modulo the CRC-32 polynomial for k = 0..31"""
+    table = [1 << 30]  # x^1
+    for _ in range(31):
+        table.append(_multmodp(table[-1], table[-1]))
+    return table
+
+
+_X2N = _x2n_table()
+
+
+def _x8nmodp(n):
+    """x^(8n) modulo the CRC-32 polynomial: the shift for n bytes of zeros"""
+    result = 1 << 31  # x^0
+    k = 3  # x^(2^3) = x^8, one byte
+    while n:
+        if n & 1:
+            result = _multmodp(_X2N[k & 31], result)
+        n >>= 1
+        k += 1
+    return result
+
+
+def crc32_combine(crc1, crc2, len2):
+    """CRC-32 of A + B from crc32(A), crc32(B) and len(B) (as zlib's crc32_combine)"""
+    return _multmodp(_x8nmodp(len2), crc1) ^ crc2
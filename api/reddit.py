@@ -1,10 +1,17 @@
 import re
+import time
+import contextvars
+import threading
 import praw
+import prawcore
 import os
 import requests
 from bs4 import BeautifulSoup
 from dotenv import load_dotenv
 from summarize import summarize_text
+from api.deadline import DeadlineExceeded, timeout_for
+from api.executor import host_slot, map_concurrent
+from api.spans import record, span
 
 _LLM_REFUSAL_PATTERNS = [
     'as an ai', 'as an llm', 'as a language model', 'i cannot browse',
@@ -31,7 +38,8 @@ def _fetch_top_comments(reddit_client, permalink, limit=3):
         submission_id = permalink.split('/comments/')[1].split('/')[0]
         submission = reddit_client.submission(id=submission_id)
         submission.comment_sort = 'best'
-        submission.comments.replace_more(limit=0)
+        with span('reddit.comments'), host_slot('reddit.com'):
+            submission.comments.replace_more(limit=0)
         comments = []
         for comment in submission.comments[:limit]:
             body = comment.body.strip()
@@ -47,41 +55,120 @@ def _fetch_top_comments(reddit_client, permalink, limit=3):
         print(f"⚠️ Could not fetch comments: {e}")
         return []
 
+def _summarize_post(post, deadline=None):
+    """Set post['summary'] from its selftext, or from its top comments if it has none."""
+    if deadline:
+        deadline.check("Reddit summaries")
+    selftext = post.get('selftext', '').strip()
+    if selftext and len(selftext) > 100:
+        try:
+            print(f"🤖 Generating summary for: {post['title'][:50]}...")
+            cleaned = _clean_text_for_llm(selftext[:2000])
+            summary_task = (
+                "Provide a very brief 2-sentence summary of this Reddit post's main point and sentiment. "
+                "Ignore any [link] placeholders — summarize only the written text."
+            )
+            summary = summarize_text(cleaned, summary_task, deadline=deadline)
+            if _has_llm_refusal(summary):
+                print(f"⚠️ LLM refusal detected, using raw text fallback")
+                summary = selftext[:200] + "..." if len(selftext) > 200 else selftext
+            post['summary'] = summary
+        except Exception as e:
+            print(f"Error generating summary: {e}")
+            post['summary'] = selftext[:200] + "..." if len(selftext) > 200 else selftext
+    elif post.get('top_comments') and len(post['top_comments']) > 0:
+        try:
+            comment_text = ' '.join([c.get('body', '')[:300] for c in post['top_comments'][:3]])
+            if len(comment_text) > 80:
+                cleaned = _clean_text_for_llm(comment_text[:2000])
+                summary = summarize_text(
+                    cleaned,
+                    f"Based on these Reddit comments about '{post['title'][:100]}', provide a brief 2-sentence summary of the key reactions and sentiment.",
+                    deadline=deadline
+                )
+                if _has_llm_refusal(summary):
+                    post['summary'] = ''
+                else:
+                    post['summary'] = summary
+            else:
+                post['summary'] = ''
+        except Exception:
+            post['summary'] = ''
+    else:
+        post['summary'] = ''
+
 load_dotenv()
 
-def search_reddit_posts(query, limit=5, article_title=None):
+# Deadline of the request the calling thread is working for (see _DeadlineRequestor)
+_request_deadline = contextvars.ContextVar('reddit_request_deadline', default=None)
+
+
+class _DeadlineRequestor(prawcore.Requestor):
+    """Caps each Reddit HTTP call by the calling request's deadline, so one client can be shared."""
+
+    def request(self, *args, timeout=None, **kwargs):
+        timeout = timeout_for(_request_deadline.get(), timeout or self.timeout)
+        return super().request(*args, timeout=timeout, **kwargs)
+
+
+_reddit_client = None
+_reddit_client_lock = threading.Lock()
+
+def get_reddit_client():
+    """Get or create the shared read-only Reddit client (None if credentials are missing)"""
+    global _reddit_client
+    if _reddit_client is None:
+        with _reddit_client_lock:
+            if _reddit_client is None:
+                client_id = os.getenv("REDDIT_CLIENT_ID")
+                client_secret = os.getenv("REDDIT_CLIENT_SECRET")
+                user_agent = os.getenv("REDDIT_USER_AGENT")
+                
+                print(f"🔐 Reddit credentials check:")
+                print(f"  - Client ID: {'✓ Present' if client_id else '✗ Missing'}")
+                print(f"  - Client Secret: {'✓ Present' if client_secret else '✗ Missing'}")
+                print(f"  - User Agent: {'✓ Present' if user_agent else '✗ Missing'}")
+                
+                if not all([client_id, client_secret, user_agent]):
+                    print("❌ Missing Reddit API credentials")
+                    return None
+                
+                reddit = praw.Reddit(
+                    client_id=client_id,
+                    client_secret=client_secret,
+                    user_agent=user_agent,
+                    check_for_async=False,
+                    requestor_class=_DeadlineRequestor
+                )
+                reddit.read_only = True
+                _reddit_client = reddit
+    return _reddit_client
+
+def search_reddit_posts(query, limit=5, article_title=None, article_title_future=None, deadline=None):
+    """
+    Search Reddit for discussions of a URL or topic.
+
+    For URL queries, ``article_title_future`` may be a Future that resolves to the
+    article title. Phase 1 (exact URL search) runs immediately and the title is
+    only awaited before the title-dependent phases, so callers can start Reddit
+    before the article page has been fetched.
+
+    If a request ``deadline`` is given, praw and summary timeouts are capped by
+    the time left and DeadlineExceeded is raised once it passes; past the
+    search phases it carries the ranked posts as ``partial``. The praw
+    client is shared across requests (see get_reddit_client).
+    """
+    def check_deadline(stage):
+        if deadline:
+            deadline.check(f"Reddit {stage}")
+    
     try:
-        # Debug: Check if credentials are available
-        client_id = os.getenv("REDDIT_CLIENT_ID")
-        client_secret = os.getenv("REDDIT_CLIENT_SECRET")
-        user_agent = os.getenv("REDDIT_USER_AGENT")
-        
-        print(f"🔐 Reddit credentials check:")
-        print(f"  - Client ID: {'✓ Present' if client_id else '✗ Missing'}")
-        print(f"  - Client Secret: {'✓ Present' if client_secret else '✗ Missing'}")
-        print(f"  - User Agent: {'✓ Present' if user_agent else '✗ Missing'}")
-        
-        if not all([client_id, client_secret, user_agent]):
-            print("❌ Missing Reddit API credentials")
+        reddit = get_reddit_client()
+        if reddit is None:
             return []
         
-        reddit = praw.Reddit(
-            client_id=client_id,
-            client_secret=client_secret,
-            user_agent=user_agent,
-            check_for_async=False
-        )
-        
-        reddit.read_only = True
-        
-        # Test Reddit connection
-        try:
-            # Simple test to verify authentication works
-            test_subreddit = reddit.subreddit("test")
-            print(f"✓ Reddit API connection test successful")
-        except Exception as auth_error:
-            print(f"❌ Reddit API authentication failed: {auth_error}")
-            return []
+        # Scoped to this task's context; copied into the comment/summary sub-tasks
+        _request_deadline.set(deadline)
         
         results = []
         seen_permalinks = set()  # Track post IDs to avoid duplicates
@@ -93,36 +180,19 @@ def search_reddit_posts(query, limit=5, article_title=None):
             # Clean the URL (remove query params and trailing slashes)
             stripped_url = query.split("?")[0].rstrip("/")
             
-            # Extract key topic words early for relevance filtering
-            key_topic_words = []
-            if article_title:
-                # Clean and extract key words from article title
-                clean_title = article_title
-                for suffix in [' | NOEMA', ' - The New York Times', ' | CNN', ' - BBC', ' - The Guardian', '| NYT', '| WSJ', ' | TIME', '| TIME']:
-                    if suffix in clean_title:
-                        clean_title = clean_title.split(suffix)[0].strip()
-                
-                for word in clean_title.split():
-                    clean_word = word.strip('.,!?()[]"\'').lower()
-                    if len(clean_word) >= 4:
-                        # Prioritize proper nouns (names, places) and specific terms
-                        if word[0].isupper() or clean_word.isdigit():
-                            key_topic_words.append(clean_word)
-                        elif len(clean_word) >= 5:
-                            key_topic_words.append(clean_word)
-                
-                print(f"🔑 Key topic words for filtering: {key_topic_words[:10]}")
-            
             # PHASE 1: Search for exact URL matches (specific article discussions)
             print(f"📍 Phase 1: Searching for exact URL matches...")
+            phase_start = time.perf_counter()
             try:
                 # Try exact URL search first
-                url_search = reddit.subreddit("all").search(
-                    f'url:"{stripped_url}"', 
-                    limit=limit * 2,
-                    sort="relevance",
-                    time_filter="year"
-                )
+                # The listing is fetched lazily: read it all while holding a reddit.com slot
+                with host_slot('reddit.com'):
+                    url_search = list(reddit.subreddit("all").search(
+                        f'url:"{stripped_url}"', 
+                        limit=limit * 2,
+                        sort="relevance",
+                        time_filter="year"
+                    ))
                 
                 for post in url_search:
                     try:
@@ -151,6 +221,39 @@ def search_reddit_posts(query, limit=5, article_title=None):
                         
             except Exception as e:
                 print(f"Exact URL search failed: {e}")
+            record('reddit.url_search', phase_start)
+            
+            # Title-dependent phases wait for the article title (if still being fetched)
+            if article_title_future is not None:
+                try:
+                    article_title = article_title_future.result(
+                        timeout=deadline.remaining() if deadline else None
+                    )
+                except Exception as e:
+                    print(f"⚠️ Article title unavailable for Reddit topic search: {e}")
+                    article_title = None
+
+            # Extract key topic words for relevance filtering
+            key_topic_words = []
+            if article_title:
+                # Clean and extract key words from article title
+                clean_title = article_title
+                for suffix in [' | NOEMA', ' - The New York Times', ' | CNN', ' - BBC', ' - The Guardian', '| NYT', '| WSJ', ' | TIME', '| TIME']:
+                    if suffix in clean_title:
+                        clean_title = clean_title.split(suffix)[0].strip()
+                
+                for word in clean_title.split():
+                    clean_word = word.strip('.,!?()[]"\'').lower()
+                    if len(clean_word) >= 4:
+                        # Prioritize proper nouns (names, places) and specific terms
+                        if word[0].isupper() or clean_word.isdigit():
+                            key_topic_words.append(clean_word)
+                        elif len(clean_word) >= 5:
+                            key_topic_words.append(clean_word)
+                
+                print(f"🔑 Key topic words for filtering: {key_topic_words[:10]}")
+            
+            check_deadline("topic search")
             
             # PHASE 2: Search by article title/topic (broader discussions)
             if article_title and len(results) < limit * 2:
@@ -177,14 +280,16 @@ def search_reddit_posts(query, limit=5, article_title=None):
                 
                 print(f"📰 Phase 2: Searching by topic: '{topic_query[:60]}...'")
                 print(f"   (cleaned from: '{article_title[:60]}...')")
+                phase_start = time.perf_counter()
                 try:
                     
-                    topic_search = reddit.subreddit("all").search(
-                        topic_query, 
-                        limit=limit * 5,  # Fetch more to filter
-                        sort="relevance",
-                        time_filter="month"
-                    )
+                    with host_slot('reddit.com'):
+                        topic_search = list(reddit.subreddit("all").search(
+                            topic_query, 
+                            limit=limit * 5,  # Fetch more to filter
+                            sort="relevance",
+                            time_filter="month"
+                        ))
                     
                     for post in topic_search:
                         try:
@@ -237,16 +342,20 @@ def search_reddit_posts(query, limit=5, article_title=None):
                             
                 except Exception as e:
                     print(f"Topic search failed: {e}")
+                record('reddit.topic_search', phase_start)
             
             # PHASE 3: Fallback - search by URL text if still need more results
             if len(results) < limit:
+                check_deadline("URL text search")
                 print(f"🔄 Phase 3: Fallback URL text search...")
+                phase_start = time.perf_counter()
                 try:
-                    text_url_search = reddit.subreddit("all").search(
-                        stripped_url, 
-                        limit=limit * 2,
-                        sort="relevance"
-                    )
+                    with host_slot('reddit.com'):
+                        text_url_search = list(reddit.subreddit("all").search(
+                            stripped_url, 
+                            limit=limit * 2,
+                            sort="relevance"
+                        ))
                     
                     for post in text_url_search:
                         if post.permalink in seen_permalinks:
@@ -276,17 +385,20 @@ def search_reddit_posts(query, limit=5, article_title=None):
                             
                 except Exception as e:
                     print(f"Text URL search failed: {e}")
+                record('reddit.text_search', phase_start)
                     
         else:
             # For non-URL queries, do a regular text search
+            phase_start = time.perf_counter()
             try:
                 # Fetch more than needed since we'll filter out low-engagement posts
-                search_results = reddit.subreddit("all").search(
-                    query, 
-                    limit=limit * 3,  # Fetch 3x to account for filtering
-                    sort="relevance", 
-                    time_filter="month"
-                )
+                with host_slot('reddit.com'):
+                    search_results = list(reddit.subreddit("all").search(
+                        query, 
+                        limit=limit * 3,  # Fetch 3x to account for filtering
+                        sort="relevance", 
+                        time_filter="month"
+                    ))
                 
                 for post in search_results:
                     try:
@@ -319,6 +431,7 @@ def search_reddit_posts(query, limit=5, article_title=None):
 
             except Exception as e:
                 print(f"Reddit search failed: {e}")
+            record('reddit.topic_search', phase_start)
 
         # Sort results by engagement (prioritize URL matches, then by score + comments)
         # URL matches get priority, then sort by engagement score
@@ -336,52 +449,35 @@ def search_reddit_posts(query, limit=5, article_title=None):
         
         top_results = results[:limit]
 
-        # Fetch top comments first so we can use them for summaries if needed
-        for post in top_results:
+        # Fetch top comments first so we can use them for summaries if needed.
+        # Each step runs concurrently across posts on the shared I/O pool.
+        def fetch_comments(post):
             permalink = post.get('permalink', '')
             if permalink:
                 post['top_comments'] = _fetch_top_comments(reddit, permalink, limit=2)
-
-        for post in top_results:
-            selftext = post.get('selftext', '').strip()
-            if selftext and len(selftext) > 100:
-                try:
-                    print(f"🤖 Generating summary for: {post['title'][:50]}...")
-                    cleaned = _clean_text_for_llm(selftext[:2000])
-                    summary_task = (
-                        "Provide a very brief 2-sentence summary of this Reddit post's main point and sentiment. "
-                        "Ignore any [link] placeholders — summarize only the written text."
-                    )
-                    summary = summarize_text(cleaned, summary_task)
-                    if _has_llm_refusal(summary):
-                        print(f"⚠️ LLM refusal detected, using raw text fallback")
-                        summary = selftext[:200] + "..." if len(selftext) > 200 else selftext
-                    post['summary'] = summary
-                except Exception as e:
-                    print(f"Error generating summary: {e}")
-                    post['summary'] = selftext[:200] + "..." if len(selftext) > 200 else selftext
-            elif post.get('top_comments') and len(post['top_comments']) > 0:
-                try:
-                    comment_text = ' '.join([c.get('body', '')[:300] for c in post['top_comments'][:3]])
-                    if len(comment_text) > 80:
-                        cleaned = _clean_text_for_llm(comment_text[:2000])
-                        summary = summarize_text(
-                            cleaned,
-                            f"Based on these Reddit comments about '{post['title'][:100]}', provide a brief 2-sentence summary of the key reactions and sentiment."
-                        )
-                        if _has_llm_refusal(summary):
-                            post['summary'] = ''
-                        else:
-                            post['summary'] = summary
-                    else:
-                        post['summary'] = ''
-                except Exception:
-                    post['summary'] = ''
-            else:
-                post['summary'] = ''
+        
+        def summarize(post):
+            with span('reddit.summary'):
+                _summarize_post(post, deadline)
+        
+        try:
+            check_deadline("comments")
+            map_concurrent(fetch_comments, top_results)
+            check_deadline("summaries")
+            map_concurrent(summarize, top_results)
+        except DeadlineExceeded as e:
+            # The posts are already found and ranked: return them, without the
+            # comments/summaries that didn't make it
+            print(f"⏱️ {e}: returning {len(top_results)} Reddit posts without all summaries")
+            for post in top_results:
+                post.setdefault('top_comments', [])
+                post.setdefault('summary', '')
+            raise DeadlineExceeded(str(e), partial=top_results)
         
         return top_results
 
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"Error initializing Reddit client: {e}")
         print("Please check your Reddit API credentials in the .env file")
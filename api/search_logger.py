@@ -1,20 +1,242 @@
+import base64
 import json
 import hashlib
+import itertools
 import os
-from datetime import datetime
+import random
+import re
+import sys
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
 import sqlite3
 from pathlib import Path
+from api import payload_codec
+from api.log_writer import SearchLogWriter
+from api.url_utils import canonicalize_url
+
+def _hours(env_name, default):
+    return float(os.getenv(env_name, default)) * 3600
+
+# Freshness policy for cached_searches per query type, in seconds. Fresh entries
+# are served as-is; entries in the stale window after that are served flagged
+# stale (callers refresh them in the background); past fresh + stale is a miss.
+SEARCH_CACHE_POLICY = {
+    'url': {
+        'fresh': _hours('SEARCH_CACHE_URL_FRESH_HOURS', 24),
+        'stale': _hours('SEARCH_CACHE_URL_STALE_HOURS', 24 * 13),
+    },
+    'topic': {
+        'fresh': _hours('SEARCH_CACHE_TOPIC_FRESH_HOURS', 6),
+        'stale': _hours('SEARCH_CACHE_TOPIC_STALE_HOURS', 24 * 3),
+    },
+}
+
+# TTL per source for source_cache, in seconds. Each source's raw results are
+# cached by the exact sub-query sent, so refreshing one source (e.g. Reddit)
+# doesn't refetch the others (e.g. paid SerpAPI searches).
+SOURCE_CACHE_TTLS = {
+    'article': _hours('SOURCE_CACHE_ARTICLE_HOURS', 24 * 14),
+    'web': _hours('SOURCE_CACHE_WEB_HOURS', 24 * 3),
+    'substack': _hours('SOURCE_CACHE_SUBSTACK_HOURS', 24 * 3),
+    'reddit': _hours('SOURCE_CACHE_REDDIT_HOURS', 3),
+    'twitter': _hours('SOURCE_CACHE_TWITTER_HOURS', 1),
+}
+
+# Per-connection SQLite tuning. Connections are long-lived (one per thread per
+# SearchLogger), so these are applied once per thread rather than per call.
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', '16384'))
+SQLITE_MMAP_SIZE_MB = int(os.getenv('SQLITE_MMAP_SIZE_MB', '64'))
+
+# Raw provider responses (e.g. full SerpAPI JSON) are kept out of the searches
+# table in raw_payloads: zlib-compressed, deduplicated by content hash. Only a
+# sample of searches keep theirs, and payloads unseen for RETENTION_DAYS are purged.
+RAW_PAYLOAD_SAMPLE_RATE = float(os.getenv('RAW_PAYLOAD_SAMPLE_RATE', '1.0'))
+RAW_PAYLOAD_RETENTION_DAYS = int(os.getenv('RAW_PAYLOAD_RETENTION_DAYS', '30'))
+
+# Retention for the raw searches / search_results rows. Older rows are deleted
+# by maintain_search_history() (their counts live on in the rollups), in batches
+# of MAINTENANCE_BATCH_SIZE searches (one short transaction each).
+SEARCH_HISTORY_RETENTION_DAYS = int(os.getenv('SEARCH_HISTORY_RETENTION_DAYS', '90'))
+MAINTENANCE_BATCH_SIZE = int(os.getenv('MAINTENANCE_BATCH_SIZE', '500'))
+
+# Upper bounds (seconds) of the processing-time histogram buckets in
+# search_analytics_hourly; a search lands in the first bucket it is under
+PROCESSING_TIME_BUCKETS = (0.5, 1, 2, 5, 10, 30)
+LATENCY_BUCKET_LABELS = [f'<{bound:g}s' for bound in PROCESSING_TIME_BUCKETS] + [f'>={PROCESSING_TIME_BUCKETS[-1]:g}s']
+
+def _latency_bucket(seconds):
+    for bound, label in zip(PROCESSING_TIME_BUCKETS, LATENCY_BUCKET_LABELS):
+        if seconds < bound:
+            return label
+    return LATENCY_BUCKET_LABELS[-1]
+
+def _merge_latency_buckets(histograms):
+    """Sum latency_buckets JSON objects into one {bucket: count}, in bucket order"""
+    totals = dict.fromkeys(LATENCY_BUCKET_LABELS, 0)
+    for histogram in histograms:
+        for bucket, count in json.loads(histogram or '{}').items():
+            totals[bucket] = totals.get(bucket, 0) + count
+    return totals
+
+# The same bucketing as a SQL expression over searches.processing_time
+_LATENCY_BUCKET_SQL = 'CASE WHEN processing_time IS NULL THEN NULL ' + ' '.join(
+    f"WHEN processing_time < {bound} THEN '{label}'" for bound, label in zip(PROCESSING_TIME_BUCKETS, LATENCY_BUCKET_LABELS)
+) + f" ELSE '{LATENCY_BUCKET_LABELS[-1]}' END"
+
+# search_fts rowid = source row id * 4 + kind code
+FTS_KINDS = {'search': 0, 'result': 1, 'cached': 2}
+
+# Columns written by iter_export (result columns only with include_results)
+EXPORT_COLUMNS = ['id', 'query', 'search_type', 'timestamp', 'user_ip', 'results_count', 'processing_time']
+EXPORT_RESULT_COLUMNS = ['position', 'title', 'url', 'snippet', 'category', 'subcategory', 'source']
+
+def query_hash(query):
+    """
+    Cache key for a query/URL (shared by the search cache, commentary cache and leases).
+    URLs are canonicalized first so tracking/AMP/www variants share one entry.
+    """
+    return hashlib.md5(canonicalize_url(query).encode()).hexdigest()
+
+def _source_key_hash(sub_query):
+    """
+    source_cache key for a sub-query. Composite keys ('<query>\n<context>', e.g.
+    Reddit's URL + article title) canonicalize only the query line; the rest is
+    hashed as-is, so '?' or '#' in a title isn't parsed as part of the URL.
+    """
+    head, sep, rest = sub_query.partition('\n')
+    return hashlib.md5((canonicalize_url(head) + sep + rest).encode()).hexdigest()
+
+def _legacy_query_hash(query):
+    """Cache key used before canonicalization; still read so existing entries keep hitting"""
+    return hashlib.md5(query.encode()).hexdigest()
+
+def _cached_titles(results):
+    """Titles inside a cached reactions payload (the article's and each source's results)"""
+    titles = [(results.get('article') or {}).get('title')]
+    for value in results.values():
+        if isinstance(value, list):
+            titles.extend(item.get('title') for item in value if isinstance(item, dict))
+    return ' '.join(title for title in titles if isinstance(title, str))
+
+def _fts_match(text):
+    """FTS5 MATCH expression for free text: every word, quoted (no FTS syntax from users)"""
+    words = re.findall(r'\w+', text)
+    return ' '.join(f'"{word}"' for word in words) or None
+
+def query_type(query):
+    """Cache policy type for a query: 'url' for article links, 'topic' for free text"""
+    return 'url' if query.startswith('http') else 'topic'
+
+class _Store:
+    """State shared by every SearchLogger on the same database file in this process"""
+    
+    def __init__(self):
+        self.local = threading.local()  # each thread's connection
+        self.lock = threading.Lock()
+        self.migrated = False
+        self.writer = None
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def _add_column(cursor, table, column):
+    """ALTER TABLE ... ADD COLUMN unless the table already has it (databases from before versioning)"""
+    name = column.split()[0]
+    if name not in {row[1] for row in cursor.execute(f'PRAGMA table_info({table})')}:
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column}')
+
+def _table_exists(cursor, name):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,))
+    return cursor.fetchone() is not None
 
 class SearchLogger:
+    # Schema migrations, applied in order; PRAGMA user_version is the number applied.
+    # Append new ones, never edit or reorder. Each must also cope with databases
+    # created before versioning (user_version 0), which may have any earlier schema.
+    MIGRATIONS = (
+        '_migrate_base_tables',
+        '_migrate_cache_and_tracing_tables',
+        '_migrate_indexes',
+        '_migrate_daily_analytics',
+        '_migrate_raw_payloads',
+        '_migrate_commentary_audio',
+        '_migrate_result_rollups',
+        '_migrate_search_fts',
+        '_migrate_archive_entries',
+        '_migrate_maintenance_runs',
+    )
+    
     def __init__(self, db_path="search_history.db"):
         self.db_path = db_path
-        self.init_database()
+        with _stores_lock:
+            self._store = _stores.setdefault(os.path.abspath(db_path), _Store())
+        self._local = self._store.local
+        # Migrations run once per process and database, not per instance
+        with self._store.lock:
+            if not self._store.migrated:
+                self.init_database()
+                self._store.migrated = True
+    
+    def _open_connection(self):
+        conn = sqlite3.connect(self.db_path, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000)
+        # Only takes effect on a new database (before the first table); existing
+        # files are converted by maintain_search_history(convert=True)
+        conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        # WAL lets readers run alongside the writer; NORMAL is durable in WAL mode
+        # except for the last commits on power loss, which is fine for logs/caches
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}')
+        conn.execute(f'PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}')
+        conn.execute(f'PRAGMA mmap_size={SQLITE_MMAP_SIZE_MB * 1024 * 1024}')
+        return conn
+    
+    @contextmanager
+    def connection(self):
+        """
+        This thread's long-lived connection. Commits when the block exits and
+        rolls back if it raises, so no transaction (or write lock) outlives a call.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._open_connection()
+        with conn:
+            yield conn
+    
+    def close(self):
+        """Close the calling thread's connection (others close when their thread exits)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+    
+    # ==================== SCHEMA ====================
+    
+    def schema_version(self):
+        with self.connection() as conn:
+            return conn.execute('PRAGMA user_version').fetchone()[0]
     
     def init_database(self):
-        """Initialize the SQLite database for search logging"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
+        """
+        Apply pending schema migrations, each in its own write transaction. When
+        the schema is current this is a single read of PRAGMA user_version.
+        """
+        while self.schema_version() < len(self.MIGRATIONS):
+            with self.connection() as conn:
+                conn.execute('BEGIN IMMEDIATE')
+                # Re-read under the write lock: another worker may have just migrated
+                version = conn.execute('PRAGMA user_version').fetchone()[0]
+                if version >= len(self.MIGRATIONS):
+                    break
+                getattr(self, self.MIGRATIONS[version])(conn.cursor())
+                conn.execute(f'PRAGMA user_version = {version + 1}')
+            print(f"🗄️ Migrated {self.db_path} to schema version {version + 1} ({self.MIGRATIONS[version]})")
+    
+    def _migrate_base_tables(self, cursor):
         # Create searches table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS searches (
@@ -46,17 +268,8 @@ class SearchLogger:
                 FOREIGN KEY (search_id) REFERENCES searches (id)
             )
         ''')
-        
-        # Add new columns to existing search_results table if they don't exist
-        try:
-            cursor.execute('ALTER TABLE search_results ADD COLUMN subcategory TEXT')
-        except sqlite3.OperationalError:
-            pass  # Column already exists
-        
-        try:
-            cursor.execute('ALTER TABLE search_results ADD COLUMN source TEXT')
-        except sqlite3.OperationalError:
-            pass  # Column already exists
+        _add_column(cursor, 'search_results', 'subcategory TEXT')
+        _add_column(cursor, 'search_results', 'source TEXT')
         
         # Create search_analytics table for aggregated data
         cursor.execute('''
@@ -99,18 +312,8 @@ class SearchLogger:
                 FOREIGN KEY (collection_id) REFERENCES curated_collections (id)
             )
         ''')
-        
-        # Add recommended column if it doesn't exist (migration for existing databases)
-        try:
-            cursor.execute('ALTER TABLE curated_articles ADD COLUMN recommended INTEGER DEFAULT 0')
-        except sqlite3.OperationalError:
-            pass  # Column already exists
-
-        # Add category_label column (migration for existing databases)
-        try:
-            cursor.execute('ALTER TABLE curated_articles ADD COLUMN category_label TEXT DEFAULT NULL')
-        except sqlite3.OperationalError:
-            pass
+        _add_column(cursor, 'curated_articles', 'recommended INTEGER DEFAULT 0')
+        _add_column(cursor, 'curated_articles', 'category_label TEXT DEFAULT NULL')
         
         # Create cached_commentary table for storing generated audio commentary
         cursor.execute('''
@@ -135,40 +338,309 @@ class SearchLogger:
                 created_at DATETIME DEFAULT CURRENT_TIMESTAMP
             )
         ''')
+    
+    def _migrate_cache_and_tracing_tables(self, cursor):
+        # Create source_cache table for each source's raw results, keyed by the sub-query sent
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS source_cache (
+                source TEXT NOT NULL,
+                key_hash TEXT NOT NULL,
+                sub_query TEXT,
+                query_hash TEXT,
+                results_json TEXT NOT NULL,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (source, key_hash)
+            )
+        ''')
+        
+        # Create request_spans table for per-stage latency of each API request
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS request_spans (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                request_id TEXT NOT NULL,
+                endpoint TEXT NOT NULL,
+                query TEXT,
+                stage TEXT NOT NULL,
+                start_ms REAL,
+                duration_ms REAL NOT NULL,
+                calls INTEGER DEFAULT 1,
+                cached BOOLEAN DEFAULT 0,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # Create search_leases table for coalescing identical in-flight searches across workers
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS search_leases (
+                query_hash TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        ''')
+    
+    def _migrate_indexes(self, cursor):
+        # Indexes for the hot queries. Time filters compare the raw timestamp /
+        # created_at columns (never DATE(column)) so these ranges can be used.
+        for index in (
+            'idx_searches_timestamp ON searches (timestamp)',
+            'idx_searches_type_timestamp ON searches (search_type, timestamp)',
+            'idx_search_results_search_position ON search_results (search_id, position)',
+            'idx_cached_searches_hash_created ON cached_searches (query_hash, created_at)',
+            'idx_cached_searches_created ON cached_searches (created_at)',
+            'idx_source_cache_query_hash ON source_cache (query_hash)',
+            'idx_request_spans_created ON request_spans (created_at)',
+            'idx_curated_articles_collection ON curated_articles (collection_id)',
+            'idx_curated_collections_tag ON curated_collections (tag)',
+        ):
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS {index}')
+    
+    def _migrate_daily_analytics(self, cursor):
+        # Columns for the incremental daily rollup
+        _add_column(cursor, 'search_analytics', 'results_total INTEGER DEFAULT 0')
+        _add_column(cursor, 'search_analytics', 'most_common_count INTEGER DEFAULT 0')
+        
+        # search_analytics used to get a new row per search; collapse duplicates
+        # (keeping the latest per date) before making date unique. The rollups are
+        # recomputed from the raw searches in _migrate_result_rollups.
+        if not _table_exists(cursor, 'idx_search_analytics_date'):
+            cursor.execute('''
+                DELETE FROM search_analytics
+                WHERE id NOT IN (SELECT MAX(id) FROM search_analytics GROUP BY date)
+            ''')
+            cursor.execute('CREATE UNIQUE INDEX idx_search_analytics_date ON search_analytics (date)')
+        
+        # Per-day query counts behind unique_queries and the running top query
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS search_analytics_queries (
+                date DATE NOT NULL,
+                query TEXT NOT NULL,
+                count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (date, query)
+            )
+        ''')
+    
+    def _migrate_raw_payloads(self, cursor):
+        # Reference into raw_payloads (serpapi_response is only set on legacy rows)
+        _add_column(cursor, 'searches', 'payload_hash TEXT')
+        
+        # Create raw_payloads table for compressed, deduplicated provider responses
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS raw_payloads (
+                payload_hash TEXT PRIMARY KEY,
+                payload BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                last_seen_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_raw_payloads_last_seen ON raw_payloads (last_seen_at)')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_searches_legacy_payload ON searches (id)
+            WHERE serpapi_response IS NOT NULL
+        ''')
+    
+    def _migrate_commentary_audio(self, cursor):
+        # Audio is stored as raw bytes in commentary_audio, keyed by content hash;
+        # audio_base64 is only set on legacy rows
+        _add_column(cursor, 'cached_commentary', 'audio_id TEXT')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS commentary_audio (
+                audio_id TEXT PRIMARY KEY,
+                audio BLOB NOT NULL,
+                mime_type TEXT,
+                size INTEGER NOT NULL,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_cached_commentary_audio ON cached_commentary (audio_id)')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_cached_commentary_legacy_audio ON cached_commentary (id)
+            WHERE audio_base64 IS NOT NULL
+        ''')
+    
+    def _migrate_result_rollups(self, cursor):
+        rebuild = not _table_exists(cursor, 'search_analytics_hourly')
+        
+        # Per-day result counts by category / source (get_category_stats,
+        # get_source_distribution), maintained on write like search_analytics
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS search_results_daily (
+                date DATE NOT NULL,
+                dimension TEXT NOT NULL,
+                value TEXT NOT NULL,
+                result_count INTEGER NOT NULL DEFAULT 0,
+                search_count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (date, dimension, value)
+            )
+        ''')
+        
+        # Per-hour counts by search type with a processing-time histogram
+        # (latency_buckets: {bucket label: searches}, see PROCESSING_TIME_BUCKETS)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS search_analytics_hourly (
+                hour TEXT NOT NULL,
+                search_type TEXT NOT NULL,
+                searches INTEGER NOT NULL DEFAULT 0,
+                results_total INTEGER NOT NULL DEFAULT 0,
+                timed_searches INTEGER NOT NULL DEFAULT 0,
+                processing_total REAL NOT NULL DEFAULT 0,
+                latency_buckets TEXT NOT NULL DEFAULT '{}',
+                PRIMARY KEY (hour, search_type)
+            )
+        ''')
+        
+        # Backfill every rollup from the raw searches the first time through
+        if rebuild:
+            self._rebuild_daily_analytics(cursor)
+    
+    def _migrate_search_fts(self, cursor):
+        # Full-text index over search queries, result titles/snippets and the titles
+        # inside cached searches. rowid is the source row's id * 4 + a kind code
+        # (FTS_KINDS), so triggers and the cache write path update it by rowid.
+        rebuild = not _table_exists(cursor, 'search_fts')
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5(
+                text, kind UNINDEXED, ref UNINDEXED, timestamp UNINDEXED,
+                tokenize = 'unicode61 remove_diacritics 2'
+            )
+        ''')
+        for trigger in (
+            '''searches_fts_insert AFTER INSERT ON searches BEGIN
+                INSERT INTO search_fts (rowid, text, kind, ref, timestamp)
+                VALUES (NEW.id * 4, NEW.query, 'search', NEW.id, NEW.timestamp);
+            END''',
+            '''searches_fts_delete AFTER DELETE ON searches BEGIN
+                DELETE FROM search_fts WHERE rowid = OLD.id * 4;
+            END''',
+            '''search_results_fts_insert AFTER INSERT ON search_results BEGIN
+                INSERT INTO search_fts (rowid, text, kind, ref, timestamp)
+                SELECT NEW.id * 4 + 1, COALESCE(NEW.title, '') || ' ' || COALESCE(NEW.snippet, ''),
+                       'result', NEW.search_id, timestamp
+                FROM searches WHERE id = NEW.search_id;
+            END''',
+            '''search_results_fts_delete AFTER DELETE ON search_results BEGIN
+                DELETE FROM search_fts WHERE rowid = OLD.id * 4 + 1;
+            END''',
+            '''cached_searches_fts_delete AFTER DELETE ON cached_searches BEGIN
+                DELETE FROM search_fts WHERE rowid = OLD.id * 4 + 2;
+            END''',
+        ):
+            cursor.execute(f'CREATE TRIGGER IF NOT EXISTS {trigger}')
+        
+        if rebuild:
+            self._rebuild_search_index(cursor)
+    
+    def _migrate_maintenance_runs(self, cursor):
+        # One row per scheduled job: when it last completed, and which worker (if
+        # any) is running it now and until when that claim holds
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS maintenance_runs (
+                job TEXT PRIMARY KEY,
+                last_run_at REAL,
+                owner TEXT,
+                claimed_until REAL
+            )
+        ''')
+    
+    def _migrate_archive_entries(self, cursor):
+        # One denormalized row per URL search for the shared archive, written with
+        # the search. The covering index makes each archive page an index range scan.
+        rebuild = not _table_exists(cursor, 'archive_entries')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS archive_entries (
+                search_id INTEGER PRIMARY KEY,
+                url TEXT NOT NULL,
+                timestamp DATETIME NOT NULL,
+                results_count INTEGER,
+                title TEXT,
+                source TEXT
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_archive_entries_page
+            ON archive_entries (timestamp, search_id, url, results_count, title, source)
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS searches_archive_delete AFTER DELETE ON searches BEGIN
+                DELETE FROM archive_entries WHERE search_id = OLD.id;
+            END
+        ''')
         
-        conn.commit()
-        conn.close()
+        if rebuild:
+            cursor.execute('''
+                INSERT INTO archive_entries (search_id, url, timestamp, results_count, title, source)
+                SELECT s.id, s.query, s.timestamp, s.results_count, sr.title, sr.source
+                FROM searches s
+                LEFT JOIN search_results sr ON sr.id = (
+                    SELECT MIN(id) FROM search_results WHERE search_id = s.id AND position = 1
+                )
+                WHERE s.search_type = 'url'
+            ''')
     
     def log_search(self, query, search_type, user_ip=None, results=None, processing_time=None, search_params=None, serpapi_response=None):
-        """Log a search query and its results"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Insert search record
-        cursor.execute('''
-            INSERT INTO searches (query, search_type, user_ip, results_count, serpapi_response, processing_time, search_params)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            query,
-            search_type,
-            user_ip,
-            len(results) if results else 0,
-            json.dumps(serpapi_response) if serpapi_response else None,
-            processing_time,
-            json.dumps(search_params) if search_params else None
-        ))
-        
-        search_id = cursor.lastrowid
-        
-        # Insert individual results
-        if results:
-            for idx, result in enumerate(results):
+        """Log a search query and its results (synchronously; returns the search id)"""
+        return self.log_searches([{
+            'query': query,
+            'search_type': search_type,
+            'user_ip': user_ip,
+            'results': results,
+            'processing_time': processing_time,
+            'search_params': search_params,
+            'serpapi_response': serpapi_response,
+        }])[0]
+    
+    def log_searches(self, entries):
+        """
+        Log many searches in one transaction. Each entry is a dict of log_search's
+        arguments, plus an optional 'timestamp' (UTC, 'YYYY-MM-DD HH:MM:SS') for
+        entries written after the fact. Returns the search ids in order.
+        """
+        search_ids = []
+        result_rows = []
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            for entry in entries:
+                results = entry.get('results') or []
+                search_params = entry.get('search_params')
+                serpapi_response = entry.get('serpapi_response')
+                payload_hash = None
+                if serpapi_response and random.random() < RAW_PAYLOAD_SAMPLE_RATE:
+                    payload_hash = self._store_raw_payload(cursor, serpapi_response)
+                
+                # Insert search record
                 cursor.execute('''
-                    INSERT INTO search_results (search_id, result_type, title, url, snippet, position, category, subcategory, source)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    INSERT INTO searches (query, search_type, timestamp, user_ip, results_count, payload_hash, processing_time, search_params)
+                    VALUES (?, ?, COALESCE(?, CURRENT_TIMESTAMP), ?, ?, ?, ?, ?)
                 ''', (
+                    entry['query'],
+                    entry['search_type'],
+                    entry.get('timestamp'),
+                    entry.get('user_ip'),
+                    len(results),
+                    payload_hash,
+                    entry.get('processing_time'),
+                    json.dumps(search_params) if search_params else None
+                ))
+                
+                search_id = cursor.lastrowid
+                search_ids.append(search_id)
+                
+                if entry['search_type'] == 'url':
+                    top = results[0] if results else {}
+                    cursor.execute('''
+                        INSERT INTO archive_entries (search_id, url, timestamp, results_count, title, source)
+                        SELECT id, query, timestamp, results_count, ?, ? FROM searches WHERE id = ?
+                    ''', (top.get('title', ''), top.get('source', ''), search_id))
+                
+                timestamp = entry.get('timestamp') or datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+                self._rollup_search(cursor, timestamp, entry['query'], entry['search_type'], results,
+                                    entry.get('processing_time'))
+                
+                result_rows.extend((
                     search_id,
-                    search_type,
+                    entry['search_type'],
                     result.get('title', ''),
                     result.get('url', ''),
                     result.get('summary', result.get('snippet', '')),
@@ -176,100 +648,222 @@ class SearchLogger:
                     result.get('category', 'general'),
                     result.get('subcategory', ''),
                     result.get('source', '')
-                ))
-        
-        conn.commit()
-        conn.close()
-        
-        # Update daily analytics
-        self.update_daily_analytics()
+                ) for idx, result in enumerate(results))
+            
+            # Insert individual results
+            cursor.executemany('''
+                INSERT INTO search_results (search_id, result_type, title, url, snippet, position, category, subcategory, source)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', result_rows)
         
-        return search_id
+        return search_ids
+    
+    def enqueue_search(self, **kwargs):
+        """
+        Queue a search for write-behind logging (see api/log_writer.py) and return
+        immediately. Takes log_search's arguments; the search is timestamped now.
+        """
+        kwargs['timestamp'] = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        self._writer().enqueue(kwargs)
     
-    def update_daily_analytics(self):
-        """Update daily analytics summary"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def _writer(self):
+        """The write-behind writer shared by every SearchLogger on this database"""
+        store = self._store
+        if store.writer is None:
+            with store.lock:
+                if store.writer is None:
+                    store.writer = SearchLogWriter(self)
+        return store.writer
+    
+    def flush_searches(self):
+        """Block until every queued search (and request span) has been written"""
+        if self._store.writer is not None:
+            self._store.writer.flush()
+    
+    def _rollup_search(self, cursor, timestamp, query, search_type, results, processing_time=None):
+        """
+        Add one search to the rollups (constant work per search): its day's
+        search_analytics and query count, its hour's type counts and latency
+        histogram, and its day's result counts by category and source.
+        """
+        day = timestamp[:10]
+        results_count = len(results)
+        cursor.execute('''
+            INSERT INTO search_analytics_queries (date, query, count) VALUES (?, ?, 1)
+            ON CONFLICT(date, query) DO UPDATE SET count = count + 1
+            RETURNING count
+        ''', (day, query))
+        query_count = cursor.fetchone()[0]
         
-        today = datetime.now().date()
+        type_path = f'$."{search_type}"'
+        cursor.execute('''
+            INSERT INTO search_analytics
+            (date, total_searches, unique_queries, results_total, avg_results_count,
+             most_common_query, most_common_count, search_types)
+            VALUES (?, 1, 1, ?, ?, ?, 1, json_object(?, 1))
+            ON CONFLICT(date) DO UPDATE SET
+                total_searches = total_searches + 1,
+                unique_queries = unique_queries + (? = 1),
+                results_total = results_total + excluded.results_total,
+                avg_results_count = (results_total + excluded.results_total) * 1.0 / (total_searches + 1),
+                most_common_query = CASE WHEN ? > most_common_count
+                                         THEN excluded.most_common_query ELSE most_common_query END,
+                most_common_count = MAX(most_common_count, ?),
+                search_types = json_set(COALESCE(search_types, '{}'), ?,
+                                        COALESCE(json_extract(search_types, ?), 0) + 1)
+        ''', (day, results_count, results_count, query, search_type,
+              query_count, query_count, query_count, type_path, type_path))
+        
+        bucket_path = f'$."{_latency_bucket(processing_time)}"' if processing_time is not None else None
+        cursor.execute('''
+            INSERT INTO search_analytics_hourly
+            (hour, search_type, searches, results_total, timed_searches, processing_total, latency_buckets)
+            VALUES (?, ?, 1, ?, ?, ?, CASE WHEN ? IS NULL THEN '{}' ELSE json_set('{}', ?, 1) END)
+            ON CONFLICT(hour, search_type) DO UPDATE SET
+                searches = searches + 1,
+                results_total = results_total + excluded.results_total,
+                timed_searches = timed_searches + excluded.timed_searches,
+                processing_total = processing_total + excluded.processing_total,
+                latency_buckets = CASE WHEN ? IS NULL THEN latency_buckets
+                                       ELSE json_set(latency_buckets, ?, COALESCE(json_extract(latency_buckets, ?), 0) + 1) END
+        ''', (timestamp[:13], search_type, results_count, int(processing_time is not None), processing_time or 0,
+              bucket_path, bucket_path, bucket_path, bucket_path, bucket_path))
+        
+        # Same counting as the raw LEFT JOIN: a search without results counts once as 'general'
+        categories, sources = {}, {}
+        for result in results:
+            category = result.get('category', 'general')
+            category = 'general' if category is None else category
+            categories[category] = categories.get(category, 0) + 1
+            source = result.get('source', '')
+            if source:
+                sources[source] = sources.get(source, 0) + 1
+        cursor.executemany('''
+            INSERT INTO search_results_daily (date, dimension, value, result_count, search_count)
+            VALUES (?, ?, ?, ?, 1)
+            ON CONFLICT(date, dimension, value) DO UPDATE SET
+                result_count = result_count + excluded.result_count,
+                search_count = search_count + 1
+        ''', [(day, 'category', value, count) for value, count in (categories or {'general': 1}).items()]
+              + [(day, 'source', value, count) for value, count in sources.items()])
+    
+    def rebuild_daily_analytics(self):
+        """
+        Recompute the rollups (search_analytics and its per-day query counts, the
+        hourly counts and the per-day category / source counts) from the raw
+        searches. Only days that still have raw searches are recomputed; days
+        already removed by maintain_search_history() keep their rollups.
+        """
+        with self.connection() as conn:
+            return self._rebuild_daily_analytics(conn.cursor())
+    
+    def _rebuild_daily_analytics(self, cursor):
+        cursor.execute('''
+            DELETE FROM search_analytics_queries
+            WHERE date IN (SELECT DISTINCT DATE(timestamp) FROM searches)
+        ''')
+        cursor.execute('''
+            INSERT INTO search_analytics_queries (date, query, count)
+            SELECT DATE(timestamp), query, COUNT(*) FROM searches
+            GROUP BY DATE(timestamp), query
+        ''')
         
-        # Get today's stats
+        # Days with raw searches are replaced; older days (raw data gone) are kept
         cursor.execute('''
-            SELECT 
-                COUNT(*) as total_searches,
-                COUNT(DISTINCT query) as unique_queries,
-                AVG(results_count) as avg_results,
-                query
-            FROM searches 
-            WHERE DATE(timestamp) = ?
-            GROUP BY query
-            ORDER BY COUNT(*) DESC
-            LIMIT 1
-        ''', (today,))
+            INSERT OR REPLACE INTO search_analytics
+            (date, total_searches, unique_queries, results_total, avg_results_count,
+             most_common_query, most_common_count, search_types)
+            SELECT days.date, days.total, days.uniq, days.results_total, days.avg_results,
+                   top.query, top.count, types.search_types
+            FROM (
+                SELECT DATE(timestamp) AS date, COUNT(*) AS total, COUNT(DISTINCT query) AS uniq,
+                       SUM(COALESCE(results_count, 0)) AS results_total,
+                       AVG(COALESCE(results_count, 0)) AS avg_results
+                FROM searches GROUP BY DATE(timestamp)
+            ) days
+            JOIN (
+                SELECT date, json_group_object(search_type, n) AS search_types
+                FROM (SELECT DATE(timestamp) AS date, search_type, COUNT(*) AS n
+                      FROM searches GROUP BY DATE(timestamp), search_type)
+                GROUP BY date
+            ) types USING (date)
+            JOIN (
+                -- bare column with MAX(): the query of the max-count row
+                SELECT date, query, MAX(count) AS count
+                FROM search_analytics_queries GROUP BY date
+            ) top USING (date)
+        ''')
+        days = cursor.rowcount
         
-        stats = cursor.fetchone()
+        cursor.execute('''
+            DELETE FROM search_analytics_hourly
+            WHERE substr(hour, 1, 10) IN (SELECT DISTINCT DATE(timestamp) FROM searches)
+        ''')
+        cursor.execute(f'''
+            INSERT INTO search_analytics_hourly
+            (hour, search_type, searches, results_total, timed_searches, processing_total, latency_buckets)
+            SELECT hour, search_type, SUM(n), SUM(results_total), SUM(timed), SUM(processing_total),
+                   COALESCE(json_group_object(bucket, n) FILTER (WHERE bucket IS NOT NULL), '{{}}')
+            FROM (
+                SELECT strftime('%Y-%m-%d %H', timestamp) AS hour, search_type, {_LATENCY_BUCKET_SQL} AS bucket,
+                       COUNT(*) AS n, SUM(COALESCE(results_count, 0)) AS results_total,
+                       COUNT(processing_time) AS timed, COALESCE(SUM(processing_time), 0) AS processing_total
+                FROM searches
+                GROUP BY 1, 2, 3
+            )
+            GROUP BY hour, search_type
+        ''')
         
-        if stats:
-            total_searches, unique_queries, avg_results, most_common = stats
-            
-            # Get search type distribution
-            cursor.execute('''
-                SELECT search_type, COUNT(*) 
-                FROM searches 
-                WHERE DATE(timestamp) = ?
-                GROUP BY search_type
-            ''', (today,))
-            
-            search_types = dict(cursor.fetchall())
-            
-            # Insert or update analytics
-            cursor.execute('''
-                INSERT OR REPLACE INTO search_analytics 
-                (date, total_searches, unique_queries, avg_results_count, most_common_query, search_types)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (
-                today,
-                total_searches,
-                unique_queries,
-                avg_results or 0,
-                most_common,
-                json.dumps(search_types)
-            ))
-        
-        conn.commit()
-        conn.close()
+        cursor.execute('''
+            DELETE FROM search_results_daily
+            WHERE date IN (SELECT DISTINCT DATE(timestamp) FROM searches)
+        ''')
+        cursor.execute('''
+            INSERT INTO search_results_daily (date, dimension, value, result_count, search_count)
+            SELECT DATE(s.timestamp), 'category', COALESCE(sr.category, 'general'), COUNT(*), COUNT(DISTINCT s.id)
+            FROM searches s
+            LEFT JOIN search_results sr ON sr.search_id = s.id
+            GROUP BY DATE(s.timestamp), COALESCE(sr.category, 'general')
+        ''')
+        cursor.execute('''
+            INSERT INTO search_results_daily (date, dimension, value, result_count, search_count)
+            SELECT DATE(s.timestamp), 'source', sr.source, COUNT(*), COUNT(DISTINCT s.id)
+            FROM searches s
+            JOIN search_results sr ON sr.search_id = s.id
+            WHERE sr.source IS NOT NULL AND sr.source != ''
+            GROUP BY DATE(s.timestamp), sr.source
+        ''')
+        return days
     
     def get_search_history(self, limit=100, search_type=None, date_from=None, date_to=None):
         """Retrieve search history with optional filters"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        query = '''
-            SELECT id, query, search_type, timestamp, user_ip, results_count, processing_time
-            FROM searches
-            WHERE 1=1
-        '''
-        params = []
-        
-        if search_type:
-            query += ' AND search_type = ?'
-            params.append(search_type)
-        
-        if date_from:
-            query += ' AND DATE(timestamp) >= ?'
-            params.append(date_from)
-        
-        if date_to:
-            query += ' AND DATE(timestamp) <= ?'
-            params.append(date_to)
-        
-        query += ' ORDER BY timestamp DESC LIMIT ?'
-        params.append(limit)
-        
-        cursor.execute(query, params)
-        results = cursor.fetchall()
-        
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            query = '''
+                SELECT id, query, search_type, timestamp, user_ip, results_count, processing_time
+                FROM searches
+                WHERE 1=1
+            '''
+            params = []
+            
+            if search_type:
+                query += ' AND search_type = ?'
+                params.append(search_type)
+            
+            if date_from:
+                query += ' AND timestamp >= ?'
+                params.append(date_from)
+            
+            if date_to:
+                query += " AND timestamp < DATE(?, '+1 day')"
+                params.append(date_to)
+            
+            query += ' ORDER BY timestamp DESC LIMIT ?'
+            params.append(limit)
+            
+            cursor.execute(query, params)
+            results = cursor.fetchall()
         
         # Convert to list of dictionaries
         columns = ['id', 'query', 'search_type', 'timestamp', 'user_ip', 'results_count', 'processing_time']
@@ -277,229 +871,704 @@ class SearchLogger:
     
     def get_analytics(self, days=30):
         """Get analytics for the last N days"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        since = f'-{int(days)} days'
         
-        # Daily analytics
-        cursor.execute('''
-            SELECT date, total_searches, unique_queries, avg_results_count, most_common_query, search_types
-            FROM search_analytics
-            WHERE date >= DATE('now', '-{} days')
-            ORDER BY date DESC
-        '''.format(days))
-        
-        daily_analytics = cursor.fetchall()
-        
-        # Overall stats
-        cursor.execute('''
-            SELECT 
-                COUNT(*) as total_searches,
-                COUNT(DISTINCT query) as unique_queries,
-                AVG(results_count) as avg_results,
-                MIN(timestamp) as first_search,
-                MAX(timestamp) as last_search
-            FROM searches
-            WHERE DATE(timestamp) >= DATE('now', '-{} days')
-        '''.format(days))
-        
-        overall_stats = cursor.fetchone()
-        
-        # Top queries
-        cursor.execute('''
-            SELECT query, COUNT(*) as count
-            FROM searches
-            WHERE DATE(timestamp) >= DATE('now', '-{} days')
-            GROUP BY query
-            ORDER BY count DESC
-            LIMIT 10
-        '''.format(days))
-        
-        top_queries = cursor.fetchall()
-        
-        # Search type distribution
-        cursor.execute('''
-            SELECT search_type, COUNT(*) as count
-            FROM searches
-            WHERE DATE(timestamp) >= DATE('now', '-{} days')
-            GROUP BY search_type
-        '''.format(days))
-        
-        search_types = cursor.fetchall()
-        
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            # Daily analytics
+            cursor.execute('''
+                SELECT date, total_searches, unique_queries, avg_results_count, most_common_query, search_types,
+                       results_total
+                FROM search_analytics
+                WHERE date >= DATE('now', ?)
+                ORDER BY date DESC
+            ''', (since,))
+            
+            daily_analytics = cursor.fetchall()
+            
+            # Totals, unique and top queries come from the daily rollups, so they
+            # still cover days whose raw searches were removed by retention
+            cursor.execute('''
+                SELECT COUNT(DISTINCT query) FROM search_analytics_queries
+                WHERE date >= DATE('now', ?)
+            ''', (since,))
+            
+            unique_queries = cursor.fetchone()[0]
+            
+            cursor.execute('''
+                SELECT MIN(timestamp), MAX(timestamp) FROM searches
+                WHERE timestamp >= DATE('now', ?)
+            ''', (since,))
+            
+            first_search, last_search = cursor.fetchone()
+            
+            # Top queries
+            cursor.execute('''
+                SELECT query, SUM(count) as count
+                FROM search_analytics_queries
+                WHERE date >= DATE('now', ?)
+                GROUP BY query
+                ORDER BY count DESC
+                LIMIT 10
+            ''', (since,))
+            
+            top_queries = cursor.fetchall()
+            
+            # Processing time
+            cursor.execute('''
+                SELECT timed_searches, processing_total, latency_buckets
+                FROM search_analytics_hourly
+                WHERE hour >= DATE('now', ?)
+            ''', (since,))
+            
+            hourly = cursor.fetchall()
+        
+        total_searches = sum(row[1] for row in daily_analytics)
+        results_total = sum(row[6] or 0 for row in daily_analytics)
+        search_types = {}
+        for row in daily_analytics:
+            for search_type, count in json.loads(row[5] or '{}').items():
+                search_types[search_type] = search_types.get(search_type, 0) + count
+        # Rollup dates are days, so compare on the day: only an earlier day means
+        # that day's raw searches (and their times) were removed by retention
+        if daily_analytics and (first_search is None or daily_analytics[-1][0] < first_search[:10]):
+            first_search = daily_analytics[-1][0]
+        timed_searches = sum(row[0] for row in hourly)
         
         return {
             'daily_analytics': [dict(zip(['date', 'total_searches', 'unique_queries', 'avg_results', 'most_common_query', 'search_types'], row)) for row in daily_analytics],
-            'overall_stats': dict(zip(['total_searches', 'unique_queries', 'avg_results', 'first_search', 'last_search'], overall_stats)) if overall_stats else {},
+            'overall_stats': {
+                'total_searches': total_searches,
+                'unique_queries': unique_queries,
+                'avg_results': results_total / total_searches if total_searches else None,
+                'first_search': first_search,
+                'last_search': last_search,
+            },
             'top_queries': [dict(zip(['query', 'count'], row)) for row in top_queries],
-            'search_types': [dict(zip(['type', 'count'], row)) for row in search_types]
+            'search_types': [{'type': search_type, 'count': count} for search_type, count in search_types.items()],
+            'processing_time': {
+                'avg_seconds': sum(row[1] for row in hourly) / timed_searches if timed_searches else None,
+                'histogram': _merge_latency_buckets(row[2] for row in hourly),
+            }
         }
     
-    def get_categorized_searches(self, limit=100, days=30):
-        """Get searches with their categorized results"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT 
-                s.id, s.query, s.search_type, s.timestamp, s.results_count,
-                GROUP_CONCAT(
-                    sr.title || '|||' || 
-                    sr.url || '|||' || 
-                    sr.snippet || '|||' || 
-                    COALESCE(sr.category, 'general') || '|||' ||
-                    COALESCE(sr.subcategory, '') || '|||' ||
-                    COALESCE(sr.source, ''), 
-                    ':::'
-                ) as results_data
-            FROM searches s
-            LEFT JOIN search_results sr ON s.id = sr.search_id
-            WHERE DATE(s.timestamp) >= DATE('now', '-{} days')
-            GROUP BY s.id
-            ORDER BY s.timestamp DESC
-            LIMIT ?
-        '''.format(days), (limit,))
-        
-        searches = cursor.fetchall()
-        conn.close()
+    def get_hourly_analytics(self, hours=24):
+        """Per-hour search counts by type and processing-time histogram, oldest first"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT hour, search_type, searches, results_total, timed_searches, processing_total, latency_buckets
+                FROM search_analytics_hourly
+                WHERE hour >= strftime('%Y-%m-%d %H', 'now', ?)
+                ORDER BY hour
+            ''', (f'-{int(hours)} hours',))
+            rows = cursor.fetchall()
+        
+        hourly = []
+        for hour, group in itertools.groupby(rows, key=lambda row: row[0]):
+            group = list(group)
+            searches = sum(row[2] for row in group)
+            timed = sum(row[4] for row in group)
+            hourly.append({
+                'hour': hour,
+                'total_searches': searches,
+                'search_types': {row[1]: row[2] for row in group},
+                'avg_results': sum(row[3] for row in group) / searches if searches else 0,
+                'avg_processing_seconds': sum(row[5] for row in group) / timed if timed else None,
+                'processing_histogram': _merge_latency_buckets(row[6] for row in group),
+            })
+        return hourly
+    
+    def get_categorized_searches(self, limit=100, days=30, before_id=None):
+        """
+        Get searches with their categorized results, newest first. Pages by keyset:
+        pass the last returned id as before_id for the next page.
+        """
+        since = f'-{int(days)} days'
+        
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            # Phase 1: the page of searches. The id lower bound (the window's first
+            # id, found on idx_searches_timestamp) stops the walk down the primary
+            # key at the window's edge instead of scanning every older row. Without
+            # INDEXED BY, SQLite computes that MIN(id) by walking up from the oldest row.
+            cursor.execute('''
+                SELECT id, query, search_type, timestamp, results_count
+                FROM searches
+                WHERE id < ?
+                AND id >= (
+                    SELECT MIN(id) FROM searches INDEXED BY idx_searches_timestamp
+                    WHERE timestamp >= DATE('now', ?)
+                )
+                AND timestamp >= DATE('now', ?)
+                ORDER BY id DESC
+                LIMIT ?
+            ''', (before_id if before_id is not None else sys.maxsize, since, since, limit))
+            
+            searches = cursor.fetchall()
+            if not searches:
+                return []
+            
+            # Phase 2: their results and per-search category counts, by search_id
+            ids = [row[0] for row in searches]
+            placeholders = ','.join('?' * len(ids))
+            cursor.execute(f'''
+                SELECT search_id, title, url, snippet, COALESCE(category, 'general'),
+                       COALESCE(subcategory, ''), COALESCE(source, '')
+                FROM search_results
+                WHERE search_id IN ({placeholders})
+                ORDER BY search_id, position
+            ''', ids)
+            
+            results = {}
+            for search_id, title, url, snippet, category, subcategory, source in cursor.fetchall():
+                results.setdefault(search_id, []).append({
+                    'title': title,
+                    'url': url,
+                    'snippet': snippet,
+                    'category': category,
+                    'subcategory': subcategory,
+                    'source': source
+                })
+            
+            cursor.execute(f'''
+                SELECT search_id, COALESCE(category, 'general') AS category, COUNT(*) AS count
+                FROM search_results
+                WHERE search_id IN ({placeholders})
+                GROUP BY search_id, COALESCE(category, 'general')
+                ORDER BY search_id, count DESC, MIN(position)
+            ''', ids)
+            
+            categories = {}
+            for search_id, category, count in cursor.fetchall():
+                categories.setdefault(search_id, {})[category] = count
         
-        # Process the results
         formatted_searches = []
-        for search in searches:
-            search_id, query, search_type, timestamp, results_count, results_data = search
-            
-            # Parse results data
-            results = []
-            if results_data:
-                for result_str in results_data.split(':::'):
-                    if result_str.strip():
-                        parts = result_str.split('|||')
-                        if len(parts) >= 4:
-                            results.append({
-                                'title': parts[0],
-                                'url': parts[1],
-                                'snippet': parts[2],
-                                'category': parts[3],
-                                'subcategory': parts[4] if len(parts) > 4 else '',
-                                'source': parts[5] if len(parts) > 5 else ''
-                            })
-            
-            # Get category distribution for this search
-            categories = {}
-            for result in results:
-                cat = result['category']
-                categories[cat] = categories.get(cat, 0) + 1
-            
+        for search_id, query, search_type, timestamp, results_count in searches:
+            search_categories = categories.get(search_id, {})
             formatted_searches.append({
                 'id': search_id,
                 'query': query,
                 'search_type': search_type,
                 'timestamp': timestamp,
                 'results_count': results_count,
-                'results': results,
-                'categories': categories,
-                'primary_category': max(categories, key=categories.get) if categories else 'general'
+                'results': results.get(search_id, []),
+                'categories': search_categories,
+                # Counts are ordered by count, so the first category is the most common
+                'primary_category': next(iter(search_categories), 'general')
             })
         
         return formatted_searches
     
     def get_category_stats(self, days=30):
         """Get statistics by category"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT 
-                COALESCE(sr.category, 'general') as category,
-                COUNT(*) as result_count,
-                COUNT(DISTINCT s.id) as search_count
-            FROM searches s
-            LEFT JOIN search_results sr ON s.id = sr.search_id
-            WHERE DATE(s.timestamp) >= DATE('now', '-{} days')
-            GROUP BY COALESCE(sr.category, 'general')
-            ORDER BY result_count DESC
-        '''.format(days))
+        since = f'-{int(days)} days'
         
-        stats = cursor.fetchall()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT value as category, SUM(result_count) as result_count, SUM(search_count) as search_count
+                FROM search_results_daily
+                WHERE date >= DATE('now', ?) AND dimension = 'category'
+                GROUP BY value
+                ORDER BY result_count DESC
+            ''', (since,))
+            
+            stats = cursor.fetchall()
         
         return [dict(zip(['category', 'result_count', 'search_count'], row)) for row in stats]
     
     def get_source_distribution(self, days=30):
         """Get statistics by source"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT 
-                COALESCE(sr.source, 'Unknown') as source,
-                COUNT(*) as result_count,
-                COUNT(DISTINCT s.id) as search_count
-            FROM searches s
-            LEFT JOIN search_results sr ON s.id = sr.search_id
-            WHERE DATE(s.timestamp) >= DATE('now', '-{} days')
-            AND sr.source IS NOT NULL AND sr.source != ''
-            GROUP BY COALESCE(sr.source, 'Unknown')
-            ORDER BY result_count DESC
-        '''.format(days))
+        since = f'-{int(days)} days'
         
-        stats = cursor.fetchall()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT value as source, SUM(result_count) as result_count, SUM(search_count) as search_count
+                FROM search_results_daily
+                WHERE date >= DATE('now', ?) AND dimension = 'source'
+                GROUP BY value
+                ORDER BY result_count DESC
+            ''', (since,))
+            
+            stats = cursor.fetchall()
         
         return [dict(zip(['source', 'result_count', 'search_count'], row)) for row in stats]
     
     def export_data(self, format='json', date_from=None, date_to=None):
-        """Export search data in various formats"""
-        history = self.get_search_history(limit=10000, date_from=date_from, date_to=date_to)
-        
-        if format.lower() == 'json':
-            return json.dumps(history, indent=2, default=str)
-        elif format.lower() == 'csv':
-            if not history:
-                return "No data available"
-            
-            import csv
-            import io
-            
+        """Export search data in various formats, as one string (see iter_export to stream)"""
+        return ''.join(self.iter_export(format, date_from=date_from, date_to=date_to))
+    
+    def iter_search_rows(self, date_from=None, date_to=None, include_results=False, chunk_days=1):
+        """
+        Yield searches (dicts, oldest first) from date_from to date_to inclusive.
+        Each chunk_days window is read with its own query, streamed off the cursor,
+        so memory stays constant and no read snapshot outlives a window. With
+        include_results, each search carries its search_results rows.
+        """
+        with self.connection() as conn:
+            first, last = conn.execute('SELECT MIN(timestamp), MAX(timestamp) FROM searches').fetchone()
+        if first is None:
+            return
+        
+        day = date.fromisoformat(str(date_from or first)[:10])
+        end = date.fromisoformat(str(date_to or last)[:10]) + timedelta(days=1)
+        while day < end:
+            window_end = min(day + timedelta(days=chunk_days), end)
+            window = (day.isoformat(), window_end.isoformat())
+            with self.connection() as conn:
+                if include_results:
+                    cursor = conn.execute('''
+                        SELECT s.id, s.query, s.search_type, s.timestamp, s.user_ip, s.results_count,
+                               s.processing_time, sr.position, sr.title, sr.url, sr.snippet, sr.category,
+                               sr.subcategory, sr.source
+                        FROM searches s
+                        LEFT JOIN search_results sr ON sr.search_id = s.id
+                        WHERE s.timestamp >= ? AND s.timestamp < ?
+                        ORDER BY s.timestamp, s.id, sr.position
+                    ''', window)
+                    # Rows arrive grouped by search, so one search is held at a time
+                    for _, rows in itertools.groupby(cursor, key=lambda row: row[0]):
+                        rows = list(rows)
+                        search = dict(zip(EXPORT_COLUMNS, rows[0][:len(EXPORT_COLUMNS)]))
+                        search['results'] = [
+                            dict(zip(EXPORT_RESULT_COLUMNS, row[len(EXPORT_COLUMNS):]))
+                            for row in rows if row[len(EXPORT_COLUMNS)] is not None
+                        ]
+                        yield search
+                else:
+                    cursor = conn.execute('''
+                        SELECT id, query, search_type, timestamp, user_ip, results_count, processing_time
+                        FROM searches
+                        WHERE timestamp >= ? AND timestamp < ?
+                        ORDER BY timestamp, id
+                    ''', window)
+                    for row in cursor:
+                        yield dict(zip(EXPORT_COLUMNS, row))
+            day = window_end
+    
+    def iter_export(self, format='csv', date_from=None, date_to=None, include_results=False, chunk_days=1):
+        """
+        Stream search data as text chunks: 'csv' (one row per result when
+        include_results), 'jsonl' (one search per line) or 'json' (an array).
+        """
+        import csv
+        import io
+        
+        format = format.lower()
+        if format not in ('csv', 'jsonl', 'json'):
+            raise ValueError("Unsupported format. Use 'csv', 'jsonl' or 'json'")
+        rows = self.iter_search_rows(date_from, date_to, include_results, chunk_days)
+        
+        if format == 'csv':
             output = io.StringIO()
-            writer = csv.DictWriter(output, fieldnames=history[0].keys())
-            writer.writeheader()
-            writer.writerows(history)
-            return output.getvalue()
+            writer = csv.writer(output)
+            writer.writerow(EXPORT_COLUMNS + (['result_' + column for column in EXPORT_RESULT_COLUMNS] if include_results else []))
+            for search in rows:
+                values = [search[column] for column in EXPORT_COLUMNS]
+                if include_results:
+                    for result in search['results'] or [{}]:
+                        writer.writerow(values + [result.get(column) for column in EXPORT_RESULT_COLUMNS])
+                else:
+                    writer.writerow(values)
+                if output.tell() >= 64 * 1024:
+                    yield output.getvalue()
+                    output.seek(0)
+                    output.truncate()
+            yield output.getvalue()
+        elif format == 'jsonl':
+            for search in rows:
+                yield json.dumps(search, default=str) + '\n'
         else:
-            raise ValueError("Unsupported format. Use 'json' or 'csv'")
+            separator = '[\n'
+            for search in rows:
+                yield separator + json.dumps(search, default=str)
+                separator = ',\n'
+            yield '[]\n' if separator == '[\n' else '\n]\n'
     
-    # ==================== CURATED COLLECTIONS ====================
+    # ==================== FULL-TEXT SEARCH ====================
     
-    def create_collection(self, tag, display_name=None, icon=None, description=None):
-        """Create a new curated collection/topic tag"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def rebuild_search_index(self):
+        """Repopulate search_fts from searches, search_results and cached_searches"""
+        with self.connection() as conn:
+            return self._rebuild_search_index(conn.cursor())
+    
+    def _rebuild_search_index(self, cursor):
+        cursor.execute('DELETE FROM search_fts')
+        cursor.execute('''
+            INSERT INTO search_fts (rowid, text, kind, ref, timestamp)
+            SELECT id * 4, query, 'search', id, timestamp FROM searches
+        ''')
+        cursor.execute('''
+            INSERT INTO search_fts (rowid, text, kind, ref, timestamp)
+            SELECT sr.id * 4 + 1, COALESCE(sr.title, '') || ' ' || COALESCE(sr.snippet, ''),
+                   'result', sr.search_id, s.timestamp
+            FROM search_results sr
+            JOIN searches s ON s.id = sr.search_id
+        ''')
         
+        # Cached payloads are compressed, so their titles are extracted here
+        rows = cursor.connection.execute('SELECT id, query, results_json, created_at FROM cached_searches')
+        cursor.executemany('''
+            INSERT INTO search_fts (rowid, text, kind, ref, timestamp) VALUES (?, ?, 'cached', ?, ?)
+        ''', ((row_id * 4 + FTS_KINDS['cached'], _cached_titles(payload_codec.decode(blob)), query, created_at)
+              for row_id, query, blob, created_at in rows))
+        cursor.execute("INSERT INTO search_fts (search_fts) VALUES ('optimize')")
+        cursor.execute('SELECT COUNT(*) FROM search_fts')
+        return cursor.fetchone()[0]
+    
+    def _fts_rowid_bound(self, cursor, before):
+        """
+        A search_fts rowid every entry logged before `before` is under: the highest
+        of each kind's first rowid at or after it (ids grow with time). Entries
+        past it are skipped without being read.
+        """
+        bounds = []
+        for first, last, code in (
+            # INDEXED BY: a bare MIN(id) would walk the primary key up from the oldest row
+            ('''SELECT MIN(id) FROM searches INDEXED BY idx_searches_timestamp
+               WHERE timestamp >= ?''', 'SELECT MAX(id) FROM searches', 'search'),
+            ('''SELECT id FROM search_results WHERE search_id >=
+                   (SELECT MIN(id) FROM searches INDEXED BY idx_searches_timestamp WHERE timestamp >= ?)
+               ORDER BY search_id, position LIMIT 1''', 'SELECT MAX(id) FROM search_results', 'result'),
+            ('''SELECT MIN(id) FROM cached_searches INDEXED BY idx_cached_searches_created
+               WHERE created_at >= ?''', 'SELECT MAX(id) FROM cached_searches', 'cached'),
+        ):
+            row = cursor.execute(first, (before,)).fetchone()
+            if row and row[0] is not None:
+                row_id = row[0]
+            else:
+                # Nothing of this kind at or after `before`: all of it is older
+                row_id = (cursor.execute(last).fetchone()[0] or 0) + 1
+            bounds.append(row_id * 4 + FTS_KINDS[code])
+        return max(bounds)
+    
+    def search_history(self, text, limit=20, before=None):
+        """
+        Full-text search over logged queries, their results' titles/snippets and
+        cached results' titles, latest index entries first. before
+        ('YYYY-MM-DD[ HH:MM:SS]') only matches entries logged earlier. Each hit
+        has its kind ('search', 'result' or 'cached'), search_id (None for
+        cached), query, timestamp and a snippet.
+        """
+        match = _fts_match(text)
+        if not match:
+            return []
+        
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            # Walk the matches down by rowid and stop at the limit, rather than
+            # ranking every match; `before` also becomes a rowid range
+            bound = self._fts_rowid_bound(cursor, before) if before else sys.maxsize
+            cursor.execute('''
+                SELECT kind, ref, timestamp, snippet(search_fts, 0, '[', ']', '…', 12)
+                FROM search_fts
+                WHERE search_fts MATCH ? AND rowid < ? AND (? IS NULL OR timestamp < ?)
+                ORDER BY rowid DESC
+                LIMIT ?
+            ''', (match, bound, before, before, limit))
+            hits = cursor.fetchall()
+            
+            search_ids = {ref for kind, ref, _, _ in hits if kind != 'cached'}
+            queries = {}
+            if search_ids:
+                placeholders = ','.join('?' * len(search_ids))
+                cursor.execute(f'SELECT id, query FROM searches WHERE id IN ({placeholders})', list(search_ids))
+                queries = dict(cursor.fetchall())
+        
+        return [{
+            'kind': kind,
+            'search_id': None if kind == 'cached' else ref,
+            'query': ref if kind == 'cached' else queries.get(ref),
+            'timestamp': timestamp,
+            'snippet': snippet,
+        } for kind, ref, timestamp, snippet in hits]
+    
+    # ==================== RAW PAYLOADS ====================
+    
+    def _store_raw_payload(self, cursor, payload):
+        """Store a provider response compressed, once per distinct content; returns its hash"""
+        data = json.dumps(payload, sort_keys=True, separators=(',', ':')).encode()
+        payload_hash = hashlib.sha256(data).hexdigest()
         cursor.execute('''
-            INSERT INTO curated_collections (tag, tag_display_name, icon, description)
-            VALUES (?, ?, ?, ?)
-        ''', (tag.lower(), display_name or tag.title(), icon, description))
+            INSERT INTO raw_payloads (payload_hash, payload, size) VALUES (?, ?, ?)
+            ON CONFLICT(payload_hash) DO UPDATE SET last_seen_at = CURRENT_TIMESTAMP
+        ''', (payload_hash, zlib.compress(data, 6), len(data)))
+        return payload_hash
+    
+    def get_raw_payload(self, search_id):
+        """The raw provider response logged with a search, or None if not kept / purged"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT p.payload, s.serpapi_response
+                FROM searches s
+                LEFT JOIN raw_payloads p ON p.payload_hash = s.payload_hash
+                WHERE s.id = ?
+            ''', (search_id,))
+            row = cursor.fetchone()
+        
+        if not row:
+            return None
+        if row[0] is not None:
+            return json.loads(zlib.decompress(row[0]))
+        return json.loads(row[1]) if row[1] else None
+    
+    def move_raw_payloads(self, batch_size=500):
+        """
+        Migrate legacy searches.serpapi_response TEXT into raw_payloads, a batch
+        per transaction. Returns the number of rows moved. (VACUUM to reclaim space.)
+        """
+        moved = 0
+        while True:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT id, serpapi_response FROM searches
+                    WHERE serpapi_response IS NOT NULL
+                    LIMIT ?
+                ''', (batch_size,))
+                rows = cursor.fetchall()
+                for search_id, response in rows:
+                    try:
+                        payload_hash = self._store_raw_payload(cursor, json.loads(response))
+                    except ValueError:
+                        payload_hash = None
+                    cursor.execute(
+                        'UPDATE searches SET serpapi_response = NULL, payload_hash = ? WHERE id = ?',
+                        (payload_hash, search_id)
+                    )
+            moved += len(rows)
+            if len(rows) < batch_size:
+                break
+        
+        if moved:
+            print(f"📦 Moved {moved} raw SerpAPI responses into raw_payloads")
+        return moved
+    
+    def purge_raw_payloads(self, days=None):
+        """Delete raw payloads not seen for `days` (default RAW_PAYLOAD_RETENTION_DAYS)"""
+        days = RAW_PAYLOAD_RETENTION_DAYS if days is None else days
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "DELETE FROM raw_payloads WHERE last_seen_at < datetime('now', ?)",
+                (f'-{int(days)} days',)
+            )
+            purged = cursor.rowcount
         
-        collection_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        if purged:
+            print(f"🧹 Purged {purged} raw payloads older than {days} days")
+        return purged
+    
+    # ==================== RETENTION ====================
+    
+    def _database_bytes(self, conn):
+        page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+        page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+        return page_count * page_size
+    
+    def maintain_search_history(self, days=None, batch_size=None, convert=False):
+        """
+        Retention job for searches / search_results and request_spans. Rows older
+        than `days` (default SEARCH_HISTORY_RETENTION_DAYS) are deleted, batch_size
+        searches (or spans) per transaction so the log writer only ever waits for
+        one batch; search counts are already in the rollups (maintained on write,
+        see _rollup_search). Freed
+        pages are then returned to the OS with an incremental vacuum; convert=True
+        first switches a database created without auto_vacuum to incremental mode
+        (a one-time full VACUUM).
+        Returns a report: rows deleted, rows/sec and bytes reclaimed.
+        """
+        days = SEARCH_HISTORY_RETENTION_DAYS if days is None else days
+        batch_size = batch_size or MAINTENANCE_BATCH_SIZE
+        started = time.perf_counter()
+        
+        with self.connection() as conn:
+            cutoff = conn.execute("SELECT DATE('now', ?)", (f'-{int(days)} days',)).fetchone()[0]
+            bytes_before = self._database_bytes(conn)
+            conn.execute('CREATE TEMP TABLE IF NOT EXISTS maintenance_batch (id INTEGER PRIMARY KEY)')
+        
+        searches_deleted = results_deleted = 0
+        while True:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('DELETE FROM temp.maintenance_batch')
+                cursor.execute('''
+                    INSERT INTO temp.maintenance_batch (id)
+                    SELECT id FROM searches WHERE timestamp < ? ORDER BY timestamp LIMIT ?
+                ''', (cutoff, batch_size))
+                batch = cursor.rowcount
+                
+                cursor.execute('DELETE FROM search_results WHERE search_id IN (SELECT id FROM temp.maintenance_batch)')
+                results_deleted += cursor.rowcount
+                cursor.execute('DELETE FROM searches WHERE id IN (SELECT id FROM temp.maintenance_batch)')
+                searches_deleted += cursor.rowcount
+            if batch < batch_size:
+                break
+        
+        spans_deleted = 0
+        while True:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    DELETE FROM request_spans WHERE id IN (
+                        SELECT id FROM request_spans WHERE created_at < ? ORDER BY created_at LIMIT ?
+                    )
+                ''', (cutoff, batch_size))
+                batch = cursor.rowcount
+                spans_deleted += batch
+            if batch < batch_size:
+                break
+        
+        payloads_purged = self.purge_raw_payloads()
+        
+        with self.connection() as conn:
+            auto_vacuum = conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+            if auto_vacuum != 2 and convert:
+                conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+                conn.execute('VACUUM')
+                auto_vacuum = conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+            elif auto_vacuum == 2:
+                # executescript steps the pragma to completion (execute() frees one page)
+                conn.executescript('PRAGMA incremental_vacuum;')
+            conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchall()
+            bytes_after = self._database_bytes(conn)
+        
+        seconds = time.perf_counter() - started
+        rows = searches_deleted + results_deleted + spans_deleted
+        report = {
+            'cutoff': cutoff,
+            'searches_deleted': searches_deleted,
+            'results_deleted': results_deleted,
+            'spans_deleted': spans_deleted,
+            'payloads_purged': payloads_purged,
+            'seconds': seconds,
+            'rows_per_second': rows / seconds if seconds else 0.0,
+            'bytes_before': bytes_before,
+            'bytes_after': bytes_after,
+            'reclaimed_bytes': bytes_before - bytes_after,
+            'incremental_vacuum': auto_vacuum == 2,
+        }
+        
+        print(f"🧹 Search history maintenance: removed {searches_deleted} searches / {results_deleted} results "
+              f"/ {spans_deleted} spans before {cutoff} ({report['rows_per_second']:.0f} rows/s), reclaimed {report['reclaimed_bytes']} bytes")
+        if auto_vacuum != 2:
+            print("⚠️ auto_vacuum is not INCREMENTAL; run scripts/analytics_cli.py maintain --convert once to reclaim space")
+        return report
+    
+    # ==================== REQUEST SPANS ====================
+    
+    def log_request_spans(self, request_id, endpoint, query, stages, total_ms, cached=False):
+        """Persist a request's per-stage durations (Trace.stages()) plus its total"""
+        return self.log_request_spans_batch([{
+            'request_id': request_id, 'endpoint': endpoint, 'query': query,
+            'stages': stages, 'total_ms': total_ms, 'cached': cached,
+        }])
+    
+    def log_request_spans_batch(self, entries):
+        """
+        Persist many requests' spans in one transaction. Each entry is a dict of
+        log_request_spans' arguments, plus an optional 'timestamp' (UTC).
+        """
+        rows = []
+        for entry in entries:
+            head = (entry['request_id'], entry['endpoint'], entry.get('query'))
+            tail = (entry.get('cached', False), entry.get('timestamp'))
+            rows.extend(
+                head + (name, round(stage['start_ms'], 1), round(stage['duration_ms'], 1), stage['calls']) + tail
+                for name, stage in entry['stages'].items()
+            )
+            rows.append(head + ('total', 0.0, round(entry['total_ms'], 1), 1) + tail)
+        
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany('''
+                INSERT INTO request_spans
+                (request_id, endpoint, query, stage, start_ms, duration_ms, calls, cached, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+            ''', rows)
+        
+        return True
+    
+    def enqueue_request_spans(self, **kwargs):
+        """
+        Queue a request's spans for write-behind logging, like enqueue_search.
+        Takes log_request_spans' arguments; the spans are timestamped now.
+        """
+        kwargs['timestamp'] = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        self._writer().enqueue(kwargs, kind='spans')
+    
+    def get_stage_latency(self, days=7, endpoint=None):
+        """
+        Per-stage latency percentiles over the last N days:
+        [{'stage', 'count', 'p50_ms', 'p95_ms', 'max_ms'}], slowest p95 first.
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT stage, duration_ms FROM request_spans
+                WHERE created_at >= datetime('now', ?)
+                AND (? IS NULL OR endpoint = ?)
+                ORDER BY stage, duration_ms
+            ''', (f'-{int(days)} days', endpoint, endpoint))
+            rows = cursor.fetchall()
+        
+        by_stage = {}
+        for stage, duration in rows:
+            by_stage.setdefault(stage, []).append(duration)
+        
+        def percentile(values, pct):
+            # Nearest-rank on the already sorted values
+            index = max(0, -(-len(values) * pct // 100) - 1)
+            return values[int(index)]
+        
+        latency = [
+            {
+                'stage': stage,
+                'count': len(values),
+                'p50_ms': percentile(values, 50),
+                'p95_ms': percentile(values, 95),
+                'max_ms': values[-1],
+            }
+            for stage, values in by_stage.items()
+        ]
+        latency.sort(key=lambda row: row['p95_ms'], reverse=True)
+        return latency
+    
+    # ==================== CURATED COLLECTIONS ====================
+    
+    def create_collection(self, tag, display_name=None, icon=None, description=None):
+        """Create a new curated collection/topic tag"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                INSERT INTO curated_collections (tag, tag_display_name, icon, description)
+                VALUES (?, ?, ?, ?)
+            ''', (tag.lower(), display_name or tag.title(), icon, description))
+            
+            collection_id = cursor.lastrowid
         
         return collection_id
     
     def get_collection_by_tag(self, tag):
         """Get a collection by its tag name"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT id, tag, tag_display_name, icon, description, created_at
-            FROM curated_collections
-            WHERE tag = ?
-        ''', (tag.lower(),))
-        
-        row = cursor.fetchone()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT id, tag, tag_display_name, icon, description, created_at
+                FROM curated_collections
+                WHERE tag = ?
+            ''', (tag.lower(),))
+            
+            row = cursor.fetchone()
         
         if row:
             return {
@@ -514,9 +1583,6 @@ class SearchLogger:
     
     def add_article_to_collection(self, collection_tag, title, url, source=None, authors=None, date=None, summary=None, category_label=None):
         """Add an article to a curated collection"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         # Get or create collection
         collection = self.get_collection_by_tag(collection_tag)
         if not collection:
@@ -525,38 +1591,36 @@ class SearchLogger:
             collection_id = collection['id']
         
         try:
-            cursor.execute('''
-                INSERT OR REPLACE INTO curated_articles 
-                (collection_id, title, url, source, authors, date, summary, category_label)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (collection_id, title, url, source, authors, date, summary, category_label))
-            
-            article_id = cursor.lastrowid
-            conn.commit()
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    INSERT OR REPLACE INTO curated_articles 
+                    (collection_id, title, url, source, authors, date, summary, category_label)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (collection_id, title, url, source, authors, date, summary, category_label))
+                
+                article_id = cursor.lastrowid
         except sqlite3.IntegrityError:
             article_id = None
-        finally:
-            conn.close()
         
         return article_id
     
     def get_all_collections(self):
         """Get all curated collections with article counts"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT 
-                c.id, c.tag, c.tag_display_name, c.icon, c.description, c.created_at,
-                COUNT(a.id) as article_count
-            FROM curated_collections c
-            LEFT JOIN curated_articles a ON c.id = a.collection_id
-            GROUP BY c.id
-            ORDER BY c.tag_display_name
-        ''')
-        
-        rows = cursor.fetchall()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT 
+                    c.id, c.tag, c.tag_display_name, c.icon, c.description, c.created_at,
+                    COUNT(a.id) as article_count
+                FROM curated_collections c
+                LEFT JOIN curated_articles a ON c.id = a.collection_id
+                GROUP BY c.id
+                ORDER BY c.tag_display_name
+            ''')
+            
+            rows = cursor.fetchall()
         
         return [{
             'id': row[0],
@@ -570,22 +1634,21 @@ class SearchLogger:
     
     def get_collection_articles(self, collection_tag):
         """Get all articles in a collection"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT 
-                a.id, a.title, a.url, a.source, a.authors, a.date, a.summary, a.added_at,
-                c.tag, c.tag_display_name, c.icon, COALESCE(a.recommended, 0),
-                a.category_label
-            FROM curated_articles a
-            JOIN curated_collections c ON a.collection_id = c.id
-            WHERE c.tag = ?
-            ORDER BY COALESCE(a.recommended, 0) DESC, a.added_at DESC
-        ''', (collection_tag.lower(),))
-        
-        rows = cursor.fetchall()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT 
+                    a.id, a.title, a.url, a.source, a.authors, a.date, a.summary, a.added_at,
+                    c.tag, c.tag_display_name, c.icon, COALESCE(a.recommended, 0),
+                    a.category_label
+                FROM curated_articles a
+                JOIN curated_collections c ON a.collection_id = c.id
+                WHERE c.tag = ?
+                ORDER BY COALESCE(a.recommended, 0) DESC, a.added_at DESC
+            ''', (collection_tag.lower(),))
+            
+            rows = cursor.fetchall()
         
         return [{
             'id': row[0],
@@ -603,158 +1666,411 @@ class SearchLogger:
             'category_label': row[12]
         } for row in rows]
     
-    def get_shared_archive(self, limit=50):
-        """Get shared search archive for all users"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT DISTINCT
-                s.id, s.query, s.search_type, s.timestamp, s.results_count,
-                sr.title, sr.source
-            FROM searches s
-            LEFT JOIN search_results sr ON s.id = sr.search_id AND sr.position = 1
-            WHERE s.search_type = 'url'
-            ORDER BY s.timestamp DESC
-            LIMIT ?
-        ''', (limit,))
-        
-        rows = cursor.fetchall()
-        conn.close()
+    def get_shared_archive(self, limit=50, before=None):
+        """
+        Get shared search archive for all users, newest first. Pages by keyset:
+        pass the last entry's (timestamp, id) as before for the next page.
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT search_id, url, timestamp, results_count, title, source
+                FROM archive_entries
+                WHERE (timestamp, search_id) < (?, ?)
+                ORDER BY timestamp DESC, search_id DESC
+                LIMIT ?
+            ''', (*(before or ('9999-12-31', sys.maxsize)), limit))
+            
+            rows = cursor.fetchall()
         
         return [{
             'id': row[0],
             'url': row[1],
-            'search_type': row[2],
-            'timestamp': row[3],
-            'results_count': row[4],
-            'title': row[5] or 'Untitled',
-            'source': row[6] or 'Unknown'
+            'search_type': 'url',
+            'timestamp': row[2],
+            'results_count': row[3],
+            'title': row[4] or 'Untitled',
+            'source': row[5] or 'Unknown'
         } for row in rows]
     
     def set_article_recommended(self, article_id, recommended=True):
         """Set or unset the recommended flag on an article"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('UPDATE curated_articles SET recommended = ? WHERE id = ?', (1 if recommended else 0, article_id))
-        conn.commit()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('UPDATE curated_articles SET recommended = ? WHERE id = ?', (1 if recommended else 0, article_id))
         return cursor.rowcount > 0
 
     def remove_article_from_collection(self, article_id):
         """Remove an article from a collection"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('DELETE FROM curated_articles WHERE id = ?', (article_id,))
-        
-        conn.commit()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('DELETE FROM curated_articles WHERE id = ?', (article_id,))
         
         return cursor.rowcount > 0
     
     # ==================== COMMENTARY CACHE ====================
     
     def get_cached_commentary(self, query):
-        """Get cached commentary for a query/URL (cached permanently -- produced artifact)"""
-        query_hash = hashlib.md5(query.encode()).hexdigest()
-        
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT text, audio_base64, mime_type FROM cached_commentary
-            WHERE query_hash = ?
-        ''', (query_hash,))
-        row = cursor.fetchone()
-        conn.close()
+        """
+        Get cached commentary for a query/URL (cached permanently -- produced artifact).
+        Returns text, audio_id and mime_type; the audio itself is read with
+        get_commentary_audio(audio_id).
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT text, audio_id, mime_type FROM cached_commentary
+                WHERE query_hash IN (?, ?)
+                ORDER BY created_at DESC
+                LIMIT 1
+            ''', (query_hash(query), _legacy_query_hash(query)))
+            row = cursor.fetchone()
         
         if row:
-            return {'text': row[0], 'audio': row[1], 'mime_type': row[2]}
+            return {'text': row[0], 'audio_id': row[1], 'mime_type': row[2]}
         return None
     
-    def cache_commentary(self, query, text, audio_base64, mime_type):
-        """Cache commentary for a query/URL"""
-        query_hash = hashlib.md5(query.encode()).hexdigest()
-        
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def _store_commentary_audio(self, cursor, audio, mime_type):
+        """Store audio bytes once per distinct content; returns the audio_id (sha256)"""
+        audio_id = hashlib.sha256(audio).hexdigest()
         cursor.execute('''
-            INSERT OR REPLACE INTO cached_commentary 
-            (query_hash, query, text, audio_base64, mime_type)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (query_hash, query, text, audio_base64, mime_type))
-        conn.commit()
-        conn.close()
+            INSERT OR IGNORE INTO commentary_audio (audio_id, audio, mime_type, size)
+            VALUES (?, ?, ?, ?)
+        ''', (audio_id, audio, mime_type, len(audio)))
+        return audio_id
+    
+    def cache_commentary(self, query, text, audio, mime_type):
+        """Cache commentary (audio as raw bytes) for a query/URL; returns the audio_id"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            audio_id = self._store_commentary_audio(cursor, audio, mime_type)
+            cursor.execute('''
+                INSERT OR REPLACE INTO cached_commentary 
+                (query_hash, query, text, audio_id, mime_type)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (query_hash(query), canonicalize_url(query), text, audio_id, mime_type))
         
-        return True
+        return audio_id
+    
+    def get_commentary_audio(self, audio_id):
+        """(audio bytes, mime_type) for an audio_id, or None"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT audio, mime_type FROM commentary_audio WHERE audio_id = ?', (audio_id,))
+            row = cursor.fetchone()
+        
+        return (row[0], row[1]) if row else None
+    
+    def move_commentary_audio(self):
+        """Migrate legacy base64 audio (cached_commentary.audio_base64) into commentary_audio"""
+        moved = 0
+        while True:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT id, audio_base64, mime_type FROM cached_commentary
+                    WHERE audio_base64 IS NOT NULL
+                    LIMIT 20
+                ''')
+                rows = cursor.fetchall()
+                for row_id, audio_base64, mime_type in rows:
+                    audio_id = self._store_commentary_audio(cursor, base64.b64decode(audio_base64), mime_type)
+                    cursor.execute(
+                        'UPDATE cached_commentary SET audio_base64 = NULL, audio_id = ? WHERE id = ?',
+                        (audio_id, row_id)
+                    )
+            moved += len(rows)
+            if len(rows) < 20:
+                break
+        
+        if moved:
+            print(f"🔊 Moved {moved} cached commentary audio files to commentary_audio")
+        return moved
     
     # ==================== SEARCH RESULTS CACHE ====================
     
-    def get_cached_search(self, query):
-        """Get cached search results for a query/URL (expires after 7 days)"""
-        query_hash = hashlib.md5(query.encode()).hexdigest()
-        
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT results_json FROM cached_searches
-            WHERE query_hash = ? AND created_at > datetime('now', '-7 days')
-        ''', (query_hash,))
-        row = cursor.fetchone()
-        conn.close()
+    def get_cached_search(self, query, newer_than=None):
+        """
+        Get cached search results for a query/URL (stale-while-revalidate).
+        The payload carries a 'stale' flag: False within the fresh window for the
+        query type (see SEARCH_CACHE_POLICY), True within the stale window after it.
+        Older entries are a miss. If newer_than (unix time) is given, only entries
+        cached at or after it count.
+        """
+        cached = self.get_cached_search_encoded(query, newer_than)
+        if cached:
+            blob, stale = cached
+            results = payload_codec.decode(blob)
+            results['stale'] = stale
+            return results
+        return None
+    
+    def get_cached_search_encoded(self, query, newer_than=None):
+        """
+        Like get_cached_search, but returns (stored payload, stale) without decoding,
+        for serving the stored bytes directly (see api/payload_codec.py).
+        """
+        policy = SEARCH_CACHE_POLICY[query_type(query)]
+        hard_limit = policy['fresh'] + policy['stale']
+        since = int(newer_than) if newer_than else None
+        
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT results_json, (julianday('now') - julianday(created_at)) * 86400
+                FROM cached_searches
+                WHERE query_hash IN (?, ?) AND created_at > datetime('now', ?)
+                AND (? IS NULL OR created_at >= datetime(?, 'unixepoch'))
+                ORDER BY created_at DESC
+                LIMIT 1
+            ''', (query_hash(query), _legacy_query_hash(query), f'-{int(hard_limit)} seconds', since, since))
+            row = cursor.fetchone()
         
         if row:
-            return json.loads(row[0])
+            return row[0], row[1] > policy['fresh']
         return None
     
+    def get_cached_searches(self, queries):
+        """
+        Batch form of get_cached_search: one SQL query for many queries/URLs.
+        Returns {query: results} for the queries with a fresh or stale entry.
+        """
+        if not queries:
+            return {}
+        
+        keys = {}
+        for query in queries:
+            keys.setdefault(query_hash(query), []).append(query)
+            keys.setdefault(_legacy_query_hash(query), []).append(query)
+        longest = max(policy['fresh'] + policy['stale'] for policy in SEARCH_CACHE_POLICY.values())
+        
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            placeholders = ','.join('?' * len(keys))
+            cursor.execute(f'''
+                SELECT query_hash, results_json, (julianday('now') - julianday(created_at)) * 86400
+                FROM cached_searches
+                WHERE query_hash IN ({placeholders}) AND created_at > datetime('now', ?)
+                ORDER BY created_at DESC
+            ''', (*keys, f'-{int(longest)} seconds'))
+            rows = cursor.fetchall()
+        
+        found = {}
+        for key, results_json, age in rows:
+            for query in keys[key]:
+                policy = SEARCH_CACHE_POLICY[query_type(query)]
+                # Newest row wins; each query type has its own hard limit
+                if query in found or age > policy['fresh'] + policy['stale']:
+                    continue
+                results = payload_codec.decode(results_json)
+                results['stale'] = age > policy['fresh']
+                found[query] = results
+        return found
+    
     def cache_search(self, query, results):
-        """Cache search results for a query/URL"""
-        query_hash = hashlib.md5(query.encode()).hexdigest()
-        
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT OR REPLACE INTO cached_searches 
-            (query_hash, query, results_json)
-            VALUES (?, ?, ?)
-        ''', (query_hash, query, json.dumps(results)))
-        conn.commit()
-        conn.close()
+        """
+        Cache search results for a query/URL. Stored compressed (payload_codec);
+        results_json holds plain JSON text only in entries from before that.
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            key = query_hash(query)
+            legacy_key = _legacy_query_hash(query)
+            # REPLACE doesn't fire the delete trigger, so drop the old entry's index
+            # row here, and the one of an entry under the pre-canonical key
+            cursor.execute('''
+                DELETE FROM search_fts WHERE rowid IN (
+                    SELECT id * 4 + 2 FROM cached_searches WHERE query_hash IN (?, ?)
+                )
+            ''', (key, legacy_key))
+            if legacy_key != key:
+                # Superseded by this entry; reads take the newest of the two anyway
+                cursor.execute('DELETE FROM cached_searches WHERE query_hash = ?', (legacy_key,))
+            cursor.execute('''
+                INSERT OR REPLACE INTO cached_searches 
+                (query_hash, query, results_json)
+                VALUES (?, ?, ?)
+            ''', (key, canonicalize_url(query), payload_codec.encode(results)))
+            cursor.execute('''
+                INSERT INTO search_fts (rowid, text, kind, ref, timestamp)
+                VALUES (?, ?, 'cached', ?, CURRENT_TIMESTAMP)
+            ''', (cursor.lastrowid * 4 + FTS_KINDS['cached'], _cached_titles(results), canonicalize_url(query)))
         
         return True
     
     def clear_search_cache(self, query):
         """Clear cached search results for a specific query/URL"""
-        query_hash = hashlib.md5(query.encode()).hexdigest()
-        
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        keys = (query_hash(query), _legacy_query_hash(query))
         
-        # Delete from cached_searches
-        cursor.execute('DELETE FROM cached_searches WHERE query_hash = ?', (query_hash,))
-        deleted_searches = cursor.rowcount
-        
-        # Also delete from cached_commentary if exists
-        cursor.execute('DELETE FROM cached_commentary WHERE query_hash = ?', (query_hash,))
-        deleted_commentary = cursor.rowcount
-        
-        conn.commit()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            # Delete from cached_searches
+            cursor.execute('DELETE FROM cached_searches WHERE query_hash IN (?, ?)', keys)
+            deleted_searches = cursor.rowcount
+            
+            # Also delete from cached_commentary if exists (and audio no longer referenced)
+            cursor.execute('DELETE FROM cached_commentary WHERE query_hash IN (?, ?)', keys)
+            deleted_commentary = cursor.rowcount
+            if deleted_commentary:
+                cursor.execute('''
+                    DELETE FROM commentary_audio
+                    WHERE audio_id NOT IN (SELECT audio_id FROM cached_commentary WHERE audio_id IS NOT NULL)
+                ''')
+            
+            # And the per-source results it was assembled from
+            cursor.execute('DELETE FROM source_cache WHERE query_hash IN (?, ?)', keys)
+            deleted_searches += cursor.rowcount
         
         print(f"🗑️ Cleared cache for query: {query[:50]}... (searches: {deleted_searches}, commentary: {deleted_commentary})")
         return deleted_searches + deleted_commentary > 0
     
     def clear_expired_cache(self):
-        """Remove expired search results (commentary is cached permanently)"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("DELETE FROM cached_searches WHERE created_at <= datetime('now', '-7 days')")
-        expired_searches = cursor.rowcount
-        
-        conn.commit()
-        conn.close()
+        """Remove search and per-source results past their limits (commentary is cached permanently)"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            expired_searches = 0
+            for qtype, policy in SEARCH_CACHE_POLICY.items():
+                hard_limit = policy['fresh'] + policy['stale']
+                cursor.execute('''
+                    DELETE FROM cached_searches
+                    WHERE (query LIKE 'http%') = ? AND created_at <= datetime('now', ?)
+                ''', (qtype == 'url', f'-{int(hard_limit)} seconds'))
+                expired_searches += cursor.rowcount
+            
+            for source, ttl in SOURCE_CACHE_TTLS.items():
+                cursor.execute('''
+                    DELETE FROM source_cache
+                    WHERE source = ? AND created_at <= datetime('now', ?)
+                ''', (source, f'-{int(ttl)} seconds'))
+                expired_searches += cursor.rowcount
         
         if expired_searches:
             print(f"🧹 Cleared {expired_searches} expired search cache entries")
-        return expired_searches
\ No newline at end of file
+        return expired_searches
+    
+    # ==================== PER-SOURCE CACHE ====================
+    
+    def get_cached_source(self, source, sub_query):
+        """Get a source's cached results for the exact sub-query sent, if within its TTL"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT results_json FROM source_cache
+                WHERE source = ? AND key_hash = ? AND created_at > datetime('now', ?)
+            ''', (source, _source_key_hash(sub_query), f'-{int(SOURCE_CACHE_TTLS[source])} seconds'))
+            row = cursor.fetchone()
+        
+        return json.loads(row[0]) if row else None
+    
+    def cache_source(self, source, sub_query, results, query=None):
+        """
+        Cache a source's raw results for the exact sub-query sent. query is the
+        user's query/URL it was run for, so clear_search_cache can drop it too.
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT OR REPLACE INTO source_cache
+                (source, key_hash, sub_query, query_hash, results_json, created_at)
+                VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ''', (source, _source_key_hash(sub_query), sub_query,
+                  query_hash(query) if query else None, json.dumps(results)))
+        
+        return True
+    
+    # ==================== IN-FLIGHT LEASES ====================
+    
+    def acquire_search_lease(self, query, owner, ttl=120):
+        """
+        Try to become the worker that runs the search for a query/URL.
+        Returns True if the lease was taken (free or expired), False if another owner holds it.
+        """
+        now = time.time()
+        
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO search_leases (query_hash, owner, expires_at)
+                VALUES (?, ?, ?)
+                ON CONFLICT(query_hash) DO UPDATE SET
+                    owner = excluded.owner,
+                    expires_at = excluded.expires_at
+                WHERE search_leases.expires_at < ?
+            ''', (query_hash(query), owner, now + ttl, now))
+            acquired = cursor.rowcount > 0
+        
+        return acquired
+    
+    def get_search_lease(self, query):
+        """Return the expiry time (unix) of the live lease for a query/URL, or None"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT expires_at FROM search_leases
+                WHERE query_hash = ? AND expires_at >= ?
+            ''', (query_hash(query), time.time()))
+            row = cursor.fetchone()
+        
+        return row[0] if row else None
+    
+    def release_search_lease(self, query, owner):
+        """Release a lease held by owner"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM search_leases WHERE query_hash = ? AND owner = ?', (query_hash(query), owner))
+        
+        return cursor.rowcount > 0
+    
+    # ==================== MAINTENANCE RUNS ====================
+    
+    def claim_maintenance(self, job, owner, interval, ttl=3600):
+        """
+        Try to become the worker that runs a scheduled job. Succeeds when the job
+        last completed more than interval seconds ago (or never) and no other
+        worker's claim is live. The claim lasts ttl seconds unless released.
+        """
+        now = time.time()
+        
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('INSERT OR IGNORE INTO maintenance_runs (job) VALUES (?)', (job,))
+            cursor.execute('''
+                UPDATE maintenance_runs SET owner = ?, claimed_until = ?
+                WHERE job = ?
+                AND COALESCE(last_run_at, 0) <= ?
+                AND COALESCE(claimed_until, 0) < ?
+            ''', (owner, now + ttl, job, now - interval, now))
+            claimed = cursor.rowcount > 0
+        
+        return claimed
+    
+    def release_maintenance(self, job, owner, completed=True):
+        """
+        Release owner's claim on a job, recording it as run now if completed
+        (a failed run leaves last_run_at alone so the next check retries it).
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE maintenance_runs
+                SET owner = NULL, claimed_until = NULL,
+                    last_run_at = CASE WHEN ? THEN ? ELSE last_run_at END
+                WHERE job = ? AND owner = ?
+            ''', (completed, time.time(), job, owner))
+        
+        return cursor.rowcount > 0
+    
+    def get_maintenance_run(self, job):
+        """Return {'last_run_at', 'owner', 'claimed_until'} for a job, or None if it never ran"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                'SELECT last_run_at, owner, claimed_until FROM maintenance_runs WHERE job = ?', (job,)
+            )
+            row = cursor.fetchone()
+        
+        return dict(zip(('last_run_at', 'owner', 'claimed_until'), row)) if row else None
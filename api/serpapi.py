@@ -0,0 +1,85 @@
+"""
+Shared HTTP client for SerpAPI.
+
+All SerpAPI calls go through one requests.Session, so connections to
+serpapi.com are kept alive and reused instead of paying TCP + TLS setup per
+query. The pool holds as many connections as host_slot() lets run at once.
+
+Transient failures (connection errors, timeouts, 429 and 5xx) are retried a
+bounded number of times with jittered exponential backoff, honouring a 429's
+Retry-After. Every attempt's timeout and every backoff sleep fit inside the
+request Deadline; when the time left can't cover another attempt, the last
+error is raised. Errors always propagate to the caller (including SerpAPI's
+own {"error": ...} bodies), so an outage is never mistaken for, and cached
+as, an empty result.
+"""
+
+import os
+import random
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from api.deadline import timeout_for
+from api.executor import HOST_LIMITS, host_slot
+
+SERPAPI_URL = 'https://serpapi.com/search'
+SERPAPI_TIMEOUT_SECONDS = float(os.getenv('SERPAPI_TIMEOUT_SECONDS', '15'))
+SERPAPI_RETRIES = int(os.getenv('SERPAPI_RETRIES', '2'))
+SERPAPI_BACKOFF_SECONDS = float(os.getenv('SERPAPI_BACKOFF_SECONDS', '0.5'))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRY_AFTER_SECONDS = 10
+
+# What SerpAPI puts in "error" when a query simply has no results
+_NO_RESULTS = "hasn't returned any results"
+
+
+class SerpApiError(Exception):
+    """SerpAPI answered, but with an error instead of results."""
+
+
+session = requests.Session()
+session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=HOST_LIMITS['serpapi.com']))
+
+
+def _backoff(attempt, response=None):
+    """Seconds to wait before retry number attempt + 1"""
+    retry_after = response.headers.get('Retry-After') if response is not None else None
+    if retry_after and retry_after.isdigit():
+        return min(int(retry_after), MAX_RETRY_AFTER_SECONDS)
+    # "Full jitter": spreads out retries from workers that failed together
+    return random.uniform(0, SERPAPI_BACKOFF_SECONDS * 2 ** attempt)
+
+
+def search(params, deadline=None):
+    """
+    GET SERPAPI_URL with params and return the decoded JSON. Raises the last
+    requests exception, or SerpApiError, once retries or the deadline run out.
+    """
+    for attempt in range(SERPAPI_RETRIES + 1):
+        if deadline:
+            deadline.check("SerpAPI search")
+        response = None
+        try:
+            with host_slot(SERPAPI_URL):
+                response = session.get(SERPAPI_URL, params=params,
+                                       timeout=timeout_for(deadline, SERPAPI_TIMEOUT_SECONDS))
+            response.raise_for_status()
+            data = response.json()
+        except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+            status = response.status_code if response is not None else None
+            retryable = status is None or status in RETRY_STATUSES
+            delay = _backoff(attempt, response)
+            if not retryable or attempt == SERPAPI_RETRIES or (deadline and delay >= deadline.remaining()):
+                raise
+            print(f"🔁 SerpAPI {status or type(e).__name__}, retrying in {delay:.2f}s "
+                  f"({attempt + 1}/{SERPAPI_RETRIES})")
+            time.sleep(delay)
+            continue
+
+        error = data.get('error')
+        if error and _NO_RESULTS not in error:
+            raise SerpApiError(error)
+        return data
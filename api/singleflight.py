@@ -0,0 +1,132 @@
+"""
+Single-flight coalescing for identical reaction searches.
+
+When many users paste the same URL at once, only one request (the leader)
+runs the expensive pipeline. Followers in the same process wait on the
+leader's result directly; followers in other gunicorn workers see the
+leader's lease row in SQLite and poll the search cache until the leader's
+result lands there.
+"""
+
+import os
+import threading
+import time
+import uuid
+
+from api.search_logger import query_hash
+
+LEASE_TTL = int(os.getenv("SINGLE_FLIGHT_LEASE_SECONDS", "120"))
+POLL_INTERVAL = 0.5
+
+
+class _Call:
+    """An in-flight leader run that same-process followers can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+class SingleFlight:
+    def __init__(self, search_logger, lease_ttl=LEASE_TTL, poll_interval=POLL_INTERVAL):
+        self.logger = search_logger
+        self.lease_ttl = lease_ttl
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def run(self, query, fn, deadline=None):
+        """
+        Run fn() for query unless an identical run is already in flight.
+
+        fn must cache its result via SearchLogger.cache_search before returning
+        (that is how followers in other processes pick it up). Returns
+        (result, led): led is False when the result came from another run.
+        Waiting on another run is bounded by the caller's Deadline, if given:
+        when it passes, DeadlineExceeded is raised rather than running fn
+        outside the lease.
+        """
+        key = query_hash(query)
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+            if leader:
+                break
+
+            print(f"⏳ Waiting on in-flight search for: {query[:50]}...")
+            call.done.wait(deadline.remaining() if deadline else self.lease_ttl)
+            if call.result is not None:
+                return call.result, False
+            if deadline:
+                deadline.check("wait for in-flight search")
+            # The leader failed or timed out - elect a new one (one follower
+            # leads, the rest wait on it) rather than all running fn at once
+
+        try:
+            call.result, led = self._run_with_lease(query, fn, deadline)
+            return call.result, led
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def refresh(self, query, fn):
+        """
+        Run fn() in a background thread (e.g. to revalidate a stale cache entry)
+        unless a run for query is already in flight here or in another worker.
+        Returns True if a refresh was started.
+        """
+        key = query_hash(query)
+        with self._lock:
+            if key in self._calls:
+                return False
+            call = self._calls[key] = _Call()
+
+        def worker():
+            owner = f"{os.getpid()}:{uuid.uuid4().hex}"
+            try:
+                if self.logger.acquire_search_lease(query, owner, ttl=self.lease_ttl):
+                    try:
+                        print(f"🔄 Refreshing stale search in background: {query[:50]}...")
+                        call.result = fn()
+                    finally:
+                        self.logger.release_search_lease(query, owner)
+            except Exception as e:
+                print(f"⚠️ Background refresh failed for {query[:50]}: {e}")
+            finally:
+                with self._lock:
+                    self._calls.pop(key, None)
+                call.done.set()
+
+        threading.Thread(target=worker, daemon=True).start()
+        return True
+
+    def _run_with_lease(self, query, fn, deadline=None):
+        owner = f"{os.getpid()}:{uuid.uuid4().hex}"
+        waiting_since = time.time()
+
+        while True:
+            if self.logger.acquire_search_lease(query, owner, ttl=self.lease_ttl):
+                try:
+                    return fn(), True
+                finally:
+                    self.logger.release_search_lease(query, owner)
+
+            # Another worker is running this search - wait for its cached result.
+            # Its lease expires after lease_ttl even if it died, so this ends.
+            print(f"⏳ Search in flight in another worker, waiting: {query[:50]}...")
+            while True:
+                if deadline:
+                    deadline.check("wait for in-flight search")
+                time.sleep(min(self.poll_interval, deadline.remaining()) if deadline else self.poll_interval)
+                # Check the lease before the cache: leaders cache before releasing
+                lease_live = self.logger.get_search_lease(query) is not None
+                cached = self.logger.get_cached_search(query, newer_than=waiting_since)
+                if cached:
+                    cached['cached'] = True
+                    return cached, False
+                if not lease_live:
+                    break  # Leader finished without caching (or died) - try to take over
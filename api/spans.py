@@ -0,0 +1,93 @@
+"""
+Lightweight span recorder for per-stage request latency.
+
+A Trace is started per API request (see app.py) and held in a context
+variable, which the shared executor copies into pool threads, so
+span("reddit.comments") anywhere below the request records into it. Outside
+a trace, span() is a no-op. Traces are summarised into a Server-Timing
+header and persisted per stage (request_spans) for p50/p95 queries.
+"""
+
+import contextvars
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+_current_trace = contextvars.ContextVar('trace', default=None)
+
+
+class Trace:
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.started = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, name, start, duration):
+        with self._lock:
+            self.spans.append((name, start - self.started, duration))
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def stages(self):
+        """
+        Per-stage totals in first-seen order: {name: {'duration_ms', 'start_ms', 'calls'}}.
+        Stages recorded several times (e.g. one span per Reddit post) are summed.
+        """
+        with self._lock:
+            spans = list(self.spans)
+        stages = {}
+        for name, start, duration in spans:
+            stage = stages.setdefault(name, {'duration_ms': 0.0, 'start_ms': start * 1000, 'calls': 0})
+            stage['duration_ms'] += duration * 1000
+            stage['start_ms'] = min(stage['start_ms'], start * 1000)
+            stage['calls'] += 1
+        return stages
+
+    def server_timing(self):
+        """Server-Timing header value, one metric per stage plus the request total"""
+        metrics = [
+            f'{name};dur={stage["duration_ms"]:.1f}'
+            + (f';desc="x{stage["calls"]}"' if stage['calls'] > 1 else '')
+            for name, stage in self.stages().items()
+        ]
+        metrics.append(f'total;dur={self.elapsed() * 1000:.1f}')
+        return ', '.join(metrics)
+
+
+def start_trace():
+    """Start a trace for the current context and return it"""
+    trace = Trace()
+    _current_trace.set(trace)
+    return trace
+
+
+def end_trace():
+    _current_trace.set(None)
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def record(name, start):
+    """Record a stage that started at ``start`` (time.perf_counter()) and ends now"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(name, start, time.perf_counter() - start)
+
+
+@contextmanager
+def span(name):
+    """Record the duration of the enclosed block as a stage of the current trace"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, start, time.perf_counter() - start)
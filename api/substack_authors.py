@@ -5,6 +5,8 @@ import requests
 import xml.etree.ElementTree as ET
 from datetime import datetime, timedelta
 
+from api.executor import host_slot, map_concurrent
+
 CURATED_AUTHORS = [
     {
         "name": "Ryan Grim",
@@ -90,7 +92,8 @@ def _fetch_author_feed(author, timeout=8):
     """Fetch a single author's RSS feed, extracting avatar and latest post in one request."""
     entry = {**author, "latest_post": None, "avatar_url": author.get("profile_image")}
     try:
-        resp = requests.get(author["feed_url"], timeout=timeout, headers={"User-Agent": "MediaReactionFinder/1.0"})
+        with host_slot(author["feed_url"]):
+            resp = requests.get(author["feed_url"], timeout=timeout, headers={"User-Agent": "MediaReactionFinder/1.0"})
         if resp.status_code != 200 or not resp.text.startswith("<?xml"):
             return entry
         root = ET.fromstring(resp.text)
@@ -120,7 +123,6 @@ def _fetch_author_feed(author, timeout=8):
 
 def get_curated_authors():
     """Return curated authors with latest posts. Cached for 72 hours."""
-    from concurrent.futures import ThreadPoolExecutor
 
     now = datetime.utcnow()
     if _authors_cache["data"] and _authors_cache["fetched_at"] and (now - _authors_cache["fetched_at"]) < CACHE_TTL:
@@ -129,8 +131,7 @@ def get_curated_authors():
     print("📰 Fetching curated Substack author feeds...")
     start = time.time()
 
-    with ThreadPoolExecutor(max_workers=6) as pool:
-        results = list(pool.map(_fetch_author_feed, CURATED_AUTHORS))
+    results = map_concurrent(_fetch_author_feed, CURATED_AUTHORS)
 
     elapsed = time.time() - start
     print(f"📰 Fetched {len(results)} Substack authors in {elapsed:.2f}s")
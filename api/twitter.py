@@ -7,18 +7,22 @@ import os
 import requests
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
+from api.deadline import timeout_for
+from api.executor import host_slot, submit
+from api.spans import span
 
 load_dotenv()
 load_dotenv('.env.local', override=True)
 
 
-def search_twitter_posts(query, limit=10):
+def search_twitter_posts(query, limit=10, deadline=None):
     """
     Search for recent tweets related to a topic/keyword.
     
     Args:
         query: Search query string
         limit: Maximum number of tweets to return (default 10)
+        deadline: Optional request Deadline capping the API timeout
     
     Returns:
         List of tweet dictionaries with: text, author, url, engagement, created_at
@@ -56,7 +60,8 @@ def search_twitter_posts(query, limit=10):
             "expansions": "author_id"
         }
         
-        response = requests.get(url, headers=headers, params=params, timeout=15)
+        with span('twitter.search'), host_slot(url):
+            response = requests.get(url, headers=headers, params=params, timeout=timeout_for(deadline, 15))
         
         if response.status_code == 401:
             print("❌ Twitter API authentication failed - check Bearer Token")
@@ -144,7 +149,7 @@ def search_twitter_posts(query, limit=10):
         return []
 
 
-def get_trending_tweets(topic, limit=10):
+def get_trending_tweets(topic, limit=10, deadline=None):
     """
     Get trending tweets for a specific topic.
     Fetches from credible sources individually to ensure variety.
@@ -152,6 +157,7 @@ def get_trending_tweets(topic, limit=10):
     Args:
         topic: Topic name (e.g., "Iran", "AI Governance")
         limit: Number of tweets to return
+        deadline: Optional request Deadline; raises DeadlineExceeded once it passes
     
     Returns:
         List of tweet dictionaries
@@ -175,25 +181,35 @@ def get_trending_tweets(topic, limit=10):
     if topic.lower() == "iran":
         iran_keywords = "(Iran OR Tehran OR IRGC OR Persian OR nuclear OR sanctions OR strike OR bombing)"
         
-        # Phase 1: Fetch Iran-relevant tweets from each curated account
+        # Phase 1 + 2 run concurrently on the shared I/O pool: Iran-relevant
+        # tweets from each curated account, plus a broad search for
+        # high-engagement Iran attack tweets from anyone
+        account_futures = {
+            account: submit(search_twitter_posts, f"from:{account} {iran_keywords} -is:retweet", limit=10, deadline=deadline)
+            for account in iran_sources
+        }
+        broad_future = submit(search_twitter_posts, "Iran (attack OR strike OR war OR military OR nuclear) -is:retweet -is:reply lang:en", limit=10, deadline=deadline)
+        
         account_tweets = {}
-        for account in iran_sources:
+        for account, future in account_futures.items():
             try:
-                tweets = search_twitter_posts(f"from:{account} {iran_keywords} -is:retweet", limit=10)
+                tweets = future.result()
                 account_tweets[account] = tweets
                 print(f"   → Got {len(tweets)} Iran-relevant tweets from @{account}")
             except Exception as e:
                 print(f"   → Error fetching from @{account}: {e}")
                 account_tweets[account] = []
         
-        # Phase 2: Broad search for high-engagement Iran attack tweets from anyone
         try:
-            broad_tweets = search_twitter_posts("Iran (attack OR strike OR war OR military OR nuclear) -is:retweet -is:reply lang:en", limit=10)
+            broad_tweets = broad_future.result()
             print(f"   → Got {len(broad_tweets)} tweets from broad Iran search")
         except Exception as e:
             print(f"   → Error in broad search: {e}")
             broad_tweets = []
         
+        if deadline:
+            deadline.check("Twitter search")
+        
         # Priority 1: One Iran-relevant tweet per curated account (newest from each)
         curated_tweets = []
         for account in iran_sources:
@@ -233,7 +249,7 @@ def get_trending_tweets(topic, limit=10):
         "climate tech": "climate (technology OR innovation OR renewable OR energy) -crypto -nft",
     }
     query = topic_queries.get(topic.lower(), topic)
-    return search_twitter_posts(query, limit=limit)
+    return search_twitter_posts(query, limit=limit, deadline=deadline)
 
 
 # Test function
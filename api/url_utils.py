@@ -0,0 +1,84 @@
+"""
+Canonical URL normalization.
+
+One canonical form per article, used for cache keys (cached_searches,
+cached_commentary, leases), curated reaction lookup and result dedup, so
+that share-link variants of the same URL don't each trigger a full pipeline.
+Canonical URLs are identifiers only - always fetch the URL the user gave.
+"""
+
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = {
+    'fbclid', 'gclid', 'gbraid', 'wbraid', 'dclid', 'msclkid', 'yclid', 'igshid',
+    'mc_cid', 'mc_eid', '_ga', '_gl', 'ref_src', 'ref_url', 'smid', 'smtyp',
+    'cmpid', 'ocid', 'share', 'amp', 'outputtype',
+}
+TRACKING_PREFIXES = ('utm_',)
+
+# Host prefixes for mobile / AMP / www variants of the same site
+VARIANT_HOST_PREFIXES = ('www.', 'm.', 'mobile.', 'amp.')
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def _is_tracking_param(name):
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+
+def _canonical_host(host):
+    host = host.lower().rstrip('.')
+    stripped = True
+    while stripped:
+        stripped = False
+        for prefix in VARIANT_HOST_PREFIXES:
+            if host.startswith(prefix) and host.count('.') > 1:
+                host = host[len(prefix):]
+                stripped = True
+    # Mobile subdomains in the middle, e.g. en.m.wikipedia.org
+    return host.replace('.m.', '.')
+
+
+def _canonical_path(path):
+    # AMP variants: /article/amp, /article.amp, /article.amp.html
+    if path.endswith('/amp') or path.endswith('/amp/'):
+        path = path.rstrip('/')[:-len('/amp')]
+    elif path.endswith('.amp'):
+        path = path[:-len('.amp')]
+    elif path.endswith('.amp.html'):
+        path = path[:-len('.amp.html')] + '.html'
+    return path.rstrip('/')
+
+
+def canonicalize_url(url):
+    """
+    Return the canonical form of a URL: https scheme, lowercase host without
+    www./m./amp. variants or default port, no fragment, no tracking params,
+    no AMP path suffix and no trailing slash. Remaining query params are sorted.
+    Non-URLs are returned stripped but otherwise unchanged.
+    """
+    if not url:
+        return url
+    url = url.strip()
+    if not url.lower().startswith(('http://', 'https://')):
+        return url
+
+    try:
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        host = _canonical_host(parts.hostname or '')
+        if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+            host = f"{host}:{parts.port}"
+
+        params = [
+            (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+            if not _is_tracking_param(k)
+        ]
+        query = urlencode(sorted(params))
+
+        return urlunsplit(('https', host, _canonical_path(parts.path), query, ''))
+    except ValueError:
+        # Malformed URL (e.g. bad port) - fall back to light cleanup
+        return url.split('#')[0].rstrip('/')
@@ -1,17 +1,29 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, g, request, jsonify, send_file, send_from_directory
 from flask_cors import CORS
 from search import search_news, search_substack, is_likely_substack
-from api.reddit import search_reddit_posts, get_title_from_url
+from api.reddit import search_reddit_posts, get_reddit_client, get_title_from_url
 from api.twitter import search_twitter_posts, get_trending_tweets
 from summarize import summarize_text, get_openai_client
+from openai import NOT_GIVEN
+from api import payload_codec
 from api.search_logger import SearchLogger
+from api.singleflight import SingleFlight
+from api.deadline import Deadline, DeadlineExceeded, SourceTracker, timeout_for
+from api.executor import host_slot, map_concurrent, submit_source
+from api.spans import current_trace, end_trace, span, start_trace
+from api.url_utils import canonicalize_url
 from api.substack_authors import get_curated_authors
 import json as json_module
+import base64
+import hmac
+import io
 from api.meta_commentary import generate_audio_commentary
 import os
 import time
-import sqlite3
-from concurrent.futures import ThreadPoolExecutor
+import queue
+import contextvars
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 import requests
 from bs4 import BeautifulSoup
 from urllib.parse import urlparse, unquote
@@ -109,6 +121,9 @@ CURATED_REACTIONS = {
     },
 }
 
+# CURATED_REACTIONS keyed by canonical URL, so share-link variants of an article match
+_CURATED_REACTIONS_BY_URL = {canonicalize_url(url): reactions for url, reactions in CURATED_REACTIONS.items()}
+
 _CATEGORY_LABELS = ["Mainstream Coverage", "Analysis", "Opinion"]
 
 # Annotation rubric for classification. See docs/content-evaluation.md for full definitions.
@@ -120,21 +135,29 @@ Categories (use exactly these labels):
 Tie-breaker: Same outlet, different section—use the piece's purpose. Hybrid pieces—choose dominant mode; if 50/50 reported+argument, prefer Analysis.
 """
 
-def classify_web_results(results, article_title=None):
+def classify_web_results(results, article_title=None, deadline=None, article_titles=None):
     """
     Classify each web result into a category with a one-line reason.
     Uses a single LLM call for all results to keep costs low.
     Rubric is in the system message so labels match docs/content-evaluation.md.
+    LLM calls are capped by the request ``deadline`` if one is given.
+    ``article_titles`` gives each result's own article (results of several
+    queries classified together) and replaces ``article_title``.
     """
     if not results:
         return results
 
+    titles = article_titles or [None] * len(results)
     titles_block = "\n".join(
-        f'{i+1}. "{r.get("title", "")}" — {r.get("summary", "")[:120]}'
-        for i, r in enumerate(results)
+        (f'{i+1}. [Article: "{title}"] ' if title else f'{i+1}. ')
+        + f'"{r.get("title", "")}" — {r.get("summary", "")[:120]}'
+        for i, (r, title) in enumerate(zip(results, titles))
     )
 
-    context = f'Article: "{article_title}"\n\n' if article_title else ""
+    if article_titles:
+        context = "Each result is a reaction to the article named in brackets, if any.\n\n"
+    else:
+        context = f'Article: "{article_title}"\n\n' if article_title else ""
     prompt = (
         f"{context}Classify each search result below into ONE of these categories: "
         f"{', '.join(_CATEGORY_LABELS)}.\n"
@@ -155,27 +178,33 @@ def classify_web_results(results, article_title=None):
     try:
         client = get_openai_client()
         if client:
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": system_msg},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.2
-            )
+            with span('llm.openai'), host_slot('api.openai.com'):
+                response = client.chat.completions.create(
+                    model="gpt-4",
+                    messages=[
+                        {"role": "system", "content": system_msg},
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=0.2,
+                    timeout=deadline.timeout(30) if deadline else NOT_GIVEN
+                )
             raw = response.choices[0].message.content.strip()
     except Exception as e:
         print(f"⚠️ OpenAI classification failed, trying Gemini: {e}")
 
     # Fallback to Gemini
-    if raw is None:
+    if raw is None and not (deadline and deadline.expired):
         try:
             import google.generativeai as genai
             gemini_key = os.getenv("GEMINI_API_KEY")
             if gemini_key:
                 genai.configure(api_key=gemini_key)
                 model = genai.GenerativeModel('gemini-2.0-flash')
-                response = model.generate_content(f"{system_msg}\n\n{prompt}")
+                with span('llm.gemini'), host_slot('generativelanguage.googleapis.com'):
+                    response = model.generate_content(
+                        f"{system_msg}\n\n{prompt}",
+                        request_options={'timeout': deadline.timeout(30)} if deadline else None
+                    )
                 raw = response.text.strip()
         except Exception as e:
             print(f"⚠️ Gemini classification also failed: {e}")
@@ -204,6 +233,20 @@ load_dotenv('.env.local', override=True)
 # repeated DB init and connection overhead per request
 logger = SearchLogger()
 
+# Coalesces identical in-flight reaction searches across threads and workers
+single_flight = SingleFlight(logger)
+
+# End-to-end time budgets; sources that miss them are reported, not fatal
+REACTIONS_DEADLINE_SECONDS = float(os.getenv('REACTIONS_DEADLINE_SECONDS', '40'))
+TRENDING_DEADLINE_SECONDS = float(os.getenv('TRENDING_DEADLINE_SECONDS', '30'))
+
+# /api/reactions/batch limits: queries per request, pipelines running at once
+# (per process, across all batches) and web results per classification call
+BATCH_MAX_QUERIES = int(os.getenv('BATCH_MAX_QUERIES', '50'))
+BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', '4'))
+CLASSIFY_BATCH_SIZE = 40
+_batch_pool = ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY, thread_name_prefix='batch')
+
 # Set up Flask - disable built-in static handling, we handle it ourselves for SPA support
 app = Flask(__name__, static_folder=None)
 
@@ -229,12 +272,10 @@ def update_recommended_articles():
             # AI collection
             'https://ai-frontiers.org/articles/ai-will-be-your-personal-political-proxy',
         ]
-        conn = sqlite3.connect(logger.db_path)
-        cursor = conn.cursor()
-        for url in recommended_urls:
-            cursor.execute('UPDATE curated_articles SET recommended = 1 WHERE url = ?', (url,))
-        conn.commit()
-        conn.close()
+        with logger.connection() as conn:
+            cursor = conn.cursor()
+            for url in recommended_urls:
+                cursor.execute('UPDATE curated_articles SET recommended = 1 WHERE url = ?', (url,))
         print("⭐ Updated recommended articles")
     except Exception as e:
         print(f"⚠️ Error updating recommended: {e}")
@@ -351,6 +392,9 @@ def _run_startup_tasks():
         sync_all_collections()
         update_recommended_articles()
         logger.clear_expired_cache()
+        logger.move_raw_payloads()
+        logger.move_commentary_audio()
+        logger.purge_raw_payloads()
     finally:
         # Clean up lock file so next restart can seed again
         try:
@@ -360,6 +404,38 @@ def _run_startup_tasks():
 
 _run_startup_tasks()
 
+# Search history retention (see SearchLogger.maintain_search_history). Every
+# worker checks shortly after startup and then hourly; the maintenance_runs
+# row makes one of them run it per interval.
+MAINTENANCE_INTERVAL_HOURS = float(os.getenv('MAINTENANCE_INTERVAL_HOURS', '24'))
+MAINTENANCE_STARTUP_DELAY_SECONDS = float(os.getenv('MAINTENANCE_STARTUP_DELAY_SECONDS', '60'))
+
+def _run_maintenance_if_due(interval):
+    """Run search history maintenance if it is due and no other worker is running it"""
+    owner = f'pid-{os.getpid()}'
+    if not logger.claim_maintenance('search_history', owner, interval):
+        return False
+    completed = False
+    try:
+        logger.maintain_search_history()
+        completed = True
+    finally:
+        logger.release_maintenance('search_history', owner, completed=completed)
+    return True
+
+def _maintenance_loop():
+    interval = MAINTENANCE_INTERVAL_HOURS * 3600
+    time.sleep(MAINTENANCE_STARTUP_DELAY_SECONDS)
+    while True:
+        try:
+            _run_maintenance_if_due(interval)
+        except Exception as e:
+            print(f"⚠️ Search history maintenance failed: {e}")
+        time.sleep(min(interval, 3600))
+
+if MAINTENANCE_INTERVAL_HOURS > 0:
+    threading.Thread(target=_maintenance_loop, name='search-maintenance', daemon=True).start()
+
 # Enable CORS - more permissive in production
 if os.getenv('RAILWAY_ENVIRONMENT') or os.getenv('PORT'):
     # Production: allow all origins
@@ -371,7 +447,44 @@ else:
 # Register analytics blueprint
 # app.register_blueprint(analytics_bp)
 
-def extract_article_metadata(url):
+# Endpoints whose per-stage durations are persisted to request_spans
+PERSISTED_SPAN_ENDPOINTS = {'get_reactions', 'check_cached_reactions', 'get_trending_reactions'}
+
+def _persist_trace(trace, endpoint, query, cached=False):
+    """
+    Queue a request's per-stage durations for p50/p95 queries (analytics_cli.py
+    stages). Written behind the response, like the search log.
+    """
+    try:
+        logger.enqueue_request_spans(
+            request_id=trace.id, endpoint=endpoint, query=query, stages=trace.stages(),
+            total_ms=trace.elapsed() * 1000, cached=cached,
+        )
+    except Exception as e:
+        print(f"⚠️ Failed to persist request spans: {e}")
+
+@app.before_request
+def start_request_trace():
+    """Record spans (see api/spans.py) for every API request"""
+    if request.path.startswith('/api/'):
+        start_trace()
+
+@app.after_request
+def add_server_timing(response):
+    """Expose the request's per-stage durations as a Server-Timing header"""
+    trace = current_trace()
+    if trace is not None:
+        response.headers['Server-Timing'] = trace.server_timing()
+        response.headers['Timing-Allow-Origin'] = '*'
+        if request.endpoint in PERSISTED_SPAN_ENDPOINTS:
+            _persist_trace(trace, request.url_rule.rule, g.get('trace_query'), g.get('trace_cached', False))
+    return response
+
+@app.teardown_request
+def end_request_trace(exc):
+    end_trace()
+
+def extract_article_metadata(url, deadline=None):
     """
     Extract title, source, date, and content from an article URL
     """
@@ -392,7 +505,8 @@ def extract_article_metadata(url):
         session = requests.Session()
         session.headers.update(headers)
         
-        response = session.get(url, timeout=15, allow_redirects=True)
+        with host_slot(url):
+            response = session.get(url, timeout=timeout_for(deadline, 15), allow_redirects=True)
         
         # Check for specific error codes that indicate access restrictions
         if response.status_code == 401:
@@ -608,14 +722,19 @@ def check_cached_reactions():
         if not query:
             return jsonify({'cached': False, 'results': None})
         
-        cached = logger.get_cached_search(query)
+        g.trace_query = query
+        with span('cache.search'):
+            cached = logger.get_cached_search_encoded(query)
         
         if cached:
+            blob, stale = cached
+            g.trace_cached = True
             print(f"✅ Found cached search results for: {query[:50]}...")
-            return jsonify({
-                'cached': True,
-                'results': cached
-            })
+            if stale:
+                _refresh_stale_search(query, request.headers.get('X-Forwarded-For', request.remote_addr))
+            # {'cached': True, 'stale': stale, 'results': {**cached, 'stale': stale}}
+            prefix = b'{"cached":true,"stale":%s,"results":' % (b'true' if stale else b'false')
+            return _cached_payload_response(blob, {'stale': stale}, prefix=prefix, suffix=b'}')
         
         return jsonify({'cached': False, 'results': None})
         
@@ -648,193 +767,470 @@ def clear_search_cache():
         print(f"Error clearing cache: {e}")
         return jsonify({'error': str(e)}), 500
 
+def _summarize_article(article_metadata, deadline=None):
+    """Generate the article summary (or an explanatory placeholder) for extracted metadata."""
+    if article_metadata['content']:
+        print(f"📝 Generating article summary...")
+        # Include title in context so LLM knows the author's name
+        summary_task = f"""Provide a concise 100-word summary of this article.
+
+ARTICLE TITLE: {article_metadata['title']}
+SOURCE: {article_metadata.get('source', 'Unknown')}
+
+Highlight the main points and key information. Use the author's name from the title if present - do NOT guess or invent names."""
+        return summarize_text(article_metadata['content'], summary_task, deadline=deadline)
+    # Use error message if available, otherwise generic message
+    if 'error' in article_metadata:
+        return article_metadata['error']
+    return "Summary not available — this publisher may block automated content extraction. Reactions and discussions are still available below."
+
+def _build_search_query(query, article_metadata):
+    """
+    Build the web/Substack search query. For URLs with a usable title, search with
+    title + source and exclude the original domain to find external reactions.
+    """
+    search_query = query
+    if query.startswith('http') and article_metadata:
+        try:
+            query_domain = urlparse(query).netloc.replace('www.', '').lower()
+            source = article_metadata.get('source', '')
+            title = article_metadata.get('title', '')
+            
+            # Build a smarter search query that finds reactions
+            if title and title != 'Article':
+                # Use title in quotes for exact match, add source, exclude original domain
+                search_query = f'"{title}" {source} -site:{query_domain}'
+                print(f"🔍 Using smart search query: {search_query[:80]}...")
+        except Exception as e:
+            print(f"Warning: Could not build smart query, using URL: {e}")
+    return search_query
+
+def _filter_self_references(query, news_results, substack_results):
+    """Filter out the original article from web and Substack results when searching by URL."""
+    try:
+        query_canonical = canonicalize_url(query)
+        query_parsed = urlparse(query_canonical)
+        query_domain = query_parsed.netloc
+        query_path = query_parsed.path.lower()
+        
+        # Extract slug from path for cross-domain matching (e.g. "2028gic" from "/p/2028gic")
+        query_slug = query_path.rsplit('/', 1)[-1] if '/' in query_path else ''
+        
+        def is_self_reference(result_url):
+            """Check if a result URL points to the original article being searched."""
+            if not result_url:
+                return False
+            result_canonical = canonicalize_url(result_url)
+            if result_canonical == query_canonical:
+                return True
+            result_parsed = urlparse(result_canonical)
+            result_domain = result_parsed.netloc
+            if result_domain == query_domain:
+                return True
+            # Catch Substack open.substack.com/pub/AUTHOR/p/SLUG mirrors
+            # e.g. citriniresearch.com/p/2028gic → open.substack.com/pub/citrini/p/2028gic
+            if query_slug and 'substack.com' in result_domain:
+                if f'/p/{query_slug}' in result_parsed.path.lower():
+                    return True
+            return False
+        
+        pre_web = len(news_results)
+        pre_sub = len(substack_results)
+        news_results = [r for r in news_results if not is_self_reference(r.get('url', ''))]
+        substack_results = [r for r in substack_results if not is_self_reference(r.get('url', ''))]
+        filtered = (pre_web - len(news_results)) + (pre_sub - len(substack_results))
+        if filtered:
+            print(f"🔍 Filtered out {filtered} self-reference(s) from domain: {query_domain}")
+    except Exception as e:
+        print(f"Warning: Could not parse URL for filtering: {e}")
+    return news_results, substack_results
+
+def _merge_web_results(query, news_results, substack_results):
+    """
+    Post-process web and Substack results once both searches are done: drop
+    self-references and Reddit links, move Substack articles out of web results,
+    inject curated reactions and flag downloads. Does not depend on Reddit, so
+    it (and classification) overlaps with the usually slower Reddit search.
+    """
+    if query.startswith('http'):
+        news_results, substack_results = _filter_self_references(query, news_results, substack_results)
+    
+    # Filter Reddit URLs out of web results
+    news_results = [
+        r for r in news_results
+        if 'reddit.com' not in (r.get('url', '') or '').lower()
+    ]
+    
+    # Detect and move Substack articles from web results to substack results
+    substack_urls = {(r.get('url') or '').lower() for r in substack_results}
+    reclassified = []
+    remaining_news = []
+    for r in news_results:
+        url_lower = (r.get('url') or '').lower()
+        if url_lower in substack_urls:
+            continue
+        if is_likely_substack(r):
+            r['type'] = 'Substack'
+            reclassified.append(r)
+        else:
+            remaining_news.append(r)
+    substack_results.extend(reclassified)
+    news_results = remaining_news
+    if reclassified:
+        print(f"📰 Re-classified {len(reclassified)} web result(s) as Substack")
+    
+    # Deduplicate web results against Substack results by title similarity
+    substack_titles = {(r.get('title') or '').lower().strip() for r in substack_results}
+    news_results = [
+        r for r in news_results
+        if (r.get('title') or '').lower().strip() not in substack_titles
+    ]
+    
+    # Inject curated reaction articles that search engines may not have indexed yet
+    curated = _CURATED_REACTIONS_BY_URL.get(canonicalize_url(query), {})
+    if curated:
+        existing_urls = {canonicalize_url(r.get('url') or '')
+                        for r in news_results + substack_results}
+        for r in curated.get('substack', []):
+            if canonicalize_url(r['url']) not in existing_urls:
+                substack_results.insert(0, r)
+        for r in curated.get('web', []):
+            if canonicalize_url(r['url']) not in existing_urls:
+                news_results.insert(0, r)
+        print(f"📌 Injected curated reactions for: {query[:50]}")
+    
+    # Add file download flags to web results for security warnings
+    news_results = add_file_download_flags(news_results)
+    
+    return news_results, substack_results
+
+# Sources with their own cache in source_cache (see SOURCE_CACHE_TTLS)
+CACHED_SOURCES = ('article', 'web', 'substack', 'reddit', 'twitter')
+
+def _parse_refresh(value):
+    """
+    Parse a refresh request into the set of sources to re-run, e.g. 'reddit' or
+    'reddit,web'. '1', 'true' or 'all' re-runs every source.
+    """
+    if isinstance(value, (list, tuple)):
+        value = ','.join(value)
+    names = {name.strip().lower() for name in (value or '').split(',') if name.strip()}
+    if names & {'1', 'true', 'all'}:
+        return set(CACHED_SOURCES)
+    return names & set(CACHED_SOURCES)
+
+def _store_source(source, key, results, query=None, deadline=None):
+    """
+    Cache a source's results unless they may be incomplete: sources report
+    failures as empty lists, and results that arrive after the deadline may
+    have been cut short.
+    """
+    if not results or (deadline and deadline.expired):
+        return
+    try:
+        logger.cache_source(source, key, results, query=query)
+    except Exception as e:
+        print(f"⚠️ Failed to cache {source} results: {e}")
+
+def _cached_source(source, key, refresh, fn, *args, query=None, **kwargs):
+    """
+    Return a source's cached results for the exact sub-query ``key``, or call
+    fn and cache what it returns. Sources named in ``refresh`` skip the lookup.
+    """
+    if source not in refresh:
+        with span(f'cache.{source}'):
+            cached = logger.get_cached_source(source, key)
+        if cached is not None:
+            print(f"💾 Using cached {source} results for: {key[:50]}...")
+            return cached
+    results = fn(*args, **kwargs)
+    _store_source(source, key, results, query=query, deadline=kwargs.get('deadline'))
+    return results
+
+def _reddit_cache_key(query, article_title):
+    return f"{canonicalize_url(query)}\n{article_title or ''}"
+
+def _search_reddit_cached(query, refresh, limit=5, article_title=None, article_title_future=None, deadline=None):
+    """
+    Reddit results, cached by query + article title. When the title is still
+    being extracted (a URL without a cached article), nothing can be cached
+    for it yet, so the search starts right away and its results are cached
+    under the title once it is known.
+    """
+    if article_title_future is None:
+        return _cached_source(
+            'reddit', _reddit_cache_key(query, article_title), refresh,
+            search_reddit_posts, query, query=query, limit=limit,
+            article_title=article_title, deadline=deadline
+        )
+    results = search_reddit_posts(
+        query, limit=limit, article_title_future=article_title_future, deadline=deadline
+    )
+    if article_title_future.done() and article_title_future.exception() is None:
+        key = _reddit_cache_key(query, article_title_future.result())
+        _store_source('reddit', key, results, query=query, deadline=deadline)
+    return results
+
+def _classification_labels(results):
+    """Category labels for web results, as sent in ``classification`` stream events"""
+    return [
+        {'url': r.get('url'), 'category_label': r.get('category_label', ''),
+         'category_reason': r.get('category_reason', '')}
+        for r in results
+    ]
+
+def _run_reactions_pipeline(query, user_ip=None, emit=None, refresh=frozenset(), classify=True, deadline=None):
+    """
+    Run the reactions pipeline for a query and return the response payload.
+
+    Stages are scheduled by dependency rather than in series:
+      - Reddit starts at t=0 (phase 1 searches the exact URL; it waits for the
+        article title only before its title-dependent phases)
+      - web and Substack searches start as soon as the article title is parsed
+      - the article summary runs alongside the searches
+      - web post-processing and classification run as soon as web + Substack
+        finish, while Reddit is still working
+
+    The whole run shares one ``Deadline`` (REACTIONS_DEADLINE_SECONDS, or the
+    request's own ``deadline``) that is passed into every source call. Sources that miss it are dropped rather than
+    failing the request: the payload's ``sources`` map gives each source's
+    ``status`` (``ok``/``timeout``/``error``) and ``duration``, and ``partial``
+    is True if any of them did not finish ok. ``timings`` has per-source start
+    offsets and durations, plus ``total`` (wall clock) and ``sequential`` (sum
+    of stages).
+
+    Each source's raw results are read from / written to its own cache
+    (source_cache, keyed by the sub-query sent), so only expired sources are
+    fetched again; sources named in ``refresh`` always re-run. A cached article
+    includes its summary. With ``classify=False`` web results are left
+    unclassified (the batch endpoint classifies many URLs' results at once).
+
+    If ``emit`` is given it is called as ``emit(event, data)`` with partial
+    results as each stage finishes (``article``, ``summary``, ``web``,
+    ``substack``, ``classification``, ``reddit``), possibly from worker threads.
+    """
+    started = time.time()
+    deadline = deadline or Deadline(REACTIONS_DEADLINE_SECONDS)
+    sources = SourceTracker(deadline)
+    emit = emit or (lambda event, data: None)
+    
+    def emit_when_done(future, event, wrap=lambda result: result):
+        def callback(f):
+            # Results that arrive after the deadline are not part of the response
+            if f.exception() is None and not deadline.expired:
+                emit(event, wrap(f.result()))
+        future.add_done_callback(callback)
+    
+    is_url = query.startswith('http')
+    article_metadata = None
+    article_title = None
+    title_future = Future() if is_url else None
+    
+    # A cached article (with its summary) makes the title known up front
+    if is_url and 'article' not in refresh:
+        with span('cache.article'):
+            article_metadata = logger.get_cached_source('article', query)
+        if article_metadata:
+            article_title = article_metadata['title']
+            title_future = None
+            print(f"💾 Using cached article: {article_title}")
+    
+    # Sources run on the shared pool; ones that miss the deadline are left behind
+    reddit_future = submit_source(
+        sources.run, 'reddit', _search_reddit_cached, query, refresh,
+        article_title=article_title, article_title_future=title_future, deadline=deadline
+    )
+    emit_when_done(reddit_future, 'reddit')
+    
+    summary_future = None
+    if is_url and article_metadata:
+        emit('article', article_metadata)
+    elif is_url:
+        print(f"🔍 Extracting article metadata from URL...")
+        try:
+            article_metadata = sources.run('extract', extract_article_metadata, query, deadline=deadline)
+            article_title = article_metadata['title']
+            print(f"🧠 Extracted article: {article_title}")
+        finally:
+            # Unblock Reddit's topic phases even if extraction blew up
+            title_future.set_result(article_title)
+        emit('article', article_metadata)
+        summary_future = submit_source(
+            sources.run, 'summary', _summarize_article, article_metadata, deadline=deadline
+        )
+        emit_when_done(summary_future, 'summary', lambda summary: {'summary': summary})
+    
+    # Search news - use smarter query for URLs
+    print("📰 Searching news...")
+    search_query = _build_search_query(query, article_metadata)
+    news_future = submit_source(
+        sources.run, 'web', _cached_source, 'web', search_query, refresh,
+        search_news, search_query, query=query, user_ip=user_ip, deadline=deadline
+    )
+    substack_future = submit_source(
+        sources.run, 'substack', _cached_source, 'substack', search_query, refresh,
+        search_substack, search_query, query=query, deadline=deadline
+    )
+    
+    news_results = sources.collect('web', news_future, [])
+    substack_results = sources.collect('substack', substack_future, [])
+    
+    with span('merge'):
+        news_results, substack_results = _merge_web_results(query, news_results, substack_results)
+    emit('web', news_results)
+    emit('substack', substack_results)
+    # Classify web results (non-blocking — failures leave results untagged)
+    if classify:
+        try:
+            news_results = sources.run(
+                'classify', classify_web_results, news_results,
+                article_title=article_title, deadline=deadline
+            )
+        except Exception as e:
+            print(f"⚠️ Classification failed: {e}")
+        emit('classification', _classification_labels(news_results))
+    
+    reddit_results = sources.collect('reddit', reddit_future, [])
+    if summary_future is not None:
+        article_metadata['summary'] = sources.collect(
+            'summary', summary_future,
+            "Summary not available — the summary took too long to generate. Reactions and discussions are still available below."
+        )
+        # Articles that couldn't be extracted are retried next time
+        if 'error' not in article_metadata and all(
+            sources.summary().get(stage, {}).get('status') == 'ok' for stage in ('extract', 'summary')
+        ):
+            _store_source('article', query, article_metadata, query=query)
+    
+    # Deduplicate web results against Reddit results by title similarity
+    reddit_titles = {(r.get('title') or '').lower().strip() for r in reddit_results}
+    news_results = [
+        r for r in news_results
+        if (r.get('title') or '').lower().strip() not in reddit_titles
+    ]
+    
+    timings = sources.timings()
+    timings['total'] = round(time.time() - started, 3)
+    timings['sequential'] = round(sum(
+        t['duration'] for t in timings.values() if isinstance(t, dict)
+    ), 3)
+    print(f"⏱️ Reactions pipeline: {timings['total']}s wall clock "
+          f"({timings['sequential']}s if run in series)")
+    if not sources.complete:
+        late = [name for name, s in sources.summary().items() if s['status'] != 'ok']
+        print(f"⚠️ Returning partial results (incomplete sources: {', '.join(late)})")
+    
+    # Format response to match frontend expectations
+    return {
+        'web': news_results,
+        'reddit': reddit_results,
+        'substack': substack_results,
+        'article': article_metadata,
+        'cached': False,
+        'stale': False,
+        'partial': not sources.complete,
+        'sources': sources.summary(),
+        'timings': timings
+    }
+
+def _timed_out_payload():
+    """Response payload for a request whose deadline passed before it had any results"""
+    return {
+        'web': [], 'reddit': [], 'substack': [], 'article': None,
+        'cached': False, 'stale': False, 'partial': True, 'sources': {}, 'timings': {},
+    }
+
+def _cached_payload_response(blob, fields, prefix=b'', suffix=b''):
+    """
+    Serve a stored cache payload without decoding it (see api/payload_codec.py):
+    the stored deflate data is sent as-is, gzip-wrapped, when the client accepts
+    gzip, otherwise inflated. fields are appended to the cached object.
+    """
+    with span('cache.serve'):
+        if 'gzip' in request.accept_encodings:
+            response = Response(payload_codec.splice_gzip(blob, fields, prefix, suffix), mimetype='application/json')
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = Response(payload_codec.splice_json(blob, fields, prefix, suffix), mimetype='application/json')
+    response.vary.add('Accept-Encoding')
+    return response
+
+def _refresh_stale_search(query, user_ip=None):
+    """Revalidate a stale cache entry in the background (at most one refresh per query)."""
+    def run_pipeline():
+        response = _run_reactions_pipeline(query, user_ip=user_ip)
+        _cache_reactions(query, response)
+        return response
+    
+    single_flight.refresh(query, run_pipeline)
+
+def _cache_reactions(query, response):
+    """
+    Cache a pipeline response for future requests. Partial responses (a source
+    timed out or failed) are not cached, so the next request retries them.
+    """
+    if response.get('partial'):
+        print(f"⏭️ Not caching partial results for: {query[:50]}...")
+        return
+    try:
+        # Timings and source statuses describe this run only; cached/stale are added when served
+        cacheable = {k: v for k, v in response.items() if k not in ('timings', 'sources', 'cached', 'stale')}
+        logger.cache_search(query, cacheable)
+        print(f"💾 Cached search results for: {query[:50]}...")
+    except Exception as cache_error:
+        print(f"⚠️ Failed to cache search results: {cache_error}")
+
 @app.route('/api/reactions', methods=['POST'])
 def get_reactions():
     """
     Main endpoint to search for news and Reddit reactions.
     Now with caching - checks cache first, returns cached results if available.
+    Pass ?refresh=reddit (or a comma-separated list of sources, or 'all') to
+    re-run those sources; the others are served from their own caches.
     """
     try:
         data = request.get_json()
         query = data.get('query', '')
         skip_cache = data.get('skip_cache', False)
+        refresh = _parse_refresh(request.args.get('refresh') or data.get('refresh'))
         
         if not query:
             return jsonify({'error': 'No query provided'}), 400
         
-        # Check cache first (skipped when frontend already checked via /api/reactions/check)
-        if not skip_cache:
-            cached = logger.get_cached_search(query)
-            if cached:
-                print(f"✅ Returning cached search results for: {query[:50]}...")
-                cached['cached'] = True
-                return jsonify(cached)
-        
-        # Extract article metadata if URL is provided
-        article_metadata = None
-        article_title = None
-        
-        if query.startswith('http'):
-            print(f"🔍 Extracting article metadata from URL...")
-            article_metadata = extract_article_metadata(query)
-            article_title = article_metadata['title']
-            
-            # Generate article summary if content is available
-            if article_metadata['content']:
-                print(f"📝 Generating article summary...")
-                # Include title in context so LLM knows the author's name
-                summary_task = f"""Provide a concise 100-word summary of this article.
-
-ARTICLE TITLE: {article_title}
-SOURCE: {article_metadata.get('source', 'Unknown')}
-
-Highlight the main points and key information. Use the author's name from the title if present - do NOT guess or invent names."""
-                article_metadata['summary'] = summarize_text(article_metadata['content'], summary_task)
-            else:
-                # Use error message if available, otherwise generic message
-                if 'error' in article_metadata:
-                    article_metadata['summary'] = article_metadata['error']
-                else:
-                    article_metadata['summary'] = "Summary not available — this publisher may block automated content extraction. Reactions and discussions are still available below."
-                
-            print(f"🧠 Extracted article: {article_title}")
-        
-        # Search news - use smarter query for URLs
-        print("📰 Searching news...")
         user_ip = request.headers.get('X-Forwarded-For', request.remote_addr)
+        g.trace_query = query
         
-        # If URL was provided and we have article metadata, search with title + domain exclusion
-        # This finds external reactions rather than pages from the same site
-        search_query = query
-        if query.startswith('http') and article_metadata:
-            try:
-                query_domain = urlparse(query).netloc.replace('www.', '').lower()
-                source = article_metadata.get('source', '')
-                title = article_metadata.get('title', '')
-                
-                # Build a smarter search query that finds reactions
-                if title and title != 'Article':
-                    # Use title in quotes for exact match, add source, exclude original domain
-                    search_query = f'"{title}" {source} -site:{query_domain}'
-                    print(f"🔍 Using smart search query: {search_query[:80]}...")
-            except Exception as e:
-                print(f"Warning: Could not build smart query, using URL: {e}")
-        
-        # Run web search, Reddit search, and Substack search in parallel
-        with ThreadPoolExecutor(max_workers=3) as executor:
-            news_future = executor.submit(search_news, search_query, user_ip=user_ip)
-            reddit_future = executor.submit(search_reddit_posts, query, article_title=article_title)
-            substack_future = executor.submit(search_substack, search_query)
-            
-            news_results = news_future.result(timeout=30)
-            reddit_results = reddit_future.result(timeout=30)
-            substack_results = substack_future.result(timeout=30)
+        # Check cache first (skipped when frontend already checked via /api/reactions/check)
+        if not skip_cache and not refresh:
+            with span('cache.search'):
+                cached = logger.get_cached_search_encoded(query)
+            if cached:
+                blob, stale = cached
+                g.trace_cached = True
+                print(f"✅ Returning {'stale ' if stale else ''}cached search results for: {query[:50]}...")
+                if stale:
+                    _refresh_stale_search(query, user_ip)
+                return _cached_payload_response(blob, {'stale': stale, 'cached': True})
         
-        # Filter out the original article from ALL result types when searching by URL
-        if query.startswith('http'):
-            try:
-                query_parsed = urlparse(query)
-                query_domain = query_parsed.netloc.replace('www.', '').lower()
-                query_path = query_parsed.path.rstrip('/').lower()
-                query_normalized = query.rstrip('/').lower()
-                
-                # Extract slug from path for cross-domain matching (e.g. "2028gic" from "/p/2028gic")
-                query_slug = query_path.rsplit('/', 1)[-1] if '/' in query_path else ''
-                
-                def is_self_reference(result_url):
-                    """Check if a result URL points to the original article being searched."""
-                    if not result_url:
-                        return False
-                    url_normalized = result_url.split('?')[0].rstrip('/').lower()
-                    if url_normalized == query_normalized.split('?')[0].rstrip('/'):
-                        return True
-                    result_parsed = urlparse(result_url.lower())
-                    result_domain = result_parsed.netloc.replace('www.', '')
-                    if result_domain == query_domain:
-                        return True
-                    # Catch Substack open.substack.com/pub/AUTHOR/p/SLUG mirrors
-                    # e.g. citriniresearch.com/p/2028gic → open.substack.com/pub/citrini/p/2028gic
-                    if query_slug and 'substack.com' in result_domain:
-                        result_path = result_parsed.path.rstrip('/')
-                        if f'/p/{query_slug}' in result_path:
-                            return True
-                    return False
-                
-                pre_web = len(news_results)
-                pre_sub = len(substack_results)
-                news_results = [r for r in news_results if not is_self_reference(r.get('url', ''))]
-                substack_results = [r for r in substack_results if not is_self_reference(r.get('url', ''))]
-                filtered = (pre_web - len(news_results)) + (pre_sub - len(substack_results))
-                if filtered:
-                    print(f"🔍 Filtered out {filtered} self-reference(s) from domain: {query_domain}")
-            except Exception as e:
-                print(f"Warning: Could not parse URL for filtering: {e}")
-        
-        # Filter Reddit URLs out of web results
-        news_results = [
-            r for r in news_results
-            if 'reddit.com' not in (r.get('url', '') or '').lower()
-        ]
         
-        # Detect and move Substack articles from web results to substack results
-        substack_urls = {(r.get('url') or '').lower() for r in substack_results}
-        reclassified = []
-        remaining_news = []
-        for r in news_results:
-            url_lower = (r.get('url') or '').lower()
-            if url_lower in substack_urls:
-                continue
-            if is_likely_substack(r):
-                r['type'] = 'Substack'
-                reclassified.append(r)
-            else:
-                remaining_news.append(r)
-        substack_results.extend(reclassified)
-        news_results = remaining_news
-        if reclassified:
-            print(f"📰 Re-classified {len(reclassified)} web result(s) as Substack")
-        
-        # Deduplicate web results against Reddit and Substack results by title similarity
-        other_titles = {(r.get('title') or '').lower().strip() for r in reddit_results + substack_results}
-        news_results = [
-            r for r in news_results
-            if (r.get('title') or '').lower().strip() not in other_titles
-        ]
+        deadline = Deadline(REACTIONS_DEADLINE_SECONDS)
         
-        # Inject curated reaction articles that search engines may not have indexed yet
-        curated = CURATED_REACTIONS.get(query.rstrip('/'), {})
-        if curated:
-            existing_urls = {(r.get('url') or '').split('?')[0].rstrip('/').lower()
-                            for r in news_results + substack_results + reddit_results}
-            for r in curated.get('substack', []):
-                if r['url'].split('?')[0].rstrip('/').lower() not in existing_urls:
-                    substack_results.insert(0, r)
-            for r in curated.get('web', []):
-                if r['url'].split('?')[0].rstrip('/').lower() not in existing_urls:
-                    news_results.insert(0, r)
-            print(f"📌 Injected curated reactions for: {query[:50]}")
-        
-        # Add file download flags to web results for security warnings
-        news_results = add_file_download_flags(news_results)
-        
-        # Classify web results (non-blocking — failures leave results untagged)
-        news_results = classify_web_results(news_results, article_title=article_title)
-        
-        # Format response to match frontend expectations
-        response = {
-            'web': news_results,
-            'reddit': reddit_results,
-            'substack': substack_results,
-            'article': article_metadata,
-            'cached': False
-        }
+        def run_pipeline():
+            response = _run_reactions_pipeline(query, user_ip=user_ip, refresh=refresh, deadline=deadline)
+            _cache_reactions(query, response)
+            return response
         
-        # Cache the results for future requests
+        # Identical queries already in flight (in any worker) share one pipeline run,
+        # waiting at most until this request's deadline. Refreshes run their own:
+        # a shared run may serve the caches they bypass.
         try:
-            logger.cache_search(query, response)
-            print(f"💾 Cached search results for: {query[:50]}...")
-        except Exception as cache_error:
-            print(f"⚠️ Failed to cache search results: {cache_error}")
+            if refresh:
+                response = run_pipeline()
+            else:
+                response, _ = single_flight.run(query, run_pipeline, deadline=deadline)
+        except DeadlineExceeded as e:
+            print(f"⏱️ {e}: {query[:50]}...")
+            response = _timed_out_payload()
         
         return jsonify(response)
         
@@ -842,6 +1238,229 @@ Highlight the main points and key information. Use the author's name from the ti
         print(f"Error in search endpoint: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/reactions/stream', methods=['POST'])
+def stream_reactions():
+    """
+    Streaming variant of /api/reactions (newline-delimited JSON).
+
+    Each line is ``{"event": ..., "data": ...}``. Partial results (``article``,
+    ``summary``, ``web``, ``substack``, ``classification``, ``reddit``) are sent
+    in whatever order they finish, followed by a ``done`` event carrying the
+    complete payload (or an ``error`` event). The pipeline runs in its own
+    thread so results are still cached if the client disconnects early.
+    Accepts ``refresh`` like /api/reactions. The Server-Timing header is sent
+    before the pipeline runs; its spans are persisted once the stream ends.
+    """
+    data = request.get_json() or {}
+    query = data.get('query', '')
+    skip_cache = data.get('skip_cache', False)
+    refresh = _parse_refresh(request.args.get('refresh') or data.get('refresh'))
+    
+    if not query:
+        return jsonify({'error': 'No query provided'}), 400
+    
+    user_ip = request.headers.get('X-Forwarded-For', request.remote_addr)
+    events = queue.Queue()
+    
+    def emit(event, payload):
+        # Serialize immediately: later stages keep mutating the same result dicts
+        events.put(json_module.dumps({'event': event, 'data': payload}) + '\n')
+    
+    trace = current_trace()
+    cached = None
+    
+    def run():
+        nonlocal cached
+        try:
+            if not skip_cache and not refresh:
+                with span('cache.search'):
+                    cached = logger.get_cached_search(query)
+                if cached:
+                    print(f"✅ Streaming {'stale ' if cached['stale'] else ''}cached search results for: {query[:50]}...")
+                    if cached['stale']:
+                        _refresh_stale_search(query, user_ip)
+                    cached['cached'] = True
+                    emit('done', cached)
+                    return
+            
+            deadline = Deadline(REACTIONS_DEADLINE_SECONDS)
+            
+            def run_pipeline():
+                response = _run_reactions_pipeline(query, user_ip=user_ip, emit=emit, refresh=refresh,
+                                                   deadline=deadline)
+                _cache_reactions(query, response)
+                return response
+            
+            # Followers of an in-flight identical query only receive the final event
+            # (or a partial one at their deadline); refreshes never follow (the
+            # shared run may serve the caches they bypass)
+            try:
+                if refresh:
+                    response = run_pipeline()
+                else:
+                    response, _ = single_flight.run(query, run_pipeline, deadline=deadline)
+            except DeadlineExceeded as e:
+                print(f"⏱️ {e}: {query[:50]}...")
+                response = _timed_out_payload()
+            emit('done', response)
+        except Exception as e:
+            print(f"Error in streaming search endpoint: {e}")
+            emit('error', {'error': str(e)})
+        finally:
+            events.put(None)
+            if trace is not None:
+                _persist_trace(trace, '/api/reactions/stream', query, cached=bool(cached))
+    
+    # Copy the request context so spans recorded by the pipeline land in this request's trace
+    threading.Thread(target=contextvars.copy_context().run, args=(run,), daemon=True).start()
+    
+    def generate():
+        while True:
+            line = events.get()
+            if line is None:
+                break
+            yield line
+    
+    return Response(
+        generate(),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def _classify_batch(pending, emit):
+    """
+    Classify the web results of several completed batch queries with one LLM
+    call, then send their labels and cache them (pending is [(query, response)]).
+    """
+    if not pending:
+        return
+    results = [r for _, response in pending for r in response['web']]
+    # Each result keeps its own article as context, as in the single-query path
+    titles = [(response.get('article') or {}).get('title') for _, response in pending for _ in response['web']]
+    try:
+        with span('classify.batch'):
+            classify_web_results(results, deadline=Deadline(REACTIONS_DEADLINE_SECONDS), article_titles=titles)
+    except Exception as e:
+        print(f"⚠️ Batch classification failed: {e}")
+    for query, response in pending:
+        emit('classification', {'query': query, 'labels': _classification_labels(response['web'])})
+        _cache_reactions(query, response)
+
+@app.route('/api/reactions/batch', methods=['POST'])
+def batch_reactions():
+    """
+    Reactions for many queries/URLs at once, streamed as newline-delimited JSON.
+
+    Body: ``{"queries": [...]}`` (up to BATCH_MAX_QUERIES; accepts ``refresh``
+    like /api/reactions). Cached queries are looked up with one SQL query and
+    sent first (stale ones are revalidated in the background); the rest run
+    through the reactions pipeline, BATCH_CONCURRENCY at a time, sharing the
+    source pool, clients and in-flight runs (single_flight). Each line is
+    ``{"event": ..., "data": ...}``:
+      - ``result``: ``{query, result}`` as each query completes
+      - ``classification``: ``{query, labels}`` once its web results have been
+        classified (results of several queries share one LLM call)
+      - ``error``: ``{query, error}`` for a query that failed
+      - ``done``: ``{total, cached, failed}``
+    """
+    data = request.get_json() or {}
+    queries = data.get('queries') or []
+    refresh = _parse_refresh(request.args.get('refresh') or data.get('refresh'))
+    
+    if not isinstance(queries, list) or not queries:
+        return jsonify({'error': 'No queries provided'}), 400
+    if len(queries) > BATCH_MAX_QUERIES:
+        return jsonify({'error': f'At most {BATCH_MAX_QUERIES} queries per batch'}), 400
+    
+    # One run per canonical URL; pasted duplicates and tracking variants share it
+    unique = {}
+    for query in queries:
+        query = str(query).strip()
+        if query:
+            unique.setdefault(canonicalize_url(query), query)
+    queries = list(unique.values())
+    
+    user_ip = request.headers.get('X-Forwarded-For', request.remote_addr)
+    events = queue.Queue()
+    
+    def emit(event, payload):
+        events.put(json_module.dumps({'event': event, 'data': payload}) + '\n')
+    
+    def run_query(query):
+        deadline = Deadline(REACTIONS_DEADLINE_SECONDS)
+        
+        def run_pipeline():
+            response = _run_reactions_pipeline(query, user_ip=user_ip, refresh=refresh, classify=False,
+                                               deadline=deadline)
+            # Cached now for coalesced followers; re-cached with labels by _classify_batch
+            _cache_reactions(query, response)
+            return response
+        
+        # Shares a run with identical queries in flight anywhere, as /api/reactions does
+        if refresh:
+            return run_pipeline()
+        return single_flight.run(query, run_pipeline, deadline=deadline)[0]
+    
+    def run():
+        counts = {'total': len(queries), 'cached': 0, 'failed': 0}
+        try:
+            cached = {}
+            if not refresh:
+                with span('cache.search'):
+                    cached = logger.get_cached_searches(queries)
+            for query, result in cached.items():
+                result['cached'] = True
+                emit('result', {'query': query, 'result': result})
+            counts['cached'] = len(cached)
+            print(f"📦 Batch of {len(queries)} queries ({len(cached)} cached)")
+            
+            futures = {
+                _batch_pool.submit(contextvars.copy_context().run, run_query, query): query
+                for query in queries if query not in cached
+            }
+            # Stale entries are revalidated like single-query hits (at most one refresh per query)
+            for query, result in cached.items():
+                if result['stale']:
+                    _refresh_stale_search(query, user_ip)
+            
+            pending = []
+            for future in as_completed(futures):
+                query = futures[future]
+                try:
+                    response = future.result()
+                except Exception as e:
+                    print(f"Error in batch query {query[:50]}: {e}")
+                    counts['failed'] += 1
+                    emit('error', {'query': query, 'error': str(e)})
+                    continue
+                emit('result', {'query': query, 'result': response})
+                pending.append((query, response))
+                if sum(len(done['web']) for _, done in pending) >= CLASSIFY_BATCH_SIZE:
+                    _classify_batch(pending, emit)
+                    pending = []
+            _classify_batch(pending, emit)
+        except Exception as e:
+            print(f"Error in batch endpoint: {e}")
+            emit('error', {'error': str(e)})
+        finally:
+            emit('done', counts)
+            events.put(None)
+    
+    threading.Thread(target=contextvars.copy_context().run, args=(run,), daemon=True).start()
+    
+    def generate():
+        while True:
+            line = events.get()
+            if line is None:
+                break
+            yield line
+    
+    return Response(
+        generate(),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/api/summarize', methods=['POST'])
 def summarize():
     """
@@ -930,16 +1549,102 @@ def add_to_collection(tag):
 @app.route('/api/archive', methods=['GET'])
 def get_archive():
     """
-    Get shared search archive for all users
+    Get shared search archive for all users, newest first. Params: ``limit``
+    (1-200), ``before`` (``<timestamp>,<id>`` from the previous page's
+    ``next_before``). Responses carry an ETag and answer If-None-Match with 304.
     """
+    before = request.args.get('before')
+    if before:
+        timestamp, _, entry_id = before.rpartition(',')
+        if not timestamp or not entry_id.isdigit():
+            return jsonify({'error': 'before must be <timestamp>,<id>'}), 400
+        before = (timestamp, int(entry_id))
     try:
-        limit = request.args.get('limit', 50, type=int)
-        archive = logger.get_shared_archive(limit=limit)
-        return jsonify({'archive': archive})
+        limit = max(1, min(request.args.get('limit', 50, type=int), 200))
+        archive = logger.get_shared_archive(limit=limit, before=before)
+        last = archive[-1] if len(archive) == limit else None
+        response = jsonify({
+            'archive': archive,
+            'next_before': f"{last['timestamp']},{last['id']}" if last else None,
+        })
+        response.add_etag()
+        # Older pages only change when retention removes entries; the first page
+        # changes with every URL search, so clients revalidate it each time
+        response.cache_control.public = True
+        if before:
+            response.cache_control.max_age = 300
+        else:
+            response.cache_control.no_cache = True
+        return response.make_conditional(request)
     except Exception as e:
         print(f"Error getting archive: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/archive/search', methods=['GET'])
+def search_archive():
+    """
+    Full-text search over the search archive (latest entries first): queries,
+    result titles and snippets, and cached results' titles. Params: ``q``, ``limit`` (1-100),
+    ``before`` (YYYY-MM-DD, only older entries).
+    """
+    text = request.args.get('q', '').strip()
+    if not text:
+        return jsonify({'error': 'No search text provided'}), 400
+    try:
+        limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+        matches = logger.search_history(text, limit=limit, before=request.args.get('before'))
+        return jsonify({'matches': matches})
+    except Exception as e:
+        print(f"Error searching archive: {e}")
+        return jsonify({'error': str(e)}), 500
+
+EXPORT_TOKEN = os.getenv('EXPORT_TOKEN')
+EXPORT_MIMETYPES = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson', 'json': 'application/json'}
+
+@app.route('/api/export', methods=['GET'])
+def export_searches():
+    """
+    Stream search history as CSV, JSONL or JSON, a date chunk at a time.
+
+    Query params: ``format`` (csv|jsonl|json, default jsonl), ``from`` / ``to``
+    (YYYY-MM-DD, inclusive), ``include_results=1``. Requires
+    ``Authorization: Bearer $EXPORT_TOKEN`` when EXPORT_TOKEN is set; without
+    it, export is only available outside production.
+    """
+    if EXPORT_TOKEN:
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {EXPORT_TOKEN}'):
+            return jsonify({'error': 'Unauthorized'}), 401
+    elif os.getenv('RAILWAY_ENVIRONMENT'):
+        return jsonify({'error': 'Export is disabled (EXPORT_TOKEN not set)'}), 404
+    
+    format = request.args.get('format', 'jsonl').lower()
+    date_from = request.args.get('from')
+    date_to = request.args.get('to')
+    if format not in EXPORT_MIMETYPES:
+        return jsonify({'error': "Unsupported format. Use 'csv', 'jsonl' or 'json'"}), 400
+    try:
+        for value in (date_from, date_to):
+            if value:
+                datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+    
+    chunks = logger.iter_export(
+        format,
+        date_from=date_from,
+        date_to=date_to,
+        include_results=request.args.get('include_results') in ('1', 'true'),
+    )
+    return Response(
+        chunks,
+        mimetype=EXPORT_MIMETYPES[format],
+        headers={
+            'Content-Disposition': f'attachment; filename=searches.{format}',
+            'Cache-Control': 'no-store',
+            'X-Accel-Buffering': 'no',
+        }
+    )
+
 @app.route('/api/health', methods=['GET'])
 def health():
     return jsonify({
@@ -960,7 +1665,6 @@ _curated_cache = {'data': None, 'fetched_at': None}
 @app.route('/api/curated-feed', methods=['GET'])
 def curated_feed():
     from datetime import timedelta
-    import praw
 
     now = datetime.utcnow()
     force_refresh = request.args.get('refresh') == '1'
@@ -969,61 +1673,56 @@ def curated_feed():
         if age < timedelta(hours=48):
             return jsonify(_curated_cache['data'])
 
-    client_id = os.getenv("REDDIT_CLIENT_ID")
-    client_secret = os.getenv("REDDIT_CLIENT_SECRET")
-    user_agent = os.getenv("REDDIT_USER_AGENT")
-    if not all([client_id, client_secret, user_agent]):
+    reddit = get_reddit_client()
+    if reddit is None:
         return jsonify({'error': 'Reddit credentials missing'}), 500
 
-    reddit = praw.Reddit(
-        client_id=client_id,
-        client_secret=client_secret,
-        user_agent=user_agent
-    )
-
-    from api.reddit import _fetch_top_comments, _clean_text_for_llm, _has_llm_refusal
+    from api.reddit import _fetch_top_comments
 
-    channels = []
-    for sub_info in CURATED_SUBREDDITS:
+    def fetch_channel(sub_info):
+        """Up to 3 discussed posts from a subreddit's hot and weekly top listings"""
         try:
             subreddit = reddit.subreddit(sub_info['name'])
             posts = []
             seen_ids = set()
 
-            for source in [subreddit.hot(limit=15), subreddit.top(time_filter='week', limit=10)]:
-                for post in source:
-                    if post.stickied or post.id in seen_ids:
-                        continue
-                    seen_ids.add(post.id)
-                    if post.num_comments == 0:
-                        continue
-                    top_comments = _fetch_top_comments(reddit, post.permalink, limit=2)
-
-                    posts.append({
-                        'title': post.title,
-                        'url': f"https://www.reddit.com{post.permalink}",
-                        'permalink': post.permalink,
-                        'score': post.score,
-                        'num_comments': post.num_comments,
-                        'created_utc': post.created_utc,
-                        'top_comments': top_comments
-                    })
+            with host_slot('reddit.com'):
+                for source in [subreddit.hot(limit=15), subreddit.top(time_filter='week', limit=10)]:
+                    for post in source:
+                        if post.stickied or post.id in seen_ids:
+                            continue
+                        seen_ids.add(post.id)
+                        if post.num_comments == 0:
+                            continue
+
+                        posts.append({
+                            'title': post.title,
+                            'url': f"https://www.reddit.com{post.permalink}",
+                            'permalink': post.permalink,
+                            'score': post.score,
+                            'num_comments': post.num_comments,
+                            'created_utc': post.created_utc,
+                            'top_comments': []
+                        })
+                        if len(posts) >= 3:
+                            break
                     if len(posts) >= 3:
                         break
-                if len(posts) >= 3:
-                    break
-            channels.append({
-                'subreddit': sub_info['name'],
-                'label': sub_info['label'],
-                'posts': posts
-            })
         except Exception as e:
             print(f"⚠️ Failed to fetch r/{sub_info['name']}: {e}")
-            channels.append({
-                'subreddit': sub_info['name'],
-                'label': sub_info['label'],
-                'posts': []
-            })
+            posts = []
+        return {
+            'subreddit': sub_info['name'],
+            'label': sub_info['label'],
+            'posts': posts
+        }
+
+    def fetch_comments(post):
+        post['top_comments'] = _fetch_top_comments(reddit, post['permalink'], limit=2)
+
+    # Listings, then every post's comments, each concurrently on the shared I/O pool
+    channels = map_concurrent(fetch_channel, CURATED_SUBREDDITS)
+    map_concurrent(fetch_comments, [post for channel in channels for post in channel['posts']])
 
     has_posts = any(len(ch['posts']) > 0 for ch in channels)
     if has_posts:
@@ -1084,13 +1783,18 @@ def get_trending_reactions(topic):
     """
     Get combined reactions (Reddit, Web, Twitter) for a trending topic.
     Uses a 10-minute in-memory cache to avoid redundant API calls.
-    Pass ?refresh=1 to bypass the cache.
+    Pass ?refresh=1 to bypass all caches, or ?refresh=twitter (comma-separated
+    sources) to re-run only those; the others come from their per-source caches.
+    Sources that miss the request deadline are returned empty and reported in
+    the ``sources`` status map.
     """
-    force = request.args.get('refresh') == '1'
+    refresh = _parse_refresh(request.args.get('refresh'))
+    g.trace_query = topic
 
-    if not force and topic in _trending_cache:
+    if not refresh and topic in _trending_cache:
         entry = _trending_cache[topic]
         if time.time() - entry['ts'] < TRENDING_CACHE_TTL:
+            g.trace_cached = True
             print(f"📈 Returning cached trending results for: {topic} (age {int(time.time()-entry['ts'])}s)")
             return jsonify(entry['data'])
 
@@ -1106,24 +1810,37 @@ def get_trending_reactions(topic):
         query = topic_queries.get(topic.lower(), topic.replace('-', ' '))
         user_ip = request.headers.get('X-Forwarded-For', request.remote_addr)
         
-        with ThreadPoolExecutor(max_workers=3) as executor:
-            reddit_future = executor.submit(search_reddit_posts, query, limit=5)
-            web_future = executor.submit(search_news, query, user_ip=user_ip)
-            twitter_future = executor.submit(get_trending_tweets, topic, limit=10)
-            
-            reddit_results = reddit_future.result(timeout=30)
-            web_results = web_future.result(timeout=30)[:5]
-            twitter_results = twitter_future.result(timeout=30)
+        deadline = Deadline(TRENDING_DEADLINE_SECONDS)
+        sources = SourceTracker(deadline)
+        reddit_future = submit_source(
+            sources.run, 'reddit', _search_reddit_cached, query, refresh, limit=5, deadline=deadline
+        )
+        web_future = submit_source(
+            sources.run, 'web', _cached_source, 'web', query, refresh,
+            search_news, query, query=query, user_ip=user_ip, deadline=deadline
+        )
+        twitter_future = submit_source(
+            sources.run, 'twitter', _cached_source, 'twitter', f"trending:{topic.lower()}", refresh,
+            get_trending_tweets, topic, query=query, limit=10, deadline=deadline
+        )
+        
+        reddit_results = sources.collect('reddit', reddit_future, [])
+        web_results = sources.collect('web', web_future, [])[:5]
+        twitter_results = sources.collect('twitter', twitter_future, [])
         
         result = {
             'topic': topic,
             'query': query,
             'reddit': reddit_results,
             'web': web_results,
-            'twitter': twitter_results
+            'twitter': twitter_results,
+            'partial': not sources.complete,
+            'sources': sources.summary()
         }
 
-        _trending_cache[topic] = {'data': result, 'ts': time.time()}
+        # Only cache complete results so the next request retries slow sources
+        if sources.complete:
+            _trending_cache[topic] = {'data': result, 'ts': time.time()}
         return jsonify(result)
         
     except Exception as e:
@@ -1166,11 +1883,36 @@ if not os.getenv('RAILWAY_ENVIRONMENT'):
         
         return jsonify(result)
 
+def _commentary_audio_url(audio_id):
+    return f'/api/meta-commentary/audio/{audio_id}'
+
+@app.route('/api/meta-commentary/audio/<audio_id>', methods=['GET'])
+def commentary_audio(audio_id):
+    """
+    Serve commentary audio as a binary resource. audio_id is the SHA-256 of the
+    audio, so responses are immutable; supports Range and If-None-Match.
+    """
+    audio = logger.get_commentary_audio(audio_id)
+    if not audio:
+        return jsonify({'error': 'Audio not found'}), 404
+    
+    data, mime_type = audio
+    response = send_file(
+        io.BytesIO(data),
+        mimetype=mime_type or 'audio/mpeg',
+        conditional=True,
+        etag=audio_id,
+        max_age=31536000,
+    )
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
 @app.route('/api/meta-commentary/check', methods=['POST'])
 def check_cached_commentary():
     """
     Check if cached commentary exists for an article.
-    Returns the cached audio if available, otherwise returns null.
+    Returns the cached text and its audio URL if available, otherwise returns null.
     """
     try:
         data = request.get_json()
@@ -1181,20 +1923,20 @@ def check_cached_commentary():
         if cache_key:
             cached = logger.get_cached_commentary(cache_key)
             
-            if cached and cached.get('audio'):
+            if cached and cached.get('audio_id'):
                 print(f"✅ Found cached commentary for: {cache_key[:50]}...")
                 return jsonify({
                     'text': cached['text'],
-                    'audio': cached['audio'],
+                    'audio_url': _commentary_audio_url(cached['audio_id']),
                     'mime_type': cached['mime_type'],
                     'cached': True
                 })
         
-        return jsonify({'cached': False, 'audio': None})
+        return jsonify({'cached': False, 'audio_url': None})
         
     except Exception as e:
         print(f"❌ Error checking cached commentary: {e}")
-        return jsonify({'cached': False, 'audio': None})
+        return jsonify({'cached': False, 'audio_url': None})
 
 @app.route('/api/meta-commentary', methods=['POST'])
 def meta_commentary():
@@ -1209,7 +1951,7 @@ def meta_commentary():
     
     Returns:
     - text: the generated commentary
-    - audio: base64-encoded audio (mp3)
+    - audio_url: URL of the audio (mp3), see /api/meta-commentary/audio/<id>
     - mime_type: audio mime type
     - cached: boolean indicating if result was from cache
     """
@@ -1230,11 +1972,11 @@ def meta_commentary():
         if cache_key:
             try:
                 cached = logger.get_cached_commentary(cache_key)
-                if cached and cached.get('audio'):
+                if cached and cached.get('audio_id'):
                     print(f"✅ Returning cached commentary for: {cache_key[:50]}...")
                     return jsonify({
                         'text': cached['text'],
-                        'audio': cached['audio'],
+                        'audio_url': _commentary_audio_url(cached['audio_id']),
                         'mime_type': cached['mime_type'],
                         'cached': True
                     })
@@ -1255,33 +1997,33 @@ def meta_commentary():
             return jsonify({
                 'error': f'Audio generation failed: {str(gen_error)}',
                 'text': None,
-                'audio': None
+                'audio_url': None
             }), 500
         
         text = result.get('text', '')
         audio = result.get('audio')
+        mime_type = result.get('mime_type', 'audio/mp3')
+        audio_url = None
         
         print(f"✅ Commentary generated: {len(text)} chars")
         print(f"🔊 Audio generated: {'Yes' if audio else 'No'}")
         
-        # Cache the result if successful
+        # Cache the result if successful (the audio URL points at the cached copy)
         if cache_key and audio:
             try:
-                logger.cache_commentary(
-                    cache_key,
-                    text,
-                    audio,
-                    result.get('mime_type', 'audio/mp3')
-                )
+                audio_url = _commentary_audio_url(logger.cache_commentary(cache_key, text, audio, mime_type))
                 print(f"💾 Cached commentary for: {cache_key[:50]}...")
             except Exception as cache_error:
                 print(f"⚠️ Failed to cache commentary: {cache_error}")
+        if audio and not audio_url:
+            # Nothing to serve it from; fall back to an inline data URL
+            audio_url = f"data:{mime_type};base64,{base64.b64encode(audio).decode('utf-8')}"
         
         # Return text even if audio failed
         response_data = {
             'text': text,
-            'audio': audio,
-            'mime_type': result.get('mime_type', 'audio/mp3'),
+            'audio_url': audio_url,
+            'mime_type': mime_type,
             'cached': False
         }
         
@@ -1294,7 +2036,7 @@ def meta_commentary():
         print(f"❌ Error in meta-commentary endpoint: {e}")
         import traceback
         traceback.print_exc()
-        return jsonify({'error': str(e), 'text': None, 'audio': None}), 500
+        return jsonify({'error': str(e), 'text': None, 'audio_url': None}), 500
 
 # Serve static files and SPA routing
 # Primary: Vite build output. Fallback: project root (favicons, etc.)
@@ -849,11 +849,10 @@ export default function App() {
       
       if (response.ok) {
         const data = await response.json();
-        if (data.cached && data.audio) {
+        if (data.cached && data.audio_url) {
           console.log('✅ Found cached commentary');
           setMetaText(data.text || '');
-          const mimeType = data.mime_type || 'audio/mp3';
-          setMetaAudio(`data:${mimeType};base64,${data.audio}`);
+          setMetaAudio(data.audio_url);
         }
       }
     } catch (error) {
@@ -885,16 +884,15 @@ export default function App() {
       
       const data = await response.json();
       
-      if (data.error && !data.audio) {
+      if (data.error && !data.audio_url) {
         setMetaError(data.error);
         if (data.text) {
           setMetaText(data.text);
         }
       } else {
         setMetaText(data.text || '');
-        if (data.audio) {
-          const mimeType = data.mime_type || 'audio/mp3';
-          setMetaAudio(`data:${mimeType};base64,${data.audio}`);
+        if (data.audio_url) {
+          setMetaAudio(data.audio_url);
         }
       }
     } catch (error) {
@@ -940,6 +938,42 @@ export default function App() {
     return `${baseURL}/?q=${encodeURIComponent(searchQuery)}`;
   };
 
+  // Read the NDJSON event stream from /api/reactions/stream, calling onEvent for
+  // each partial result. Resolves with the payload of the final 'done' event.
+  const readReactionStream = async (response, onEvent) => {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let finalPayload = null;
+    
+    const handleLine = (line) => {
+      if (!line.trim()) return;
+      const { event, data } = JSON.parse(line);
+      if (event === 'done') {
+        finalPayload = data;
+      } else if (event === 'error') {
+        throw new Error(data.error || 'Search failed');
+      } else {
+        onEvent(event, data);
+      }
+    };
+    
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      const lines = buffer.split('\n');
+      buffer = lines.pop();
+      lines.forEach(handleLine);
+    }
+    handleLine(buffer);
+    
+    if (!finalPayload) {
+      throw new Error('Reaction stream ended without a result');
+    }
+    return finalPayload;
+  };
+
   // Separate function to perform search (used by both handleSearch and URL parameter loading)
   const performSearch = async (searchQuery, sourcePost = null) => {
     // First, check if we have cached results (for shared links)
@@ -1005,7 +1039,7 @@ export default function App() {
     // Not cached - show loading UI and perform full search
     setLoading(true);
     try {
-      const response = await fetch('/api/reactions', {
+      const response = await fetch('/api/reactions/stream', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ query: searchQuery, skip_cache: true })
@@ -1015,7 +1049,37 @@ export default function App() {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
       
-      const data = await response.json();
+      // Render each source as soon as it arrives; the final event carries the complete payload
+      let clearedPrevious = false;
+      const data = await readReactionStream(response, (event, payload) => {
+        if (!clearedPrevious) {
+          clearedPrevious = true;
+          setNews([]);
+          setReddit([]);
+          setSubstack([]);
+          setArticle(null);
+        }
+        if (event === 'article') {
+          setArticle(payload);
+          setHasSearched(true);
+        } else if (event === 'summary') {
+          setArticle(prev => prev ? { ...prev, summary: payload.summary } : prev);
+        } else if (event === 'web' || event === 'classification') {
+          if (event === 'web') {
+            setNews(Array.isArray(payload) ? payload : []);
+          } else {
+            const labels = new Map(payload.map(c => [c.url, c]));
+            setNews(prev => prev.map(r => labels.has(r.url) ? { ...r, ...labels.get(r.url) } : r));
+          }
+          setHasSearched(true);
+        } else if (event === 'substack') {
+          setSubstack(Array.isArray(payload) ? payload : []);
+          setHasSearched(true);
+        } else if (event === 'reddit') {
+          setReddit(Array.isArray(payload) ? payload : []);
+          setHasSearched(true);
+        }
+      });
       console.log('API Response:', data); // Debug log
       
       // Validate and clean the response data
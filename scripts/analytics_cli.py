@@ -47,6 +47,12 @@ def show_stats(days=30):
     print(f"\n📈 Search Types:")
     for search_type in analytics['search_types']:
         print(f"  {search_type['type']}: {search_type['count']} searches")
+    
+    processing = analytics['processing_time']
+    avg = processing['avg_seconds']
+    print(f"\n⏱️ Processing Time (avg {f'{avg:.2f}s' if avg is not None else 'N/A'}):")
+    for bucket, count in processing['histogram'].items():
+        print(f"  {bucket:>6}: {count}")
 
 def show_history(limit=20, search_type=None, days=7):
     """Show recent search history"""
@@ -66,36 +72,68 @@ def show_history(limit=20, search_type=None, days=7):
         
         print(f"{timestamp} | {item['search_type']:<5} | {results:2d} results | {time_str:<6} | {query}")
 
-def export_data(format_type='json', days=30, output_file=None):
-    """Export search data"""
+def export_data(format_type='json', days=30, output_file=None, include_results=False, chunk_days=1):
+    """Export search data, streamed a date chunk at a time"""
     logger = SearchLogger()
     date_from = (datetime.now() - timedelta(days=days)).date() if days else None
     
-    data = logger.export_data(format=format_type, date_from=date_from)
+    chunks = logger.iter_export(format_type, date_from=date_from, include_results=include_results, chunk_days=chunk_days)
     
     if output_file:
-        with open(output_file, 'w') as f:
-            f.write(data)
+        with open(output_file, 'w', newline='') as f:
+            f.writelines(chunks)
         print(f"✅ Data exported to {output_file}")
     else:
-        print(data)
+        sys.stdout.writelines(chunks)
 
-def search_queries(pattern):
-    """Search for specific queries in history"""
+def search_queries(pattern, limit=50, before=None):
+    """Full-text search over queries, result titles/snippets and cached results"""
     logger = SearchLogger()
-    history = logger.get_search_history(limit=1000)
-    
-    matches = [item for item in history if pattern.lower() in item['query'].lower()]
+    matches = logger.search_history(pattern, limit=limit, before=before)
     
-    print(f"\n🔍 Found {len(matches)} searches matching '{pattern}':")
+    print(f"\n🔍 Found {len(matches)} matches for '{pattern}':")
     print("=" * 80)
     
     for item in matches:
         timestamp = format_date(item['timestamp'])
-        query = item['query'][:50] + "..." if len(item['query']) > 50 else item['query']
-        results = item['results_count']
+        query = item['query'] or ''
+        query = query[:40] + "..." if len(query) > 40 else query
         
-        print(f"{timestamp} | {item['search_type']:<5} | {results:2d} results | {query}")
+        print(f"{timestamp} | {item['kind']:<6} | {query:<43} | {item['snippet']}")
+
+def show_stages(days=7, endpoint=None):
+    """Show p50/p95 latency per request stage"""
+    logger = SearchLogger()
+    latency = logger.get_stage_latency(days=days, endpoint=endpoint)
+    
+    print(f"\n⏱️ Stage Latency (Last {days} days{', ' + endpoint if endpoint else ''})")
+    print("=" * 70)
+    print(f"{'Stage':<24} {'Count':>7} {'p50 (ms)':>11} {'p95 (ms)':>11} {'Max (ms)':>11}")
+    
+    for row in latency:
+        print(f"{row['stage']:<24} {row['count']:>7} {row['p50_ms']:>11.1f} {row['p95_ms']:>11.1f} {row['max_ms']:>11.1f}")
+
+def rebuild_analytics():
+    """Recompute the daily analytics rollup from raw searches"""
+    logger = SearchLogger()
+    days = logger.rebuild_daily_analytics()
+    print(f"📊 Rebuilt daily analytics for {days} days")
+
+def maintain(days=None, batch_size=None, convert=False):
+    """Roll up and delete old search history, then reclaim the freed space"""
+    logger = SearchLogger()
+    report = logger.maintain_search_history(days=days, batch_size=batch_size, convert=convert)
+    
+    print(f"\n🧹 Search History Maintenance (before {report['cutoff']})")
+    print("=" * 50)
+    print(f"Searches deleted: {report['searches_deleted']}")
+    print(f"Results deleted: {report['results_deleted']}")
+    print(f"Request spans deleted: {report['spans_deleted']}")
+    print(f"Raw payloads purged: {report['payloads_purged']}")
+    print(f"Rows/sec: {report['rows_per_second']:.0f} ({report['seconds']:.2f}s)")
+    print(f"Database size: {report['bytes_before'] / 1024:.0f} KB -> {report['bytes_after'] / 1024:.0f} KB "
+          f"(reclaimed {report['reclaimed_bytes'] / 1024:.0f} KB)")
+    print(f"Incremental vacuum: {'on' if report['incremental_vacuum'] else 'off (run with --convert once)'}")
 
 def main():
     parser = argparse.ArgumentParser(description='Search Analytics CLI Tool')
@@ -113,13 +151,31 @@ def main():
     
     # Export command
     export_parser = subparsers.add_parser('export', help='Export search data')
-    export_parser.add_argument('--format', choices=['json', 'csv'], default='json', help='Export format (default: json)')
-    export_parser.add_argument('--days', type=int, default=30, help='Number of days to export (default: 30)')
+    export_parser.add_argument('--format', choices=['json', 'jsonl', 'csv'], default='json', help='Export format (default: json)')
+    export_parser.add_argument('--days', type=int, default=30, help='Number of days to export, 0 for all (default: 30)')
     export_parser.add_argument('--output', help='Output file path')
+    export_parser.add_argument('--include-results', action='store_true', help='Include each search\'s results')
+    export_parser.add_argument('--chunk-days', type=int, default=1, help='Days read per query (default: 1)')
     
     # Search command
-    search_parser = subparsers.add_parser('search', help='Search for specific queries')
-    search_parser.add_argument('pattern', help='Pattern to search for in queries')
+    search_parser = subparsers.add_parser('search', help='Full-text search over search history')
+    search_parser.add_argument('pattern', help='Words to search for in queries and result titles')
+    search_parser.add_argument('--limit', type=int, default=50, help='Number of matches to show (default: 50)')
+    search_parser.add_argument('--before', help='Only match entries before this date (YYYY-MM-DD)')
+    
+    # Stages command
+    stages_parser = subparsers.add_parser('stages', help='Show p50/p95 latency per request stage')
+    stages_parser.add_argument('--days', type=int, default=7, help='Number of days to analyze (default: 7)')
+    stages_parser.add_argument('--endpoint', help='Filter by endpoint (e.g. /api/reactions)')
+    
+    # Rebuild analytics command
+    subparsers.add_parser('rebuild-analytics', help='Recompute daily analytics from raw searches')
+    
+    # Maintenance command
+    maintain_parser = subparsers.add_parser('maintain', help='Roll up and delete old searches, then vacuum')
+    maintain_parser.add_argument('--days', type=int, help='Keep raw searches for this many days (default: SEARCH_HISTORY_RETENTION_DAYS)')
+    maintain_parser.add_argument('--batch-size', type=int, help='Searches deleted per transaction (default: MAINTENANCE_BATCH_SIZE)')
+    maintain_parser.add_argument('--convert', action='store_true', help='Switch the database to incremental auto_vacuum first (one-time full VACUUM)')
     
     args = parser.parse_args()
     
@@ -133,9 +189,15 @@ def main():
         elif args.command == 'history':
             show_history(args.limit, args.type, args.days)
         elif args.command == 'export':
-            export_data(args.format, args.days, args.output)
+            export_data(args.format, args.days, args.output, args.include_results, args.chunk_days)
         elif args.command == 'search':
-            search_queries(args.pattern)
+            search_queries(args.pattern, args.limit, args.before)
+        elif args.command == 'stages':
+            show_stages(args.days, args.endpoint)
+        elif args.command == 'rebuild-analytics':
+            rebuild_analytics()
+        elif args.command == 'maintain':
+            maintain(args.days, args.batch_size, args.convert)
     except Exception as e:
         print(f"❌ Error: {e}", file=sys.stderr)
         sys.exit(1)
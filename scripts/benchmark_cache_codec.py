@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Compare cached_searches storage: plain JSON text (decode + re-encode per hit)
+vs the compressed payload_codec format (stored bytes served directly).
+Reads entries from an existing database; without any, uses a synthetic
+payload shaped like a /api/reactions response.
+Usage: python scripts/benchmark_cache_codec.py [--db search_history.db] [--runs 200]
+"""
+
+import argparse
+import gzip
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api import payload_codec
+
+
+WORDS = ('the policy vote court market report climate election senate ruling war deal city '
+         'people said would could new year government public data study users platform media').split()
+
+
+def _text(words):
+    return ' '.join(random.choice(WORDS) for _ in range(words))
+
+
+def synthetic_payload():
+    random.seed(1)
+    return {
+        'web': [{'title': _text(8), 'url': f'https://example{i}.com/{_text(3).replace(" ", "-")}',
+                 'summary': _text(40), 'category': 'news'} for i in range(10)],
+        'reddit': [{'title': _text(10), 'url': f'https://reddit.com/r/news/comments/{i}', 'summary': _text(120),
+                    'top_comments': [{'body': _text(60), 'score': random.randint(1, 500)} for _ in range(5)]}
+                   for i in range(5)],
+        'substack': [{'title': _text(8), 'url': f'https://writer{i}.substack.com/p/{i}', 'summary': _text(50)}
+                     for i in range(5)],
+        'article': {'title': _text(10), 'source': 'Example', 'summary': _text(150)},
+        'partial': False,
+    }
+
+
+def load_payloads(db_path):
+    if not os.path.exists(db_path):
+        return []
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute('SELECT results_json FROM cached_searches').fetchall()
+    conn.close()
+    return [payload_codec.decode(row[0]) for row in rows]
+
+
+def timed(fn, runs):
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn()
+    return (time.perf_counter() - start) / runs * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cached payload encoding benchmark')
+    parser.add_argument('--db', default='search_history.db', help='Database to read cached_searches from')
+    parser.add_argument('--runs', type=int, default=200, help='Timed runs per entry (default: 200)')
+    args = parser.parse_args()
+
+    payloads = load_payloads(args.db)
+    source = f'{len(payloads)} entries from {args.db}'
+    if not payloads:
+        payloads = [synthetic_payload()]
+        source = 'synthetic reactions payload'
+
+    text_bytes = stored_bytes = 0
+    old_ms = old_gzip_ms = new_gzip_ms = new_plain_ms = 0.0
+    fields = {'stale': False, 'cached': True}
+    for payload in payloads:
+        text = json.dumps(payload)
+        blob = payload_codec.encode(payload)
+        text_bytes += len(text.encode())
+        stored_bytes += len(blob)
+
+        def old_hit():
+            results = json.loads(text)
+            results.update(fields)
+            return json.dumps(results).encode()  # what jsonify does
+
+        old_ms += timed(old_hit, args.runs)
+        old_gzip_ms += timed(lambda: gzip.compress(old_hit(), 6), args.runs)
+        new_gzip_ms += timed(lambda: payload_codec.splice_gzip(blob, fields), args.runs)
+        new_plain_ms += timed(lambda: payload_codec.splice_json(blob, fields), args.runs)
+
+    count = len(payloads)
+    print(f"\n📦 Cached payloads ({source})")
+    print("=" * 60)
+    print(f"Stored size, JSON text:       {text_bytes / count / 1024:8.1f} KB/entry")
+    print(f"Stored size, payload_codec:   {stored_bytes / count / 1024:8.1f} KB/entry "
+          f"({stored_bytes / text_bytes:.0%})")
+    print(f"Hit, json.loads + dumps:      {old_ms / count:8.3f} ms")
+    print(f"Hit, ... + gzip response:     {old_gzip_ms / count:8.3f} ms")
+    print(f"Hit, stored bytes as gzip:    {new_gzip_ms / count:8.3f} ms")
+    print(f"Hit, stored bytes inflated:   {new_plain_ms / count:8.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
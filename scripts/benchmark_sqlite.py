@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark SearchLogger's SQLite access: connect-per-call (old behaviour,
+rollback journal) vs per-thread long-lived connections with WAL.
+Usage: python scripts/benchmark_sqlite.py [--threads 8] [--ops 200]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.search_logger import SearchLogger
+
+
+class ConnectPerCallLogger(SearchLogger):
+    """SearchLogger as it was: a fresh connection per call, default journal mode"""
+
+    @contextmanager
+    def connection(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('PRAGMA journal_mode=DELETE')
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[max(0, int(len(values) * pct / 100 + 0.5) - 1)]
+
+
+def time_connection_overhead(logger, calls):
+    """Average cost of getting a connection and running a trivial query"""
+    start = time.perf_counter()
+    for _ in range(calls):
+        with logger.connection() as conn:
+            conn.execute('SELECT 1').fetchone()
+    return (time.perf_counter() - start) / calls * 1000
+
+
+def run_mixed_workload(logger, threads, ops):
+    """
+    Each thread alternates cache writes and reads. Returns per-op latencies
+    (ms) for reads and writes and the number of 'database is locked' errors.
+    """
+    reads, writes, errors = [], [], []
+    lock = threading.Lock()
+
+    def worker(n):
+        my_reads, my_writes, my_errors = [], [], 0
+        for i in range(ops):
+            query = f'https://example.com/{n}/{i % 20}'
+            start = time.perf_counter()
+            try:
+                if i % 4 == 0:
+                    logger.cache_search(query, {'web': [{'title': 'x' * 200}] * 5})
+                    my_writes.append((time.perf_counter() - start) * 1000)
+                else:
+                    logger.get_cached_search(query)
+                    my_reads.append((time.perf_counter() - start) * 1000)
+            except sqlite3.OperationalError:
+                my_errors += 1
+        with lock:
+            reads.extend(my_reads)
+            writes.extend(my_writes)
+            errors.append(my_errors)
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return reads, writes, sum(errors), time.perf_counter() - started
+
+
+def report(name, logger, threads, ops):
+    overhead = time_connection_overhead(logger, 500)
+    reads, writes, errors, elapsed = run_mixed_workload(logger, threads, ops)
+
+    # Lock wait: how much slower an op is under contention than uncontended
+    baseline = percentile(run_mixed_workload(logger, 1, ops)[1], 50)
+    print(f"\n📊 {name}")
+    print("=" * 60)
+    print(f"Connection + SELECT 1:   {overhead:8.3f} ms/call")
+    print(f"Throughput:              {(threads * ops) / elapsed:8.0f} ops/s ({threads} threads)")
+    print(f"Reads  p50/p95/max:      {percentile(reads, 50):7.2f} / {percentile(reads, 95):7.2f} / {max(reads):7.2f} ms")
+    print(f"Writes p50/p95/max:      {percentile(writes, 50):7.2f} / {percentile(writes, 95):7.2f} / {max(writes):7.2f} ms")
+    print(f"Write lock wait (p95):   {max(0.0, percentile(writes, 95) - baseline):8.2f} ms over uncontended p50")
+    print(f"'database is locked':    {errors:8d}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SearchLogger SQLite benchmark')
+    parser.add_argument('--threads', type=int, default=8, help='Concurrent threads (default: 8)')
+    parser.add_argument('--ops', type=int, default=200, help='Operations per thread (default: 200)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        report('Before: connect per call, rollback journal',
+               ConnectPerCallLogger(os.path.join(tmp, 'before.db')), args.threads, args.ops)
+        report('After: per-thread connections, WAL',
+               SearchLogger(os.path.join(tmp, 'after.db')), args.threads, args.ops)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,10 @@
 import os
-import requests
 import time
 from dotenv import load_dotenv
+from api import serpapi
+from api.deadline import DeadlineExceeded, PartialResults
 from api.search_logger import SearchLogger
+from api.spans import span
 
 load_dotenv()
 # Support both naming conventions for the SerpAPI key
@@ -11,7 +13,11 @@ SERP_API_KEY = os.getenv("SERPAPI_API_KEY") or os.getenv("SERPAPI_KEY")
 # Initialize search logger
 search_logger = SearchLogger()
 
-def search_news(query, num_results=5, user_ip=None):
+def search_news(query, num_results=5, user_ip=None, deadline=None):
+    """
+    Google results for query via SerpAPI. Failures (after the client's retries)
+    are logged and re-raised, so callers don't cache them as "no results".
+    """
     start_time = time.time()
     
     # Check if API key is available
@@ -19,7 +25,6 @@ def search_news(query, num_results=5, user_ip=None):
         print("⚠️  SERPAPI_API_KEY not set - web search will be disabled")
         return []
     
-    url = "https://serpapi.com/search"
     params = {
         "q": query,
         "api_key": SERP_API_KEY,
@@ -30,9 +35,8 @@ def search_news(query, num_results=5, user_ip=None):
     }
 
     try:
-        response = requests.get(url, params=params, timeout=15)
-        response.raise_for_status()
-        data = response.json()
+        with span('serpapi.news'):
+            data = serpapi.search(params, deadline=deadline)
         results = data.get("organic_results", [])
         
         # Return list of dicts with title, url, and summary (like Reddit structure)
@@ -47,9 +51,9 @@ def search_news(query, num_results=5, user_ip=None):
         # Calculate processing time
         processing_time = time.time() - start_time
         
-        # Log the search (optional - don't fail if logging fails)
+        # Queue the search for logging off the request path (optional - don't fail if logging fails)
         try:
-            search_logger.log_search(
+            search_logger.enqueue_search(
                 query=query,
                 search_type="news",
                 user_ip=user_ip,
@@ -68,7 +72,7 @@ def search_news(query, num_results=5, user_ip=None):
         # Log failed search (optional - don't fail if logging fails)
         processing_time = time.time() - start_time
         try:
-            search_logger.log_search(
+            search_logger.enqueue_search(
                 query=query,
                 search_type="news",
                 user_ip=user_ip,
@@ -82,17 +86,22 @@ def search_news(query, num_results=5, user_ip=None):
             # Continue without failing
         
         print(f"Error in search_news: {e}")
-        return []
+        raise
 
 
-def search_substack(query, num_results=5, user_ip=None):
-    """Search for Substack articles using two strategies to catch custom domains."""
+def search_substack(query, num_results=5, user_ip=None, deadline=None):
+    """
+    Search for Substack articles using two strategies to catch custom domains.
+    A strategy that still fails after the client's retries doesn't stop the
+    other. If both fail the last error is re-raised; if only one does (or the
+    deadline cuts the second short), PartialResults / DeadlineExceeded carries
+    the other's results, so they are used but not cached.
+    """
     start_time = time.time()
     
     if not SERP_API_KEY:
         return []
     
-    url = "https://serpapi.com/search"
     seen_urls = set()
     substack_results = []
     
@@ -101,9 +110,13 @@ def search_substack(query, num_results=5, user_ip=None):
         f'"substack" {query}',
     ]
     
+    succeeded = 0
+    error = None
     for search_query in queries:
         if len(substack_results) >= num_results:
             break
+        if deadline and deadline.expired:
+            raise DeadlineExceeded("Substack search", partial=substack_results[:num_results] if succeeded else None)
         try:
             params = {
                 "q": search_query,
@@ -113,9 +126,8 @@ def search_substack(query, num_results=5, user_ip=None):
                 "hl": "en",
                 "gl": "us"
             }
-            response = requests.get(url, params=params, timeout=15)
-            response.raise_for_status()
-            data = response.json()
+            with span('serpapi.substack'):
+                data = serpapi.search(params, deadline=deadline)
             
             for res in data.get("organic_results", []):
                 link = res.get("link", "")
@@ -130,9 +142,19 @@ def search_substack(query, num_results=5, user_ip=None):
                     "summary": res.get("snippet", ""),
                     "type": "Substack"
                 })
+            succeeded += 1
+        except DeadlineExceeded:
+            if succeeded:
+                raise DeadlineExceeded("Substack search", partial=substack_results[:num_results])
+            raise
         except Exception as e:
             print(f"⚠️ Substack search query failed ({search_query[:40]}...): {e}")
-            continue
+            error = e
+    
+    if error is not None:
+        if not succeeded:
+            raise error
+        raise PartialResults(str(error), partial=substack_results[:num_results])
     
     substack_results = substack_results[:num_results]
     processing_time = time.time() - start_time
@@ -1,7 +1,9 @@
 import os
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import OpenAI, NOT_GIVEN
 import google.generativeai as genai
+from api.executor import host_slot
+from api.spans import span
 
 load_dotenv()
 
@@ -19,9 +21,10 @@ def get_openai_client():
         _client = OpenAI(api_key=api_key)
     return _client
 
-def summarize_text(text, task="Summarize this content accurately and concisely."):
+def summarize_text(text, task="Summarize this content accurately and concisely.", deadline=None):
     """
     Summarize text using OpenAI, with Gemini fallback.
+    If a request ``deadline`` is given, each LLM call is capped by the time left.
     
     IMPORTANT: The LLM is instructed to only use information explicitly present
     in the provided text - no hallucination of names, titles, or facts.
@@ -41,14 +44,16 @@ CRITICAL RULES:
     try:
         client = get_openai_client()
         if client:
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": text}
-                ],
-                temperature=0.3  # Lower temperature for more factual output
-            )
+            with span('llm.openai'), host_slot('api.openai.com'):
+                response = client.chat.completions.create(
+                    model="gpt-4",
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": text}
+                    ],
+                    temperature=0.3,  # Lower temperature for more factual output
+                    timeout=deadline.timeout(60) if deadline else NOT_GIVEN
+                )
             return response.choices[0].message.content
     except Exception as e:
         print(f"⚠️ OpenAI summarization failed: {e}")
@@ -56,13 +61,17 @@ CRITICAL RULES:
     
     # Fallback to Gemini
     gemini_key = os.getenv("GEMINI_API_KEY")
-    if gemini_key:
+    if gemini_key and not (deadline and deadline.expired):
         try:
             genai.configure(api_key=gemini_key)
             model = genai.GenerativeModel('gemini-2.0-flash')
             
             full_prompt = f"{system_prompt}\n\nText to summarize:\n{text}"
-            response = model.generate_content(full_prompt)
+            with span('llm.gemini'), host_slot('generativelanguage.googleapis.com'):
+                response = model.generate_content(
+                    full_prompt,
+                    request_options={'timeout': deadline.timeout(60)} if deadline else None
+                )
             
             return response.text
         except Exception as e:
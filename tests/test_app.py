@@ -0,0 +1,352 @@
+"""Route tests for app.py — run through the Flask test client against a temporary database."""
+
+import json
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+import app as app_module
+from api.search_logger import SearchLogger
+from api.singleflight import SingleFlight
+
+
+@pytest.fixture
+def search_logger(tmp_path, monkeypatch):
+    search_logger = SearchLogger(db_path=str(tmp_path / "test.db"))
+    monkeypatch.setattr(app_module, "logger", search_logger)
+    monkeypatch.setattr(app_module, "single_flight", SingleFlight(search_logger))
+    return search_logger
+
+
+@pytest.fixture
+def client(search_logger):
+    return app_module.app.test_client()
+
+
+SOURCE_DELAY = 0.3
+
+
+@pytest.fixture
+def stub_sources(search_logger, monkeypatch):
+    """Replace every network-bound source with a stub; returns the classifier's calls."""
+    def slow(results):
+        def source(*args, **kwargs):
+            time.sleep(SOURCE_DELAY)
+            return [dict(r) for r in results]
+        return source
+
+    classified = []
+
+    def classify(results, article_title=None, deadline=None, article_titles=None):
+        classified.append(article_titles or [article_title] * len(results))
+        for r in results:
+            r["category_label"] = "Analysis"
+        return results
+
+    monkeypatch.setattr(app_module, "extract_article_metadata",
+                        lambda url, deadline=None: {"title": f"Title of {url}", "source": "Example"})
+    monkeypatch.setattr(app_module, "_summarize_article", lambda article, deadline=None: "Summary")
+    monkeypatch.setattr(app_module, "search_news", slow([{"title": "Web A", "url": "https://news.com/a"}]))
+    monkeypatch.setattr(app_module, "search_substack",
+                        slow([{"title": "Sub A", "url": "https://a.substack.com/p/a", "type": "Substack"}]))
+    monkeypatch.setattr(app_module, "search_reddit_posts", slow([{"title": "Reddit A", "url": "https://reddit.com/r/x/1"}]))
+    monkeypatch.setattr(app_module, "classify_web_results", classify)
+    return classified
+
+
+# ── /api/archive ─────────────────────────────────────────────────────────────
+
+
+class TestArchive:
+    """Tests for the keyset-paged shared archive endpoint."""
+
+    @pytest.fixture(autouse=True)
+    def entries(self, search_logger):
+        search_logger.log_searches([
+            {"query": f"https://x.com/{i}", "search_type": "url", "timestamp": f"2024-01-0{i + 1} 00:00:00"}
+            for i in range(3)
+        ])
+
+    def test_pages_with_next_before(self, client):
+        first = client.get("/api/archive?limit=2")
+        assert first.status_code == 200
+        assert [e["url"] for e in first.json["archive"]] == ["https://x.com/2", "https://x.com/1"]
+        assert first.json["next_before"] == "2024-01-02 00:00:00,2"
+
+        rest = client.get("/api/archive", query_string={"limit": 2, "before": first.json["next_before"]})
+        assert [e["url"] for e in rest.json["archive"]] == ["https://x.com/0"]
+        assert rest.json["next_before"] is None
+        assert client.get("/api/archive?before=bad").status_code == 400
+
+    def test_etag_revalidation(self, client):
+        first = client.get("/api/archive")
+        assert "no-cache" in first.headers["Cache-Control"]
+        assert client.get("/api/archive", headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+
+    @pytest.mark.parametrize("limit, count", [(0, 1), (-1, 1), (1000, 3)])
+    def test_limit_is_clamped(self, client, limit, count, monkeypatch):
+        calls = []
+        get_shared_archive = app_module.logger.get_shared_archive
+        monkeypatch.setattr(app_module.logger, "get_shared_archive",
+                            lambda limit, before: calls.append(limit) or get_shared_archive(limit=limit, before=before))
+        response = client.get(f"/api/archive?limit={limit}")
+        assert response.status_code == 200
+        assert len(response.json["archive"]) == count
+        assert 1 <= calls[0] <= 200
+
+
+# ── /api/archive/search ──────────────────────────────────────────────────────
+
+
+class TestArchiveSearch:
+    """Tests for the full-text search endpoint."""
+
+    @pytest.fixture(autouse=True)
+    def entries(self, search_logger):
+        search_logger.log_searches([{"query": f"election {i}", "search_type": "news"} for i in range(3)])
+
+    def test_finds_matches(self, client):
+        response = client.get("/api/archive/search?q=election")
+        assert response.status_code == 200
+        assert len(response.json["matches"]) == 3
+        assert client.get("/api/archive/search").status_code == 400
+
+    @pytest.mark.parametrize("limit, count", [(0, 1), (-1, 1), (1000, 3)])
+    def test_limit_is_clamped(self, client, limit, count):
+        response = client.get(f"/api/archive/search?q=election&limit={limit}")
+        assert response.status_code == 200
+        assert len(response.json["matches"]) == count
+
+
+# ── /api/reactions ───────────────────────────────────────────────────────────
+
+
+class TestReactions:
+    """Tests for /api/reactions caching and coalescing (pipeline stubbed)."""
+
+    def test_refresh_does_not_follow_an_in_flight_run(self, client, monkeypatch):
+        started, release = threading.Event(), threading.Event()
+
+        def pipeline(query, user_ip=None, refresh=frozenset(), **kwargs):
+            if not refresh:
+                started.set()
+                release.wait(5)
+            return {"web": [], "reddit": [], "substack": [], "partial": True, "refresh": sorted(refresh)}
+
+        monkeypatch.setattr(app_module, "_run_reactions_pipeline", pipeline)
+        leader = []
+        thread = threading.Thread(target=lambda: leader.append(
+            client.post("/api/reactions", json={"query": "https://x.com/a"})))
+        thread.start()
+        assert started.wait(5)
+
+        refreshed = client.post("/api/reactions?refresh=reddit", json={"query": "https://x.com/a"})
+        release.set()
+        thread.join()
+        assert refreshed.json["refresh"] == ["reddit"]
+        assert leader[0].json["refresh"] == []
+
+
+    def test_follower_returns_partial_at_its_deadline(self, client, monkeypatch):
+        started, release = threading.Event(), threading.Event()
+
+        def pipeline(query, deadline=None, **kwargs):
+            started.set()
+            release.wait(5)
+            return {"web": [{"title": "late"}], "reddit": [], "substack": [], "partial": True}
+
+        monkeypatch.setattr(app_module, "_run_reactions_pipeline", pipeline)
+        monkeypatch.setattr(app_module, "REACTIONS_DEADLINE_SECONDS", 0.2)
+        thread = threading.Thread(target=lambda: client.post("/api/reactions", json={"query": "https://x.com/a"}))
+        thread.start()
+        assert started.wait(5)
+
+        follower = client.post("/api/reactions", json={"query": "https://x.com/a"})
+        release.set()
+        thread.join()
+        assert follower.status_code == 200
+        assert follower.json["partial"] is True and follower.json["web"] == []
+
+
+# ── reactions pipeline ───────────────────────────────────────────────────────
+
+
+class TestReactionsPipeline:
+    """Tests for _run_reactions_pipeline's concurrent scheduling (sources stubbed)."""
+
+    def test_independent_sources_overlap(self, stub_sources):
+        response = app_module._run_reactions_pipeline("https://x.com/story")
+
+        assert [r["title"] for r in response["web"]] == ["Web A"]
+        assert [r["title"] for r in response["substack"]] == ["Sub A"]
+        assert [r["title"] for r in response["reddit"]] == ["Reddit A"]
+        assert response["web"][0]["category_label"] == "Analysis"
+        assert response["article"]["summary"] == "Summary"
+        assert response["partial"] is False
+        assert stub_sources == [["Title of https://x.com/story"]]
+        # Reddit, web and Substack each take SOURCE_DELAY; in series they'd take 3x
+        assert response["timings"]["total"] < SOURCE_DELAY * 2
+        assert response["timings"]["sequential"] >= SOURCE_DELAY * 3
+
+    def test_failing_source_does_not_abort_the_others(self, stub_sources, monkeypatch):
+        def broken(*args, **kwargs):
+            raise RuntimeError("substack down")
+
+        monkeypatch.setattr(app_module, "search_substack", broken)
+        response = app_module._run_reactions_pipeline("https://x.com/story")
+
+        assert response["substack"] == []
+        assert response["sources"]["substack"]["status"] == "error"
+        assert [r["title"] for r in response["web"]] == ["Web A"]
+        assert [r["title"] for r in response["reddit"]] == ["Reddit A"]
+        assert response["partial"] is True
+
+
+# ── /api/reactions/stream ────────────────────────────────────────────────────
+
+
+def _events(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+class TestReactionsStream:
+    """Tests for the NDJSON streaming endpoint (sources stubbed)."""
+
+    def test_streams_stages_then_done(self, client, stub_sources):
+        response = client.post("/api/reactions/stream", json={"query": "https://x.com/story"})
+        assert response.mimetype == "application/x-ndjson"
+        events = _events(response)
+        names = [e["event"] for e in events]
+
+        assert names[0] == "article"
+        assert names[-1] == "done"
+        assert sorted(names[1:-1]) == ["classification", "reddit", "substack", "summary", "web"]
+        assert names.index("classification") > names.index("web")
+        done = events[-1]["data"]
+        assert done["partial"] is False and done["cached"] is False
+        assert [r["title"] for r in done["reddit"]] == ["Reddit A"]
+
+        # The complete result was cached: the next stream is a single done event
+        [cached] = _events(client.post("/api/reactions/stream", json={"query": "https://x.com/story"}))
+        assert cached["event"] == "done" and cached["data"]["cached"] is True
+
+    def test_partial_results_end_with_partial_done(self, client, stub_sources, monkeypatch):
+        def broken(*args, **kwargs):
+            raise RuntimeError("reddit down")
+
+        monkeypatch.setattr(app_module, "search_reddit_posts", broken)
+        events = _events(client.post("/api/reactions/stream", json={"query": "https://x.com/story"}))
+
+        assert "reddit" not in [e["event"] for e in events]
+        assert events[-1]["event"] == "done"
+        assert events[-1]["data"]["partial"] is True
+        assert events[-1]["data"]["sources"]["reddit"]["status"] == "error"
+        assert client.post("/api/reactions/stream", json={}).status_code == 400
+
+
+# ── /api/reactions/batch ─────────────────────────────────────────────────────
+
+
+class TestReactionsBatch:
+    """Tests for the NDJSON batch endpoint (sources stubbed)."""
+
+    def test_streams_cached_then_results_classifications_and_done(self, client, search_logger, stub_sources, monkeypatch):
+        search_logger.cache_search("https://x.com/cached", {"web": [], "reddit": [], "substack": []})
+        extract = app_module.extract_article_metadata
+
+        def extract_or_fail(url, deadline=None):
+            if url == "https://x.com/bad":
+                raise RuntimeError("unreachable")
+            return extract(url, deadline=deadline)
+
+        monkeypatch.setattr(app_module, "extract_article_metadata", extract_or_fail)
+        response = client.post("/api/reactions/batch", json={"queries": [
+            "https://x.com/cached", "https://x.com/one", "https://x.com/one?utm_source=t", "https://x.com/bad",
+        ]})
+        events = _events(response)
+
+        assert events[0] == {"event": "result", "data": {"query": "https://x.com/cached", "result": events[0]["data"]["result"]}}
+        assert events[0]["data"]["result"]["cached"] is True
+        by_event = {}
+        for e in events[1:-1]:
+            by_event.setdefault(e["event"], []).append(e["data"]["query"])
+        assert by_event == {"result": ["https://x.com/one"], "classification": ["https://x.com/one"],
+                            "error": ["https://x.com/bad"]}
+        assert events[-1] == {"event": "done", "data": {"total": 3, "cached": 1, "failed": 1}}
+        # Classified with the article title, as the same query run alone would be
+        assert stub_sources == [["Title of https://x.com/one"]]
+
+    def test_coalesces_misses_and_stale_refreshes(self, client, search_logger, stub_sources, monkeypatch):
+        search_logger.cache_search("https://x.com/stale", {"web": [], "reddit": [], "substack": []})
+        with search_logger.connection() as conn:
+            conn.execute("UPDATE cached_searches SET created_at = datetime('now', '-2 days')")
+        refreshed, flights = [], []
+        monkeypatch.setattr(app_module, "_refresh_stale_search", lambda query, user_ip=None: refreshed.append(query))
+        run = app_module.single_flight.run
+        monkeypatch.setattr(app_module.single_flight, "run",
+                            lambda query, fn, deadline=None: flights.append(query) or run(query, fn, deadline=deadline))
+
+        events = _events(client.post("/api/reactions/batch", json={"queries": ["https://x.com/stale", "https://x.com/one"]}))
+
+        assert events[-1]["data"] == {"total": 2, "cached": 1, "failed": 0}
+        assert refreshed == ["https://x.com/stale"]
+        assert flights == ["https://x.com/one"]
+
+    def test_rejects_empty_and_oversized_batches(self, client):
+        assert client.post("/api/reactions/batch", json={"queries": []}).status_code == 400
+        queries = [f"q{i}" for i in range(app_module.BATCH_MAX_QUERIES + 1)]
+        assert client.post("/api/reactions/batch", json={"queries": queries}).status_code == 400
+
+
+# ── scheduled maintenance ────────────────────────────────────────────────────
+
+
+class TestMaintenance:
+    """Tests for _run_maintenance_if_due claiming and releasing the maintenance run."""
+
+    def test_runs_once_per_interval(self, search_logger, monkeypatch):
+        runs = []
+        monkeypatch.setattr(search_logger, "maintain_search_history", lambda: runs.append(1))
+        assert app_module._run_maintenance_if_due(3600)
+        assert not app_module._run_maintenance_if_due(3600)
+        assert runs == [1]
+
+    def test_failed_run_is_released_for_a_retry(self, search_logger, monkeypatch):
+        def fail():
+            raise RuntimeError("disk full")
+        monkeypatch.setattr(search_logger, "maintain_search_history", fail)
+        with pytest.raises(RuntimeError):
+            app_module._run_maintenance_if_due(3600)
+        run = search_logger.get_maintenance_run("search_history")
+        assert run["owner"] is None and run["last_run_at"] is None
+
+
+# ── /api/curated-feed ────────────────────────────────────────────────────────
+
+
+class TestCuratedFeed:
+    """Tests for the curated subreddit feed."""
+
+    def test_uses_shared_client_and_fetches_comments(self, client, monkeypatch):
+        def post(n, comments=5):
+            return MagicMock(id=f"id{n}", title=f"Post {n}", permalink=f"/r/x/comments/id{n}/p/",
+                             score=n, num_comments=comments, created_utc=0, stickied=False)
+        reddit = MagicMock()
+        reddit.subreddit.return_value.hot.return_value = [post(1), post(2, comments=0), post(3)]
+        reddit.subreddit.return_value.top.return_value = [post(3), post(4), post(5)]
+        monkeypatch.setattr(app_module, "get_reddit_client", lambda: reddit)
+        monkeypatch.setattr("api.reddit._fetch_top_comments", lambda client, permalink, limit=3: [{"body": permalink}])
+        monkeypatch.setattr(app_module, "_curated_cache", {"data": None, "fetched_at": None})
+
+        channels = client.get("/api/curated-feed").get_json()
+
+        assert len(channels) == len(app_module.CURATED_SUBREDDITS)
+        assert [p["title"] for p in channels[0]["posts"]] == ["Post 1", "Post 3", "Post 4"]
+        assert channels[0]["posts"][0]["top_comments"] == [{"body": "/r/x/comments/id1/p/"}]
+
+    def test_missing_credentials(self, client, monkeypatch):
+        monkeypatch.setattr(app_module, "get_reddit_client", lambda: None)
+        monkeypatch.setattr(app_module, "_curated_cache", {"data": None, "fetched_at": None})
+        assert client.get("/api/curated-feed").status_code == 500
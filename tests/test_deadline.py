@@ -0,0 +1,117 @@
+"""Unit tests for api/deadline.py — Deadline budgets and per-source status tracking."""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from api.deadline import Deadline, DeadlineExceeded, PartialResults, SourceTracker, timeout_for
+
+
+# ── Deadline ─────────────────────────────────────────────────
+
+
+class TestDeadline:
+    """Tests for remaining time and per-call timeouts."""
+
+    def test_timeout_is_capped_by_remaining_time(self):
+        deadline = Deadline(2)
+        assert deadline.timeout(15) <= 2
+        assert deadline.timeout(0.5) == 0.5
+
+    def test_timeout_for_without_deadline_uses_cap(self):
+        assert timeout_for(None, 15) == 15
+
+    def test_check_raises_after_expiry(self):
+        deadline = Deadline(0)
+        assert deadline.expired
+        assert deadline.remaining() == 0
+        with pytest.raises(DeadlineExceeded):
+            deadline.check("test")
+
+
+# ── SourceTracker ────────────────────────────────────────────
+
+
+class TestSourceTracker:
+    """Tests for ok / timeout / error statuses and partial results."""
+
+    def test_slow_source_times_out_without_blocking_others(self):
+        sources = SourceTracker(Deadline(0.3))
+        executor = ThreadPoolExecutor(max_workers=2)
+        fast = executor.submit(sources.run, "fast", lambda: ["a"])
+        slow = executor.submit(sources.run, "slow", lambda: time.sleep(2) or ["b"])
+
+        started = time.monotonic()
+        assert sources.collect("fast", fast, []) == ["a"]
+        assert sources.collect("slow", slow, []) == []
+        executor.shutdown(wait=False)
+
+        assert time.monotonic() - started < 1
+        summary = sources.summary()
+        assert summary["fast"]["status"] == "ok"
+        assert summary["slow"]["status"] == "timeout"
+        assert not sources.complete
+
+    def test_failing_source_is_reported_as_error(self):
+        sources = SourceTracker(Deadline(5))
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(sources.run, "web", lambda: 1 / 0)
+            assert sources.collect("web", future, []) == []
+        assert sources.summary()["web"]["status"] == "error"
+
+    def test_deadline_exceeded_in_source_is_a_timeout(self):
+        sources = SourceTracker(Deadline(0))
+
+        def source():
+            raise DeadlineExceeded("too slow")
+
+        with pytest.raises(DeadlineExceeded):
+            sources.run("reddit", source)
+        assert sources.summary()["reddit"]["status"] == "timeout"
+
+    def test_partial_results_are_returned_as_a_timeout(self):
+        sources = SourceTracker(Deadline(0.05))
+
+        def source():
+            time.sleep(0.05)
+            raise DeadlineExceeded("summaries", partial=["ranked post"])
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(sources.run, "reddit", source)
+            assert sources.collect("reddit", future, []) == ["ranked post"]
+        assert sources.summary()["reddit"]["status"] == "timeout"
+        assert not sources.complete
+
+    def test_partly_failed_source_returns_what_it_got_as_an_error(self):
+        sources = SourceTracker(Deadline(5))
+
+        def source():
+            raise PartialResults("second query failed", partial=["first query hit"])
+
+        assert sources.run("substack", source) == ["first query hit"]
+        assert sources.summary()["substack"]["status"] == "error"
+        assert not sources.complete
+
+    def test_late_finish_does_not_overwrite_the_timeout(self):
+        sources = SourceTracker(Deadline(0.1))
+        finished = []
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(sources.run, "slow", lambda: time.sleep(0.5) or finished.append(1) or ["b"])
+            assert sources.collect("slow", future, []) == []
+        assert finished == [1]
+        assert sources.summary()["slow"]["status"] == "timeout"
+
+    def test_results_returned_after_the_deadline_are_ok(self):
+        sources = SourceTracker(Deadline(0.05))
+        assert sources.run("web", lambda: time.sleep(0.1) or ["a"]) == ["a"]
+        sources.run("reddit", lambda: time.sleep(0.1) or [])
+        assert sources.summary()["web"]["status"] == "ok"
+        assert sources.summary()["reddit"]["status"] == "timeout"
+
+    def test_all_ok_is_complete(self):
+        sources = SourceTracker(Deadline(5))
+        sources.run("web", lambda: [])
+        sources.run("reddit", lambda: [])
+        assert sources.complete
+        assert set(sources.timings()["web"]) == {"start", "duration"}
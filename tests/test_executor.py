@@ -0,0 +1,69 @@
+"""Unit tests for api/executor.py — shared pools, nested fan-out and per-host limits."""
+
+import contextvars
+import threading
+import time
+
+from api import executor
+from api.executor import host_slot, map_concurrent, submit, submit_source
+
+
+class TestExecutor:
+    """Tests for submitting sources and leaf sub-tasks to the shared pools."""
+
+    def test_map_concurrent_preserves_order(self):
+        def work(n):
+            time.sleep(0.05 * (3 - n))
+            return n * 10
+
+        assert map_concurrent(work, [0, 1, 2]) == [0, 10, 20]
+
+    def test_source_task_can_fan_out_to_leaf_tasks(self):
+        future = submit_source(lambda: map_concurrent(lambda n: n + 1, range(5)))
+        assert future.result(timeout=5) == [1, 2, 3, 4, 5]
+
+    def test_nested_leaf_fan_out_runs_inline(self):
+        outer_thread = []
+
+        def leaf():
+            outer_thread.append(threading.current_thread())
+            return submit(threading.current_thread).result(timeout=5)
+
+        inner_thread = submit(leaf).result(timeout=5)
+        assert inner_thread is outer_thread[0]
+
+    def test_context_variables_propagate(self):
+        request_id = contextvars.ContextVar("request_id", default=None)
+        request_id.set("abc")
+        assert submit_source(request_id.get).result(timeout=5) == "abc"
+        assert submit(request_id.get).result(timeout=5) == "abc"
+
+
+class TestHostSlot:
+    """Tests for per-host concurrency limits."""
+
+    def test_limits_concurrent_calls_per_host(self, monkeypatch):
+        monkeypatch.setitem(executor.HOST_LIMITS, "limited.example", 2)
+        monkeypatch.setattr(executor, "_host_semaphores", {})
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def call(_):
+            with host_slot("https://api.limited.example/search"):
+                with lock:
+                    active.append(1)
+                    peak.append(len(active))
+                time.sleep(0.05)
+                with lock:
+                    active.pop()
+
+        map_concurrent(call, range(8))
+        assert max(peak) == 2
+
+    def test_hosts_are_limited_independently(self, monkeypatch):
+        monkeypatch.setattr(executor, "_host_semaphores", {})
+        with host_slot("https://www.a.example/x"):
+            with host_slot("https://b.example/y"):
+                pass
+        assert set(executor._host_semaphores) == {"a.example", "b.example"}
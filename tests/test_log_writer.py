@@ -0,0 +1,115 @@
+"""Unit tests for api/log_writer.py — write-behind search logging, batching and shutdown drain."""
+
+import threading
+import time
+
+import pytest
+
+from api.log_writer import SearchLogWriter
+from api.search_logger import SearchLogger
+
+
+@pytest.fixture
+def search_logger(tmp_path):
+    return SearchLogger(db_path=str(tmp_path / "test.db"))
+
+
+class RecordingLogger:
+    """Stands in for SearchLogger and records each batch written."""
+
+    def __init__(self):
+        self.batches = []
+
+    def log_searches(self, entries):
+        self.batches.append([entry["query"] for entry in entries])
+
+    def log_request_spans_batch(self, entries):
+        self.batches.append([("spans", entry["request_id"]) for entry in entries])
+
+
+class TestSearchLogWriter:
+    """Tests for flushing on size, on interval and on close."""
+
+    def test_flushes_full_batches_in_one_write(self):
+        logger = RecordingLogger()
+        writer = SearchLogWriter(logger, batch_size=3, flush_seconds=5)
+        for i in range(6):
+            writer.enqueue({"query": f"q{i}"})
+        writer.flush()
+        assert logger.batches == [["q0", "q1", "q2"], ["q3", "q4", "q5"]]
+        writer.close()
+
+    def test_flushes_partial_batch_after_interval(self):
+        logger = RecordingLogger()
+        writer = SearchLogWriter(logger, batch_size=100, flush_seconds=0.1)
+        writer.enqueue({"query": "q"})
+        time.sleep(0.5)
+        assert logger.batches == [["q"]]
+        writer.close()
+
+    def test_close_drains_queue(self):
+        logger = RecordingLogger()
+        writer = SearchLogWriter(logger, batch_size=100, flush_seconds=60)
+        writer.enqueue({"query": "a"})
+        writer.enqueue({"query": "b"})
+        writer.close()
+        assert logger.batches == [["a", "b"]]
+
+    def test_writes_each_kind_with_its_own_method(self):
+        logger = RecordingLogger()
+        writer = SearchLogWriter(logger, batch_size=100, flush_seconds=60)
+        writer.enqueue({"query": "a"})
+        writer.enqueue({"request_id": "r1"}, kind="spans")
+        writer.enqueue({"query": "b"})
+        writer.close()
+        assert logger.batches == [["a", "b"], [("spans", "r1")]]
+
+    def test_drops_entries_when_queue_is_full(self):
+        logger = RecordingLogger()
+        release = threading.Event()
+        write = logger.log_searches
+        logger.log_searches = lambda entries: release.wait(5) and write(entries)
+        writer = SearchLogWriter(logger, batch_size=1, flush_seconds=0, queue_max=1)
+
+        writer.enqueue({"query": "a"})  # taken by the writer, which blocks
+        time.sleep(0.1)
+        writer.enqueue({"query": "b"})  # fills the queue
+        started = time.monotonic()
+        writer.enqueue({"query": "c"})  # dropped without blocking
+        assert time.monotonic() - started < 0.5
+
+        release.set()
+        writer.close()
+        assert logger.batches == [["a"], ["b"]]
+
+
+class TestEnqueueSearch:
+    """Tests for SearchLogger.enqueue_search end to end."""
+
+    def test_queued_searches_are_written_with_results(self, search_logger):
+        search_logger.enqueue_search(
+            query="climate", search_type="news",
+            results=[{"title": "A", "url": "https://a.example"}], processing_time=0.5,
+        )
+        search_logger.enqueue_search(query="policy", search_type="news", results=[])
+        search_logger.flush_searches()
+
+        history = search_logger.get_search_history()
+        assert {row["query"] for row in history} == {"climate", "policy"}
+        assert {row["query"]: row["results_count"] for row in history}["climate"] == 1
+        assert search_logger.get_analytics(days=1)["overall_stats"]["total_searches"] == 2
+
+    def test_log_search_still_returns_id(self, search_logger):
+        ids = [search_logger.log_search("q", "news") for _ in range(2)]
+        assert ids[1] == ids[0] + 1
+
+    def test_queued_request_spans_are_written(self, search_logger):
+        stages = {"web": {"start_ms": 0.0, "duration_ms": 80.0, "calls": 1}}
+        search_logger.enqueue_request_spans(
+            request_id="r1", endpoint="/api/reactions", query="q", stages=stages, total_ms=100.0,
+        )
+        assert search_logger.get_stage_latency(days=1) == []
+        search_logger.flush_searches()
+
+        latency = {row["stage"]: row["p50_ms"] for row in search_logger.get_stage_latency(days=1)}
+        assert latency == {"web": 80.0, "total": 100.0}
@@ -0,0 +1,55 @@
+"""Unit tests for api/payload_codec.py — compressed cache payloads, splicing and gzip pass-through."""
+
+import gzip
+import json
+import os
+import zlib
+
+import pytest
+
+from api import payload_codec
+
+
+PAYLOAD = {
+    "web": [{"title": f"Result {i}", "url": f"https://example.com/{i}", "summary": "snippet " * 20} for i in range(5)],
+    "article": {"title": "Café", "summary": "text"},
+    "partial": False,
+}
+
+
+class TestEncoding:
+    """Tests for encode / decode and legacy text entries."""
+
+    def test_round_trip(self):
+        blob = payload_codec.encode(PAYLOAD)
+        assert blob[0] == payload_codec.FORMAT_V1
+        assert len(blob) < len(json.dumps(PAYLOAD))
+        assert payload_codec.decode(blob) == PAYLOAD
+
+    def test_decodes_legacy_json_text(self):
+        assert payload_codec.decode(json.dumps(PAYLOAD)) == PAYLOAD
+
+    def test_rejects_non_objects(self):
+        with pytest.raises(ValueError):
+            payload_codec.encode([1, 2])
+
+
+class TestSplicing:
+    """Tests for serving stored bytes with extra fields, prefix and suffix."""
+
+    @pytest.mark.parametrize("blob", [payload_codec.encode(PAYLOAD), json.dumps(PAYLOAD)])
+    def test_gzip_matches_plain_json(self, blob):
+        args = ({"stale": True}, b'{"cached":true,"results":', b"}")
+        plain = payload_codec.splice_json(blob, *args)
+        assert gzip.decompress(payload_codec.splice_gzip(blob, *args)) == plain
+        assert json.loads(plain) == {"cached": True, "results": {**PAYLOAD, "stale": True}}
+
+    def test_empty_object(self):
+        blob = payload_codec.encode({})
+        assert payload_codec.splice_json(blob, {"cached": True}) == b'{"cached":true}'
+        assert gzip.decompress(payload_codec.splice_gzip(blob)) == b"{}"
+
+    def test_crc32_combine(self):
+        a, b = os.urandom(100), os.urandom(5000)
+        assert payload_codec.crc32_combine(zlib.crc32(a), zlib.crc32(b), len(b)) == zlib.crc32(a + b)
+        assert payload_codec.crc32_combine(zlib.crc32(a), zlib.crc32(b""), 0) == zlib.crc32(a)
@@ -0,0 +1,72 @@
+"""Unit tests for api/reddit.py — search_reddit_posts staging and deadlines."""
+
+import contextlib
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from api import reddit
+from api.deadline import Deadline, DeadlineExceeded
+
+
+def _post(n, score):
+    return MagicMock(title=f"Post {n}", permalink=f"/r/news/comments/id{n}/post_{n}/",
+                     subreddit="news", selftext="", num_comments=10, score=score)
+
+
+@pytest.fixture
+def fake_reddit():
+    client = MagicMock()
+    client.subreddit.return_value.search.return_value = [_post(1, 5), _post(2, 50)]
+    with patch.object(reddit, "get_reddit_client", return_value=client):
+        yield client
+
+
+# ── search_reddit_posts ──────────────────────────────────────────────────────
+
+
+class TestSearchRedditPosts:
+    """Tests for what search_reddit_posts returns when the deadline passes."""
+
+    def test_deadline_during_summaries_keeps_ranked_posts(self, fake_reddit):
+        deadline = Deadline(0.1)
+
+        def slow_comments(client, permalink, limit=3):
+            time.sleep(0.15)
+            return [{"author": "a", "body": "comment", "score": 1}]
+
+        with patch.object(reddit, "_fetch_top_comments", side_effect=slow_comments), \
+                patch.object(reddit, "_summarize_post") as mock_summarize:
+            with pytest.raises(DeadlineExceeded) as excinfo:
+                reddit.search_reddit_posts("some topic", limit=2, deadline=deadline)
+
+        mock_summarize.assert_not_called()
+        partial = excinfo.value.partial
+        assert [p["title"] for p in partial] == ["Post 2", "Post 1"]
+        assert all(p["summary"] == "" and p["top_comments"] for p in partial)
+
+    def test_deadline_before_search_returns_nothing_partial(self, fake_reddit):
+        with patch.object(reddit, "_fetch_top_comments", return_value=[]):
+            with pytest.raises(DeadlineExceeded) as excinfo:
+                reddit.search_reddit_posts("https://example.com/a", deadline=Deadline(0))
+        assert excinfo.value.partial is None
+
+    def test_search_listing_is_read_inside_a_host_slot(self, fake_reddit):
+        held = []
+
+        @contextlib.contextmanager
+        def slot(host):
+            held.append(host)
+            yield
+            held.remove(host)
+
+        def listing(*args, **kwargs):
+            assert held == ["reddit.com"]
+            yield from [_post(1, 5)]
+        fake_reddit.subreddit.return_value.search.side_effect = listing
+
+        with patch.object(reddit, "host_slot", side_effect=slot), \
+                patch.object(reddit, "_fetch_top_comments", return_value=[]), \
+                patch.object(reddit, "_summarize_post"):
+            assert [p["title"] for p in reddit.search_reddit_posts("some topic")] == ["Post 1"]
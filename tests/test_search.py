@@ -1,8 +1,11 @@
 """Unit tests for search.py — search_news, search_substack, is_likely_substack."""
 
+import time
 from unittest.mock import patch, MagicMock
 import pytest
 
+from api.deadline import Deadline, DeadlineExceeded, PartialResults
+
 
 # ── search_news ──────────────────────────────────────────────────────────────
 
@@ -10,7 +13,7 @@ import pytest
 class TestSearchNews:
     """Tests for the search_news function."""
 
-    @patch("search.requests.get")
+    @patch("search.serpapi.session.get")
     @patch("search.SERP_API_KEY", "fake-key")
     def test_returns_formatted_results(self, mock_get, serpapi_organic_results):
         mock_get.return_value.json.return_value = serpapi_organic_results
@@ -24,7 +27,7 @@ class TestSearchNews:
         assert results[0]["url"] == "https://example.com/article-1"
         assert results[0]["summary"] == "A short summary of article 1."
 
-    @patch("search.requests.get")
+    @patch("search.serpapi.session.get")
     @patch("search.SERP_API_KEY", "fake-key")
     def test_respects_num_results_param(self, mock_get, serpapi_organic_results):
         mock_get.return_value.json.return_value = serpapi_organic_results
@@ -42,22 +45,25 @@ class TestSearchNews:
         results = search_news("anything")
         assert results == []
 
-    @patch("search.requests.get", side_effect=Exception("network down"))
+    @patch("search.serpapi.session.get", side_effect=Exception("network down"))
     @patch("search.SERP_API_KEY", "fake-key")
-    def test_returns_empty_on_request_exception(self, mock_get):
-        from search import search_news
+    def test_raises_on_request_exception(self, mock_get):
+        from search import search_news, search_logger
 
-        results = search_news("query")
-        assert results == []
+        with patch.object(search_logger, "enqueue_search") as mock_log:
+            with pytest.raises(Exception, match="network down"):
+                search_news("query")
+            # The failure is still logged
+            assert mock_log.call_args[1]["results"] == []
 
-    @patch("search.requests.get")
+    @patch("search.serpapi.session.get")
     @patch("search.SERP_API_KEY", "fake-key")
     def test_logs_search_on_success(self, mock_get, serpapi_organic_results):
         mock_get.return_value.json.return_value = serpapi_organic_results
 
         from search import search_news, search_logger
 
-        with patch.object(search_logger, "log_search") as mock_log:
+        with patch.object(search_logger, "enqueue_search") as mock_log:
             search_news("test query", user_ip="1.2.3.4")
             mock_log.assert_called_once()
             call_kwargs = mock_log.call_args[1]
@@ -65,19 +71,19 @@ class TestSearchNews:
             assert call_kwargs["user_ip"] == "1.2.3.4"
             assert call_kwargs["search_type"] == "news"
 
-    @patch("search.requests.get")
+    @patch("search.serpapi.session.get")
     @patch("search.SERP_API_KEY", "fake-key")
     def test_survives_logging_failure(self, mock_get, serpapi_organic_results):
         mock_get.return_value.json.return_value = serpapi_organic_results
 
         from search import search_news, search_logger
 
-        with patch.object(search_logger, "log_search", side_effect=Exception("db error")):
+        with patch.object(search_logger, "enqueue_search", side_effect=Exception("db error")):
             results = search_news("test query")
             # Should still return results even if logging fails
             assert len(results) == 2
 
-    @patch("search.requests.get")
+    @patch("search.serpapi.session.get")
     @patch("search.SERP_API_KEY", "fake-key")
     def test_handles_empty_organic_results(self, mock_get):
         mock_get.return_value.json.return_value = {"organic_results": []}
@@ -87,7 +93,7 @@ class TestSearchNews:
         results = search_news("obscure query")
         assert results == []
 
-    @patch("search.requests.get")
+    @patch("search.serpapi.session.get")
     @patch("search.SERP_API_KEY", "fake-key")
     def test_handles_missing_fields_in_results(self, mock_get):
         mock_get.return_value.json.return_value = {
@@ -108,7 +114,7 @@ class TestSearchNews:
 class TestSearchSubstack:
     """Tests for the search_substack function."""
 
-    @patch("search.requests.get")
+    @patch("search.serpapi.session.get")
     @patch("search.SERP_API_KEY", "fake-key")
     def test_returns_substack_articles(self, mock_get, serpapi_substack_results):
         mock_get.return_value.json.return_value = serpapi_substack_results
@@ -121,7 +127,7 @@ class TestSearchSubstack:
         assert all("/p/" in r["url"] for r in results)
         assert all(r.get("type") == "Substack" for r in results)
 
-    @patch("search.requests.get")
+    @patch("search.serpapi.session.get")
     @patch("search.SERP_API_KEY", "fake-key")
     def test_filters_non_article_urls(self, mock_get, serpapi_substack_results):
         mock_get.return_value.json.return_value = serpapi_substack_results
@@ -132,7 +138,7 @@ class TestSearchSubstack:
         urls = [r["url"] for r in results]
         assert "https://author.substack.com/about" not in urls
 
-    @patch("search.requests.get")
+    @patch("search.serpapi.session.get")
     @patch("search.SERP_API_KEY", "fake-key")
     def test_deduplicates_across_queries(self, mock_get):
         # Both query strategies return the same article
@@ -159,7 +165,7 @@ class TestSearchSubstack:
         results = search_substack("topic")
         assert results == []
 
-    @patch("search.requests.get")
+    @patch("search.serpapi.session.get")
     @patch("search.SERP_API_KEY", "fake-key")
     def test_caps_at_num_results(self, mock_get):
         many_results = {
@@ -179,13 +185,45 @@ class TestSearchSubstack:
         results = search_substack("topic", num_results=3)
         assert len(results) <= 3
 
-    @patch("search.requests.get", side_effect=Exception("timeout"))
+    @patch("search.serpapi.session.get", side_effect=Exception("timeout"))
     @patch("search.SERP_API_KEY", "fake-key")
-    def test_handles_request_failure_gracefully(self, mock_get):
+    def test_raises_on_request_failure(self, mock_get):
         from search import search_substack
 
-        results = search_substack("topic")
-        assert results == []
+        with pytest.raises(Exception, match="timeout"):
+            search_substack("topic")
+
+    @patch("search.serpapi.session.get")
+    @patch("search.SERP_API_KEY", "fake-key")
+    def test_second_strategy_runs_when_the_first_fails(self, mock_get, serpapi_substack_results):
+        ok = MagicMock()
+        ok.json.return_value = serpapi_substack_results
+        mock_get.side_effect = [Exception("boom"), ok]  # not a requests error, so not retried
+
+        from search import search_substack
+
+        with pytest.raises(PartialResults) as excinfo:
+            search_substack("analysis")
+        assert excinfo.value.partial
+        assert all("/p/" in r["url"] for r in excinfo.value.partial)
+
+    @patch("search.serpapi.session.get")
+    @patch("search.SERP_API_KEY", "fake-key")
+    def test_deadline_keeps_the_first_strategy_results(self, mock_get, serpapi_substack_results):
+        deadline = Deadline(0.1)
+
+        def first_then_expire(*args, **kwargs):
+            time.sleep(0.15)
+            return mock_get.return_value
+        mock_get.return_value.json.return_value = serpapi_substack_results
+        mock_get.side_effect = first_then_expire
+
+        from search import search_substack
+
+        with pytest.raises(DeadlineExceeded) as excinfo:
+            search_substack("analysis", num_results=10, deadline=deadline)
+        assert excinfo.value.partial
+        assert mock_get.call_count == 1
 
 
 # ── is_likely_substack ───────────────────────────────────────────────────────
@@ -0,0 +1,832 @@
+"""Unit tests for api/search_logger.py — search cache and SQLite storage."""
+
+import base64
+import csv
+import hashlib
+import io
+import json
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from api.search_logger import SearchLogger
+
+
+@pytest.fixture
+def search_logger(tmp_path):
+    return SearchLogger(db_path=str(tmp_path / "test.db"))
+
+
+def _age_cache_entry(search_logger, query, modifier):
+    """Backdate a cached_searches row, e.g. modifier='-2 days'."""
+    conn = sqlite3.connect(search_logger.db_path)
+    conn.execute(
+        "UPDATE cached_searches SET created_at = datetime('now', ?) WHERE query = ?",
+        (modifier, query),
+    )
+    conn.commit()
+    conn.close()
+
+
+# ── stale-while-revalidate cache ─────────────────────────────────────────────
+
+
+class TestSearchCache:
+    """Tests for get_cached_search freshness windows and expiry."""
+
+    def test_fresh_entry_is_not_stale(self, search_logger):
+        search_logger.cache_search("https://x.com/a", {"web": [1]})
+
+        cached = search_logger.get_cached_search("https://x.com/a")
+        assert cached["web"] == [1]
+        assert cached["stale"] is False
+
+    def test_entry_past_fresh_window_is_served_stale(self, search_logger):
+        search_logger.cache_search("https://x.com/a", {"web": [1]})
+        _age_cache_entry(search_logger, "https://x.com/a", "-2 days")
+
+        cached = search_logger.get_cached_search("https://x.com/a")
+        assert cached["web"] == [1]
+        assert cached["stale"] is True
+
+    def test_entry_past_hard_limit_is_a_miss(self, search_logger):
+        search_logger.cache_search("https://x.com/a", {"web": [1]})
+        _age_cache_entry(search_logger, "https://x.com/a", "-30 days")
+
+        assert search_logger.get_cached_search("https://x.com/a") is None
+
+    def test_topic_queries_use_their_own_windows(self, search_logger):
+        search_logger.cache_search("some topic", {"web": [1]})
+        _age_cache_entry(search_logger, "some topic", "-12 hours")
+        assert search_logger.get_cached_search("some topic")["stale"] is True
+
+        _age_cache_entry(search_logger, "some topic", "-5 days")
+        assert search_logger.get_cached_search("some topic") is None
+
+    def test_clear_expired_cache_keeps_stale_entries(self, search_logger):
+        search_logger.cache_search("https://x.com/stale", {"web": []})
+        search_logger.cache_search("https://x.com/dead", {"web": []})
+        _age_cache_entry(search_logger, "https://x.com/stale", "-2 days")
+        _age_cache_entry(search_logger, "https://x.com/dead", "-30 days")
+
+        assert search_logger.clear_expired_cache() == 1
+        assert search_logger.get_cached_search("https://x.com/stale") is not None
+
+    def test_newer_than_ignores_older_entries(self, search_logger):
+        search_logger.cache_search("https://x.com/a", {"web": []})
+        _age_cache_entry(search_logger, "https://x.com/a", "-1 hour")
+
+        assert search_logger.get_cached_search("https://x.com/a", newer_than=time.time()) is None
+
+    def test_url_variants_share_one_entry(self, search_logger):
+        search_logger.cache_search("https://www.x.com/a/?utm_source=tw", {"web": [1]})
+
+        assert search_logger.get_cached_search("https://x.com/a#top")["web"] == [1]
+        assert search_logger.clear_search_cache("http://x.com/a")
+        assert search_logger.get_cached_search("https://www.x.com/a/") is None
+
+    def test_reads_entries_cached_under_the_raw_query(self, search_logger):
+        # Entries written before canonicalization were keyed on the raw query
+        conn = sqlite3.connect(search_logger.db_path)
+        conn.execute(
+            "INSERT INTO cached_searches (query_hash, query, results_json) VALUES (?, ?, ?)",
+            (hashlib.md5(b"https://www.x.com/a/").hexdigest(), "https://www.x.com/a/", '{"web": [2]}'),
+        )
+        conn.commit()
+        conn.close()
+
+        assert search_logger.get_cached_search("https://www.x.com/a/")["web"] == [2]
+
+
+# ── per-source cache ─────────────────────────────────────────────────────────
+
+
+class TestSourceCache:
+    """Tests for source_cache TTLs, keys and clearing."""
+
+    def _age_source_entry(self, search_logger, source, modifier):
+        conn = sqlite3.connect(search_logger.db_path)
+        conn.execute(
+            "UPDATE source_cache SET created_at = datetime('now', ?) WHERE source = ?",
+            (modifier, source),
+        )
+        conn.commit()
+        conn.close()
+
+    def test_round_trip_by_exact_sub_query(self, search_logger):
+        search_logger.cache_source("web", '"Big News" X -site:x.com', [{"title": "a"}])
+        assert search_logger.get_cached_source("web", '"Big News" X -site:x.com') == [{"title": "a"}]
+        assert search_logger.get_cached_source("web", '"Big News" -site:x.com') is None
+        assert search_logger.get_cached_source("substack", '"Big News" X -site:x.com') is None
+
+    def test_composite_keys_only_canonicalize_the_url(self, search_logger):
+        search_logger.cache_source("reddit", "https://x.com/a\nPoll? b=2&a=1", [{"title": "first"}])
+        search_logger.cache_source("reddit", "https://x.com/a\nTitle #1", [{"title": "hash"}])
+        assert search_logger.get_cached_source("reddit", "https://x.com/a\nPoll? a=1&b=2") is None
+        assert search_logger.get_cached_source("reddit", "https://x.com/a\nTitle #2") is None
+        assert search_logger.get_cached_source("reddit", "https://www.x.com/a/?utm_source=t\nPoll? b=2&a=1") == [{"title": "first"}]
+
+    def test_each_source_has_its_own_ttl(self, search_logger):
+        search_logger.cache_source("web", "topic", [{"title": "web"}])
+        search_logger.cache_source("reddit", "topic", [{"title": "reddit"}])
+        self._age_source_entry(search_logger, "web", "-5 hours")
+        self._age_source_entry(search_logger, "reddit", "-5 hours")
+
+        assert search_logger.get_cached_source("web", "topic") == [{"title": "web"}]
+        assert search_logger.get_cached_source("reddit", "topic") is None
+
+    def test_clear_search_cache_drops_sources_for_query(self, search_logger):
+        search_logger.cache_source("web", "sub query", [{"title": "a"}], query="https://x.com/a")
+        search_logger.cache_source("web", "other", [{"title": "b"}], query="https://y.com/b")
+        search_logger.clear_search_cache("https://x.com/a")
+
+        assert search_logger.get_cached_source("web", "sub query") is None
+        assert search_logger.get_cached_source("web", "other") == [{"title": "b"}]
+
+    def test_clear_expired_cache_removes_expired_sources(self, search_logger):
+        search_logger.cache_source("twitter", "trending:iran", [{"id": "1"}])
+        self._age_source_entry(search_logger, "twitter", "-2 hours")
+        assert search_logger.clear_expired_cache() == 1
+
+
+# ── request spans ────────────────────────────────────────────────────────────
+
+
+class TestRequestSpans:
+    """Tests for persisted per-stage latency and percentiles."""
+
+    def test_stage_percentiles(self, search_logger):
+        for i in range(1, 21):
+            stages = {"reddit": {"start_ms": 0.0, "duration_ms": float(i * 100), "calls": 1}}
+            search_logger.log_request_spans(f"req{i}", "/api/reactions", "q", stages, total_ms=i * 120.0)
+
+        latency = {row["stage"]: row for row in search_logger.get_stage_latency(days=1)}
+        assert latency["reddit"]["count"] == 20
+        assert latency["reddit"]["p50_ms"] == 1000
+        assert latency["reddit"]["p95_ms"] == 1900
+        assert latency["reddit"]["max_ms"] == 2000
+        assert latency["total"]["count"] == 20
+
+    def test_filter_by_endpoint(self, search_logger):
+        stages = {"web": {"start_ms": 0.0, "duration_ms": 5.0, "calls": 1}}
+        search_logger.log_request_spans("a", "/api/reactions", "q", stages, total_ms=5)
+        search_logger.log_request_spans("b", "/api/trending/<topic>", "iran", stages, total_ms=5)
+
+        rows = search_logger.get_stage_latency(days=1, endpoint="/api/trending/<topic>")
+        assert {row["count"] for row in rows} == {1}
+
+
+# ── batch cache lookup ───────────────────────────────────────────────────────
+
+
+class TestBatchCacheLookup:
+    """Tests for get_cached_searches (one query for many URLs)."""
+
+    def test_returns_hits_keyed_by_requested_query(self, search_logger):
+        search_logger.cache_search("https://x.com/a", {"web": [1]})
+        search_logger.cache_search("climate policy", {"web": [2]})
+
+        found = search_logger.get_cached_searches(
+            ["https://www.x.com/a?utm_source=t", "climate policy", "https://y.com/missing"]
+        )
+        assert set(found) == {"https://www.x.com/a?utm_source=t", "climate policy"}
+        assert found["climate policy"]["web"] == [2]
+        assert found["climate policy"]["stale"] is False
+
+    def test_applies_each_query_types_window(self, search_logger):
+        search_logger.cache_search("https://x.com/a", {"web": []})
+        search_logger.cache_search("climate policy", {"web": []})
+        _age_cache_entry(search_logger, "https://x.com/a", "-5 days")
+        _age_cache_entry(search_logger, "climate policy", "-5 days")
+
+        found = search_logger.get_cached_searches(["https://x.com/a", "climate policy"])
+        assert set(found) == {"https://x.com/a"}
+        assert found["https://x.com/a"]["stale"] is True
+
+    def test_empty_list(self, search_logger):
+        assert search_logger.get_cached_searches([]) == {}
+
+
+# ── connections ──────────────────────────────────────────────────────────────
+
+
+class TestConnections:
+    """Tests for per-thread long-lived connections and their pragmas."""
+
+    def test_uses_wal_and_reuses_the_thread_connection(self, search_logger):
+        with search_logger.connection() as first:
+            assert first.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+            assert first.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        with search_logger.connection() as second:
+            assert second is first
+
+    def test_threads_get_their_own_connection(self, search_logger):
+        with search_logger.connection() as main_conn:
+            pass
+        other = []
+
+        def grab():
+            with search_logger.connection() as conn:
+                other.append(conn)
+
+        thread = threading.Thread(target=grab)
+        thread.start()
+        thread.join()
+        assert other[0] is not main_conn
+
+    def test_failed_call_rolls_back_and_releases_the_lock(self, search_logger):
+        with pytest.raises(RuntimeError):
+            with search_logger.connection() as conn:
+                conn.execute("INSERT INTO search_leases VALUES ('k', 'a', 0)")
+                raise RuntimeError("boom")
+
+        # Another connection can write straight away and the row was not kept
+        other = sqlite3.connect(search_logger.db_path, timeout=0)
+        other.execute("INSERT INTO search_leases VALUES ('k2', 'b', 0)")
+        other.commit()
+        assert other.execute("SELECT query_hash FROM search_leases").fetchall() == [("k2",)]
+        other.close()
+
+
+# ── schema migrations ────────────────────────────────────────────────────────
+
+
+class TestMigrations:
+    """Tests for the PRAGMA user_version migration runner and the shared store."""
+
+    def test_fresh_database_is_at_the_latest_version(self, search_logger):
+        assert search_logger.schema_version() == len(SearchLogger.MIGRATIONS)
+
+    def test_second_logger_shares_the_store_and_skips_migrations(self, search_logger, monkeypatch):
+        calls = []
+        monkeypatch.setattr(SearchLogger, "_migrate_base_tables", lambda self, cursor: calls.append(1))
+        other = SearchLogger(db_path=search_logger.db_path)
+        assert other._store is search_logger._store
+        with other.connection() as conn, search_logger.connection() as same:
+            assert conn is same
+        other.init_database()  # already current: nothing to apply
+        assert calls == []
+
+    def test_upgrades_a_pre_versioned_database(self, tmp_path):
+        db_path = str(tmp_path / "old.db")
+        conn = sqlite3.connect(db_path)
+        conn.executescript("""
+            CREATE TABLE searches (id INTEGER PRIMARY KEY AUTOINCREMENT, query TEXT NOT NULL,
+                search_type TEXT NOT NULL, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP, user_ip TEXT,
+                results_count INTEGER, serpapi_response TEXT, processing_time REAL, search_params TEXT);
+            CREATE TABLE search_results (id INTEGER PRIMARY KEY AUTOINCREMENT, search_id INTEGER,
+                result_type TEXT NOT NULL, title TEXT, url TEXT, snippet TEXT, position INTEGER, category TEXT);
+            INSERT INTO searches (query, search_type, results_count) VALUES ('old query', 'news', 1);
+            INSERT INTO search_results (search_id, result_type, title, position, category)
+                VALUES (1, 'news', 'Old title', 1, 'politics');
+        """)
+        conn.close()
+
+        logger = SearchLogger(db_path=db_path)
+        assert logger.schema_version() == len(SearchLogger.MIGRATIONS)
+        assert logger.get_analytics(days=1)["overall_stats"]["total_searches"] == 1
+        assert sorted(h["kind"] for h in logger.search_history("old")) == ["result", "search"]
+
+
+# ── daily analytics rollup ───────────────────────────────────────────────────
+
+
+class TestDailyAnalytics:
+    """Tests for the incremental search_analytics rollup and its rebuild."""
+
+    def _daily(self, search_logger):
+        rows = search_logger.get_analytics(days=1)["daily_analytics"]
+        assert len(rows) == 1
+        row = rows[0]
+        row["search_types"] = json.loads(row["search_types"])
+        return row
+
+    def test_incremental_counters(self, search_logger):
+        search_logger.log_search("a", "news", results=[{}, {}])
+        search_logger.log_search("b", "news", results=[])
+        search_logger.log_search("b", "url", results=[{}])
+
+        row = self._daily(search_logger)
+        assert row["total_searches"] == 3
+        assert row["unique_queries"] == 2
+        assert row["avg_results"] == pytest.approx(1.0)
+        assert row["most_common_query"] == "b"
+        assert row["search_types"] == {"news": 2, "url": 1}
+
+    def test_rebuild_matches_incremental(self, search_logger):
+        for query in ["a", "b", "b", "c", "b"]:
+            search_logger.log_search(query, "news", results=[{}])
+        incremental = self._daily(search_logger)
+
+        assert search_logger.rebuild_daily_analytics() == 1
+        assert self._daily(search_logger) == incremental
+
+    def _log_mixed(self, search_logger):
+        timestamp = time.strftime("%Y-%m-%d %H:00:00", time.gmtime())  # all in the current hour
+        search_logger.log_searches([
+            {"query": "a", "search_type": "news", "timestamp": timestamp, "processing_time": 0.2, "results": [
+                {"title": "1", "category": "politics", "source": "BBC"},
+                {"title": "2", "category": "politics", "source": "NYT"},
+                {"title": "3", "category": None},
+            ]},
+            {"query": "b", "search_type": "url", "timestamp": timestamp, "processing_time": 3.0,
+             "results": [{"title": "4", "source": "BBC"}]},
+            {"query": "c", "search_type": "news", "timestamp": timestamp, "results": []},
+        ])
+
+    def _rollups(self, search_logger):
+        return (
+            search_logger.get_category_stats(days=1),
+            search_logger.get_source_distribution(days=1),
+            search_logger.get_hourly_analytics(hours=2),
+            search_logger.get_analytics(days=1)["processing_time"],
+        )
+
+    def test_result_and_hourly_rollups(self, search_logger):
+        self._log_mixed(search_logger)
+
+        categories, sources, hourly, processing = self._rollups(search_logger)
+        assert categories == [
+            {"category": "general", "result_count": 3, "search_count": 3},
+            {"category": "politics", "result_count": 2, "search_count": 1},
+        ]
+        assert sources == [
+            {"source": "BBC", "result_count": 2, "search_count": 2},
+            {"source": "NYT", "result_count": 1, "search_count": 1},
+        ]
+        [hour] = hourly
+        assert hour["total_searches"] == 3
+        assert hour["search_types"] == {"news": 2, "url": 1}
+        assert hour["avg_processing_seconds"] == pytest.approx(1.6)
+        assert processing["histogram"]["<0.5s"] == 1
+        assert processing["histogram"]["<5s"] == 1
+        assert sum(processing["histogram"].values()) == 2
+
+    def test_rebuild_matches_incremental_rollups(self, search_logger):
+        self._log_mixed(search_logger)
+        incremental = self._rollups(search_logger)
+
+        search_logger.rebuild_daily_analytics()
+        assert self._rollups(search_logger) == incremental
+
+    def test_migration_collapses_duplicate_rows(self, tmp_path):
+        db_path = str(tmp_path / "legacy.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute(
+            "CREATE TABLE search_analytics (id INTEGER PRIMARY KEY AUTOINCREMENT, date DATE, "
+            "total_searches INTEGER DEFAULT 0, unique_queries INTEGER DEFAULT 0, "
+            "avg_results_count REAL DEFAULT 0, most_common_query TEXT, search_types TEXT)"
+        )
+        conn.executemany(
+            "INSERT INTO search_analytics (date, total_searches, unique_queries) VALUES (?, ?, 1)",
+            [("2024-01-01", 1), ("2024-01-01", 2), ("2024-01-02", 1)],
+        )
+        conn.commit()
+        conn.close()
+
+        search_logger = SearchLogger(db_path=db_path)
+        with search_logger.connection() as conn:
+            rows = conn.execute("SELECT date, total_searches FROM search_analytics ORDER BY date").fetchall()
+        assert rows == [("2024-01-01", 2), ("2024-01-02", 1)]
+
+
+# ── query plans ──────────────────────────────────────────────────────────────
+
+
+class TestQueryPlans:
+    """EXPLAIN QUERY PLAN checks that hot queries use indexes, not full scans."""
+
+    def _statements(self, search_logger, calls):
+        statements = []
+        with search_logger.connection() as conn:
+            conn.set_trace_callback(statements.append)
+        try:
+            calls()
+        finally:
+            with search_logger.connection() as conn:
+                conn.set_trace_callback(None)
+        return [sql for sql in statements if sql.lstrip().upper().startswith(("SELECT", "DELETE"))]
+
+    def test_hot_queries_do_not_scan_tables(self, search_logger):
+        search_logger.log_search("https://x.com/a", "url", results=[{"title": "A", "source": "X"}])
+
+        def calls():
+            search_logger.get_search_history(search_type="url", date_from="2024-01-01", date_to="2099-01-01")
+            search_logger.get_analytics(days=7)
+            search_logger.get_categorized_searches(days=7)
+            search_logger.get_categorized_searches(days=7, before_id=2)
+            search_logger.get_category_stats(days=7)
+            search_logger.get_source_distribution(days=7)
+            search_logger.get_shared_archive()
+            search_logger.get_shared_archive(before=("2099-01-01 00:00:00", 1))
+            search_logger.get_cached_search("https://x.com/a")
+            search_logger.get_cached_searches(["https://x.com/a", "topic"])
+            search_logger.get_cached_source("web", "q")
+            search_logger.get_stage_latency(days=7)
+            search_logger.get_hourly_analytics(hours=24)
+            search_logger.clear_expired_cache()
+            search_logger.search_history("x", before="2099-01-01")
+
+        statements = self._statements(search_logger, calls)
+        assert len(statements) >= 14
+        with search_logger.connection() as conn:
+            for sql in statements:
+                plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+                # Scanning a subquery's (already limited) rows is fine; scanning a table isn't
+                subqueries = {step.split()[-1] for step in plan if step.startswith(("CO-ROUTINE", "MATERIALIZE"))}
+                # An FTS5 MATCH shows as a SCAN of the virtual table through its index
+                scans = [step for step in plan if step.startswith("SCAN ") and step.split()[1] not in subqueries
+                         and "VIRTUAL TABLE INDEX" not in step]
+                assert not scans, f"{' '.join(sql.split())[:80]}: {plan}"
+
+
+# ── raw payloads ─────────────────────────────────────────────────────────────
+
+
+class TestRawPayloads:
+    """Tests for compressed, deduplicated storage of raw provider responses."""
+
+    RESPONSE = {"organic_results": [{"title": "A", "snippet": "x" * 2000}], "search_metadata": {"id": "1"}}
+
+    def _count(self, search_logger, sql):
+        with search_logger.connection() as conn:
+            return conn.execute(sql).fetchone()[0]
+
+    def test_payload_is_stored_once_and_compressed(self, search_logger):
+        first = search_logger.log_search("q", "news", serpapi_response=self.RESPONSE)
+        second = search_logger.log_search("q", "news", serpapi_response=dict(reversed(self.RESPONSE.items())))
+
+        assert self._count(search_logger, "SELECT COUNT(*) FROM raw_payloads") == 1
+        assert self._count(search_logger, "SELECT LENGTH(payload) < size FROM raw_payloads") == 1
+        assert self._count(search_logger, "SELECT COUNT(*) FROM searches WHERE serpapi_response IS NOT NULL") == 0
+        assert search_logger.get_raw_payload(first) == self.RESPONSE
+        assert search_logger.get_raw_payload(second) == self.RESPONSE
+
+    def test_sampling_can_skip_payloads(self, search_logger, monkeypatch):
+        monkeypatch.setattr("api.search_logger.RAW_PAYLOAD_SAMPLE_RATE", 0.0)
+        search_id = search_logger.log_search("q", "news", serpapi_response=self.RESPONSE)
+        assert search_logger.get_raw_payload(search_id) is None
+        assert self._count(search_logger, "SELECT COUNT(*) FROM raw_payloads") == 0
+
+    def test_moves_legacy_text_payloads(self, search_logger):
+        with search_logger.connection() as conn:
+            cursor = conn.execute(
+                "INSERT INTO searches (query, search_type, serpapi_response) VALUES ('q', 'news', ?)",
+                (json.dumps(self.RESPONSE),),
+            )
+            search_id = cursor.lastrowid
+
+        assert search_logger.move_raw_payloads(batch_size=1) == 1
+        assert search_logger.get_raw_payload(search_id) == self.RESPONSE
+        assert self._count(search_logger, "SELECT COUNT(*) FROM searches WHERE serpapi_response IS NOT NULL") == 0
+
+    def test_purges_payloads_past_retention(self, search_logger):
+        search_id = search_logger.log_search("q", "news", serpapi_response=self.RESPONSE)
+        with search_logger.connection() as conn:
+            conn.execute("UPDATE raw_payloads SET last_seen_at = datetime('now', '-40 days')")
+
+        assert search_logger.purge_raw_payloads(days=30) == 1
+        assert search_logger.get_raw_payload(search_id) is None
+
+
+# ── commentary audio ─────────────────────────────────────────────────────────
+
+
+class TestCommentaryAudio:
+    """Tests for commentary audio stored as content-addressed bytes."""
+
+    AUDIO = b"ID3" + bytes(range(256)) * 8
+
+    def test_cache_round_trip(self, search_logger):
+        audio_id = search_logger.cache_commentary("https://example.com/a", "text", self.AUDIO, "audio/mpeg")
+        assert audio_id == hashlib.sha256(self.AUDIO).hexdigest()
+        assert search_logger.get_cached_commentary("https://example.com/a") == {
+            "text": "text", "audio_id": audio_id, "mime_type": "audio/mpeg",
+        }
+        assert search_logger.get_commentary_audio(audio_id) == (self.AUDIO, "audio/mpeg")
+        assert search_logger.get_commentary_audio("missing") is None
+
+    def test_identical_audio_is_stored_once(self, search_logger):
+        search_logger.cache_commentary("a", "text", self.AUDIO, "audio/mpeg")
+        search_logger.cache_commentary("b", "text", self.AUDIO, "audio/mpeg")
+        with search_logger.connection() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM commentary_audio").fetchone()[0] == 1
+
+    def test_moves_legacy_base64_audio(self, search_logger):
+        with search_logger.connection() as conn:
+            conn.execute(
+                "INSERT INTO cached_commentary (query_hash, query, text, audio_base64, mime_type) VALUES (?, ?, ?, ?, ?)",
+                (hashlib.md5(b"legacy").hexdigest(), "legacy", "text", base64.b64encode(self.AUDIO).decode(), "audio/mp3"),
+            )
+
+        assert search_logger.move_commentary_audio() == 1
+        cached = search_logger.get_cached_commentary("legacy")
+        assert search_logger.get_commentary_audio(cached["audio_id"]) == (self.AUDIO, "audio/mp3")
+        assert search_logger.move_commentary_audio() == 0
+
+
+# ── retention ────────────────────────────────────────────────────────────────
+
+
+class TestRetention:
+    """Tests for maintain_search_history: rollup, batched deletes and incremental vacuum."""
+
+    def _log_old(self, search_logger, count, days_ago=100, results=None):
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(time.time() - days_ago * 86400))
+        search_logger.log_searches([
+            {"query": f"old {i}", "search_type": "news", "timestamp": timestamp,
+             "results": results or [{"title": "A", "category": "politics", "source": "Example"}]}
+            for i in range(count)
+        ])
+
+    def _count(self, search_logger, table):
+        with search_logger.connection() as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def test_rolls_up_and_deletes_in_batches(self, search_logger):
+        self._log_old(search_logger, 5)
+        search_logger.log_search("recent", "news", results=[{"title": "B", "category": "tech", "source": "Example"}])
+        for i in range(3):
+            search_logger.log_request_spans(f"old-{i}", "/api/reactions", "q", {}, 10.0)
+        search_logger.log_request_spans("recent", "/api/reactions", "q", {}, 10.0)
+        with search_logger.connection() as conn:
+            conn.execute("UPDATE request_spans SET created_at = datetime('now', '-100 days') WHERE request_id LIKE 'old-%'")
+        before = (
+            search_logger.get_category_stats(days=365),
+            search_logger.get_source_distribution(days=365),
+            search_logger.get_analytics(days=365)["overall_stats"]["total_searches"],
+        )
+
+        report = search_logger.maintain_search_history(days=90, batch_size=2)
+
+        assert report["searches_deleted"] == 5
+        assert report["results_deleted"] == 5
+        assert report["spans_deleted"] == 3
+        assert self._count(search_logger, "request_spans") == 1
+        assert report["rows_per_second"] > 0
+        assert self._count(search_logger, "searches") == 1
+        assert self._count(search_logger, "search_results") == 1
+        after = (
+            search_logger.get_category_stats(days=365),
+            search_logger.get_source_distribution(days=365),
+            search_logger.get_analytics(days=365)["overall_stats"]["total_searches"],
+        )
+        assert after == before
+
+    def test_first_search_keeps_its_time_until_its_day_is_removed(self, search_logger):
+        today = time.strftime("%Y-%m-%d", time.gmtime())
+        search_logger.log_searches([{"query": "a", "search_type": "news", "timestamp": f"{today} 00:00:05"}])
+
+        def first_search():
+            return search_logger.get_analytics(days=365)["overall_stats"]["first_search"]
+
+        assert first_search() == f"{today} 00:00:05"
+        self._log_old(search_logger, 1)
+        old_day = time.strftime("%Y-%m-%d", time.gmtime(time.time() - 100 * 86400))
+        search_logger.maintain_search_history(days=90)
+        assert first_search() == old_day  # only the rollup's day is left
+
+    def test_rebuild_keeps_rolled_up_days(self, search_logger):
+        self._log_old(search_logger, 3)
+        search_logger.maintain_search_history(days=90)
+        search_logger.rebuild_daily_analytics()
+
+        analytics = search_logger.get_analytics(days=365)
+        assert analytics["overall_stats"]["total_searches"] == 3
+        assert analytics["overall_stats"]["unique_queries"] == 3
+
+    def test_incremental_vacuum_reclaims_space(self, search_logger):
+        self._log_old(search_logger, 200, results=[{"title": "x" * 2000}])
+        report = search_logger.maintain_search_history(days=90)
+        assert report["incremental_vacuum"]
+        assert report["reclaimed_bytes"] > 200 * 2000
+
+    def test_converts_database_without_auto_vacuum(self, tmp_path):
+        db_path = str(tmp_path / "legacy.db")
+        sqlite3.connect(db_path).execute("CREATE TABLE legacy (id INTEGER PRIMARY KEY)").connection.close()
+        search_logger = SearchLogger(db_path=db_path)
+
+        assert not search_logger.maintain_search_history()["incremental_vacuum"]
+        assert search_logger.maintain_search_history(convert=True)["incremental_vacuum"]
+
+    def test_maintenance_claim_runs_once_per_interval(self, search_logger):
+        assert search_logger.get_maintenance_run("search_history") is None
+        assert search_logger.claim_maintenance("search_history", "a", interval=3600)
+        assert not search_logger.claim_maintenance("search_history", "b", interval=3600)  # a is running
+
+        assert search_logger.release_maintenance("search_history", "a")
+        run = search_logger.get_maintenance_run("search_history")
+        assert run["owner"] is None and run["last_run_at"] > time.time() - 5
+        assert not search_logger.claim_maintenance("search_history", "b", interval=3600)  # not due yet
+        assert search_logger.claim_maintenance("search_history", "b", interval=0)
+
+    def test_failed_maintenance_is_retried(self, search_logger):
+        assert search_logger.claim_maintenance("search_history", "a", interval=3600)
+        search_logger.release_maintenance("search_history", "a", completed=False)
+        assert search_logger.get_maintenance_run("search_history")["last_run_at"] is None
+        assert search_logger.claim_maintenance("search_history", "b", interval=3600)
+
+    def test_expired_claim_can_be_taken_over(self, search_logger):
+        assert search_logger.claim_maintenance("search_history", "a", interval=3600, ttl=0)
+        time.sleep(0.01)
+        assert search_logger.claim_maintenance("search_history", "b", interval=3600)
+        assert not search_logger.release_maintenance("search_history", "a")
+
+
+# ── categorized searches ─────────────────────────────────────────────────────
+
+
+class TestCategorizedSearches:
+    """Tests for get_categorized_searches: results per search and keyset paging."""
+
+    def test_results_keep_delimiter_characters(self, search_logger):
+        results = [
+            {"title": "A ||| B", "url": "https://a.example", "summary": "x ::: y", "category": "politics"},
+            {"title": "C", "url": "https://c.example", "summary": None, "category": "tech", "source": "C"},
+            {"title": "D", "url": "https://d.example", "summary": "z", "category": "tech"},
+        ]
+        search_logger.log_search("q", "news", results=results)
+
+        [search] = search_logger.get_categorized_searches(days=1)
+        assert [r["title"] for r in search["results"]] == ["A ||| B", "C", "D"]
+        assert search["results"][0]["snippet"] == "x ::: y"
+        assert search["results"][1]["source"] == "C"
+        assert search["categories"] == {"tech": 2, "politics": 1}
+        assert search["primary_category"] == "tech"
+
+    def test_pages_with_before_id(self, search_logger):
+        ids = [search_logger.log_search(f"q{i}", "news") for i in range(5)]
+
+        first = search_logger.get_categorized_searches(limit=2, days=1)
+        second = search_logger.get_categorized_searches(limit=2, days=1, before_id=first[-1]["id"])
+        last = search_logger.get_categorized_searches(limit=2, days=1, before_id=second[-1]["id"])
+
+        assert [s["id"] for s in first + second + last] == ids[::-1]
+        assert last[0]["results"] == [] and last[0]["primary_category"] == "general"
+        assert search_logger.get_categorized_searches(days=1, before_id=ids[0]) == []
+
+    def test_scan_stops_at_the_window_edge(self, search_logger):
+        old = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(time.time() - 60 * 86400))
+        search_logger.log_searches([{"query": f"old {i}", "search_type": "news", "timestamp": old} for i in range(50)])
+        recent = search_logger.log_search("recent", "news")
+
+        statements = []
+        with search_logger.connection() as conn:
+            conn.set_trace_callback(statements.append)
+            try:
+                assert [s["id"] for s in search_logger.get_categorized_searches(limit=10, days=7)] == [recent]
+            finally:
+                conn.set_trace_callback(None)
+            [sql] = [sql for sql in statements if "FROM searches" in sql]
+            plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+        assert any("rowid>? AND rowid<?" in step for step in plan), plan
+        # The window's first id comes from the timestamp index, not a primary key walk
+        assert "SEARCH searches USING COVERING INDEX idx_searches_timestamp (timestamp>?)" in plan, plan
+
+
+# ── export ───────────────────────────────────────────────────────────────────
+
+
+class TestExport:
+    """Tests for streaming export in date chunks."""
+
+    def _log_days(self, search_logger):
+        search_logger.log_searches([
+            {"query": f"q{day}", "search_type": "news", "timestamp": f"2024-01-0{day} 12:00:00",
+             "results": [{"title": "A, \"quoted\"", "url": "https://a.example"}, {"title": "B"}] if day == 2 else []}
+            for day in (1, 2, 3)
+        ])
+
+    def test_jsonl_streams_every_day_in_order(self, search_logger):
+        self._log_days(search_logger)
+        chunks = list(search_logger.iter_export("jsonl", chunk_days=1))
+        assert [json.loads(line)["query"] for line in chunks] == ["q1", "q2", "q3"]
+
+        rows = [json.loads(line) for line in search_logger.iter_export("jsonl", "2024-01-02", "2024-01-02", include_results=True)]
+        assert [r["title"] for r in rows[0]["results"]] == ['A, "quoted"', "B"]
+
+    def test_csv_with_results_has_a_row_per_result(self, search_logger):
+        self._log_days(search_logger)
+        text = "".join(search_logger.iter_export("csv", include_results=True, chunk_days=2))
+        rows = list(csv.DictReader(io.StringIO(text)))
+        assert [(r["query"], r["result_title"]) for r in rows] == [
+            ("q1", ""), ("q2", 'A, "quoted"'), ("q2", "B"), ("q3", ""),
+        ]
+
+    def test_json_array(self, search_logger):
+        assert json.loads(search_logger.export_data("json")) == []
+        self._log_days(search_logger)
+        assert len(json.loads(search_logger.export_data("json"))) == 3
+
+
+# ── shared archive ───────────────────────────────────────────────────────────
+
+
+class TestSharedArchive:
+    """Tests for archive_entries and keyset-paged get_shared_archive."""
+
+    def test_pages_by_timestamp_and_id(self, search_logger):
+        search_logger.log_searches([
+            {"query": f"https://x.com/{i}", "search_type": "url", "timestamp": f"2024-01-0{1 + i // 2} 00:00:00",
+             "results": [{"title": f"Title {i}", "source": "X"}]}
+            for i in range(5)
+        ] + [{"query": "topic", "search_type": "news"}])
+
+        first = search_logger.get_shared_archive(limit=2)
+        assert [e["url"] for e in first] == ["https://x.com/4", "https://x.com/3"]
+        assert first[0]["title"] == "Title 4" and first[0]["source"] == "X"
+        last = first[-1]
+        rest = search_logger.get_shared_archive(limit=10, before=(last["timestamp"], last["id"]))
+        assert [e["url"] for e in rest] == ["https://x.com/2", "https://x.com/1", "https://x.com/0"]
+
+    def test_untitled_entries_and_retention(self, search_logger):
+        search_logger.log_searches([{"query": "https://x.com/old", "search_type": "url", "timestamp": "2000-01-01 00:00:00"}])
+        search_logger.log_search("https://x.com/new", "url")
+        assert [(e["title"], e["source"]) for e in search_logger.get_shared_archive()] == [("Untitled", "Unknown")] * 2
+
+        search_logger.maintain_search_history(days=30)
+        assert [e["url"] for e in search_logger.get_shared_archive()] == ["https://x.com/new"]
+
+    def test_backfilled_for_existing_url_searches(self, search_logger):
+        search_logger.log_search("https://x.com/a", "url", results=[{"title": "A", "source": "X"}])
+        with search_logger.connection() as conn:
+            conn.execute("DROP TABLE archive_entries")
+            search_logger._migrate_archive_entries(conn.cursor())
+        assert [(e["url"], e["title"]) for e in search_logger.get_shared_archive()] == [("https://x.com/a", "A")]
+
+
+# ── full-text search ─────────────────────────────────────────────────────────
+
+
+class TestSearchHistory:
+    """Tests for the search_fts index and ranked search_history."""
+
+    def test_finds_queries_results_and_cached_titles(self, search_logger):
+        search_id = search_logger.log_search(
+            "climate policy", "news", results=[{"title": "Senate vote", "summary": "Carbon tax debate"}]
+        )
+        search_logger.cache_search("https://x.com/a", {"article": {"title": "Café economics"}, "web": [{"title": "Tariffs"}]})
+
+        assert [(h["kind"], h["search_id"]) for h in search_logger.search_history("climate")] == [("search", search_id)]
+        [hit] = search_logger.search_history("carbon")
+        assert hit["kind"] == "result" and hit["query"] == "climate policy"
+        assert "[Carbon]" in hit["snippet"]
+        assert [h["query"] for h in search_logger.search_history("cafe")] == ["https://x.com/a"]
+        assert search_logger.search_history("tariffs senate") == []  # every word must match
+        assert search_logger.search_history('"; DROP') == []
+
+    def test_index_follows_deletes_and_cache_replacement(self, search_logger):
+        search_logger.cache_search("topic", {"web": [{"title": "Old headline"}]})
+        search_logger.cache_search("topic", {"web": [{"title": "New headline"}]})
+        assert search_logger.search_history("old") == []
+        assert len(search_logger.search_history("headline")) == 1
+
+        search_logger.clear_search_cache("topic")
+        assert search_logger.search_history("headline") == []
+
+    def test_before_and_rebuild(self, search_logger):
+        search_logger.log_searches([
+            {"query": "election", "search_type": "news", "timestamp": "2024-01-01 00:00:00"},
+            {"query": "election", "search_type": "news", "timestamp": "2024-06-01 00:00:00"},
+        ])
+        assert len(search_logger.search_history("election", before="2024-03-01")) == 1
+
+        assert search_logger.rebuild_search_index() == 2
+        assert len(search_logger.search_history("election")) == 2
+
+    def test_latest_first_and_before_bounds_the_walk(self, search_logger):
+        search_logger.log_searches([
+            {"query": f"election {i}", "search_type": "news", "timestamp": f"2024-0{i}-01 00:00:00",
+             "results": [{"title": f"Election result {i}"}]}
+            for i in range(1, 6)
+        ])
+        search_logger.cache_search("election topic", {"web": [{"title": "Election live"}]})
+
+        hits = search_logger.search_history("election", limit=3)
+        assert [(h["kind"], h["query"]) for h in hits] == [
+            ("result", "election 5"), ("search", "election 5"), ("result", "election 4"),
+        ]
+        older = search_logger.search_history("election", limit=10, before="2024-03-15")
+        assert {h["query"] for h in older} == {"election 1", "election 2", "election 3"}
+        assert len(older) == 6
+        with search_logger.connection() as conn:
+            bound = search_logger._fts_rowid_bound(conn.cursor(), "2024-03-15")
+        assert bound == 4 * 4 + 1  # the result row of the first search on or after it
+
+    def test_caching_under_the_canonical_key_drops_the_legacy_entry(self, search_logger):
+        url = "https://www.x.com/a?utm_source=feed"
+        legacy_key = hashlib.md5(url.encode()).hexdigest()
+        with search_logger.connection() as conn:
+            conn.execute(
+                "INSERT INTO cached_searches (query_hash, query, results_json) VALUES (?, ?, ?)",
+                (legacy_key, url, json.dumps({"web": [{"title": "Tariff story"}]})),
+            )
+        search_logger.rebuild_search_index()
+        assert len(search_logger.search_history("tariff")) == 1
+
+        search_logger.cache_search(url, {"web": [{"title": "Tariff story"}]})
+        assert len(search_logger.search_history("tariff")) == 1
+        search_logger.rebuild_search_index()
+        assert len(search_logger.search_history("tariff")) == 1
@@ -0,0 +1,68 @@
+"""Unit tests for api/serpapi.py — pooled SerpAPI client with bounded retries."""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+
+from api import serpapi
+from api.deadline import Deadline, DeadlineExceeded
+
+
+def _response(status=200, data=None, headers=None):
+    response = MagicMock(status_code=status, headers=headers or {})
+    response.json.return_value = data if data is not None else {"organic_results": []}
+    if status >= 400:
+        response.raise_for_status.side_effect = requests.HTTPError(f"{status} error", response=response)
+    return response
+
+
+# ── retries ──────────────────────────────────────────────────────────────────
+
+
+@patch("api.serpapi.time.sleep")
+class TestSearch:
+    """Tests for retry, backoff and error propagation in serpapi.search."""
+
+    def test_retries_transient_failures(self, mock_sleep):
+        with patch.object(serpapi.session, "get", side_effect=[
+            requests.ConnectionError("reset"), _response(503), _response(data={"organic_results": [1]}),
+        ]) as mock_get:
+            assert serpapi.search({"q": "x"}) == {"organic_results": [1]}
+        assert mock_get.call_count == 3
+        assert mock_sleep.call_count == 2
+
+    def test_gives_up_after_bounded_retries(self, mock_sleep):
+        with patch.object(serpapi.session, "get", return_value=_response(502)) as mock_get:
+            with pytest.raises(requests.HTTPError):
+                serpapi.search({"q": "x"})
+        assert mock_get.call_count == serpapi.SERPAPI_RETRIES + 1
+
+    def test_does_not_retry_client_errors(self, mock_sleep):
+        with patch.object(serpapi.session, "get", return_value=_response(401)) as mock_get:
+            with pytest.raises(requests.HTTPError):
+                serpapi.search({"q": "x"})
+        assert mock_get.call_count == 1
+
+    def test_honours_retry_after(self, mock_sleep):
+        with patch.object(serpapi.session, "get", side_effect=[_response(429, headers={"Retry-After": "3"}), _response()]):
+            serpapi.search({"q": "x"})
+        mock_sleep.assert_called_once_with(3)
+
+    def test_no_retry_past_the_deadline(self, mock_sleep):
+        deadline = Deadline(0.05)
+        with patch.object(serpapi.session, "get", return_value=_response(429, headers={"Retry-After": "5"})) as mock_get:
+            with pytest.raises(requests.HTTPError):
+                serpapi.search({"q": "x"}, deadline=deadline)
+        assert mock_get.call_count == 1
+        assert mock_get.call_args[1]["timeout"] <= 0.1
+        with pytest.raises(DeadlineExceeded):
+            serpapi.search({"q": "x"}, deadline=Deadline(0))
+
+    def test_error_bodies_raise_but_no_results_does_not(self, mock_sleep):
+        with patch.object(serpapi.session, "get", return_value=_response(data={"error": "Invalid API key."})):
+            with pytest.raises(serpapi.SerpApiError):
+                serpapi.search({"q": "x"})
+        empty = {"error": "Google hasn't returned any results for this query."}
+        with patch.object(serpapi.session, "get", return_value=_response(data=empty)):
+            assert serpapi.search({"q": "x"}) == empty
@@ -0,0 +1,132 @@
+"""Unit tests for api/singleflight.py — SingleFlight request coalescing."""
+
+import threading
+import time
+
+import pytest
+
+from api.deadline import Deadline, DeadlineExceeded
+from api.search_logger import SearchLogger
+from api.singleflight import SingleFlight
+
+
+@pytest.fixture
+def search_logger(tmp_path):
+    return SearchLogger(db_path=str(tmp_path / "test.db"))
+
+
+class TestSingleFlight:
+    """Tests for in-process and cross-process (lease-based) coalescing."""
+
+    def test_concurrent_identical_queries_run_once(self, search_logger):
+        flight = SingleFlight(search_logger, lease_ttl=5, poll_interval=0.05)
+        calls = []
+        results = []
+
+        def pipeline():
+            calls.append(1)
+            time.sleep(0.2)
+            payload = {"web": [], "reddit": [], "substack": []}
+            search_logger.cache_search("https://x.com/a", payload)
+            return payload
+
+        threads = [
+            threading.Thread(target=lambda: results.append(flight.run("https://x.com/a", pipeline)))
+            for _ in range(5)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert len(calls) == 1
+        assert len(results) == 5
+        assert sum(1 for _, led in results if led) == 1
+
+    def test_follower_reads_cache_written_by_other_worker(self, search_logger):
+        flight = SingleFlight(search_logger, lease_ttl=5, poll_interval=0.05)
+        # Simulate a leader in another process holding the lease
+        assert search_logger.acquire_search_lease("https://x.com/b", "other-worker", ttl=5)
+
+        def other_worker_finishes():
+            time.sleep(0.2)
+            search_logger.cache_search("https://x.com/b", {"web": [{"title": "from leader"}]})
+            search_logger.release_search_lease("https://x.com/b", "other-worker")
+
+        threading.Thread(target=other_worker_finishes).start()
+
+        result, led = flight.run("https://x.com/b", lambda: pytest.fail("should not run pipeline"))
+        assert led is False
+        assert result["web"][0]["title"] == "from leader"
+        assert result["cached"] is True
+
+    def test_takes_over_when_leader_releases_without_caching(self, search_logger):
+        flight = SingleFlight(search_logger, lease_ttl=5, poll_interval=0.05)
+        assert search_logger.acquire_search_lease("https://x.com/c", "other-worker", ttl=5)
+
+        def other_worker_fails():
+            time.sleep(0.1)
+            search_logger.release_search_lease("https://x.com/c", "other-worker")
+
+        threading.Thread(target=other_worker_fails).start()
+
+        result, led = flight.run("https://x.com/c", lambda: {"web": ["mine"]})
+        assert led is True
+        assert result == {"web": ["mine"]}
+
+    def test_expired_lease_can_be_taken_over(self, search_logger):
+        assert search_logger.acquire_search_lease("q", "dead-worker", ttl=-1)
+        assert search_logger.acquire_search_lease("q", "new-worker", ttl=5)
+        assert not search_logger.acquire_search_lease("q", "third-worker", ttl=5)
+
+    def test_followers_elect_a_new_leader_when_the_leader_fails(self, search_logger):
+        flight = SingleFlight(search_logger, lease_ttl=5, poll_interval=0.05)
+        calls = []
+        results = []
+
+        def pipeline():
+            calls.append(1)
+            time.sleep(0.2)
+            if len(calls) == 1:
+                raise RuntimeError("leader failed")
+            return {"web": ["second run"]}
+
+        def request():
+            try:
+                results.append(flight.run("https://x.com/d", pipeline))
+            except RuntimeError:
+                pass
+
+        threads = [threading.Thread(target=request) for _ in range(5)]
+        for t in threads:
+            t.start()
+            time.sleep(0.01)
+        for t in threads:
+            t.join()
+
+        assert len(calls) == 2
+        assert len(results) == 4
+        assert all(result == {"web": ["second run"]} for result, _ in results)
+
+    def test_follower_gives_up_at_its_deadline(self, search_logger):
+        flight = SingleFlight(search_logger, lease_ttl=5, poll_interval=0.05)
+        release = threading.Event()
+        leader = threading.Thread(target=lambda: flight.run("https://x.com/e", lambda: release.wait(5) and {}))
+        leader.start()
+        time.sleep(0.05)
+
+        started = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            flight.run("https://x.com/e", lambda: pytest.fail("should not run pipeline"), deadline=Deadline(0.2))
+        assert time.monotonic() - started < 1
+        release.set()
+        leader.join()
+
+    def test_cross_worker_wait_is_bounded_by_the_deadline(self, search_logger):
+        flight = SingleFlight(search_logger, lease_ttl=5, poll_interval=0.05)
+        assert search_logger.acquire_search_lease("https://x.com/f", "other-worker", ttl=5)
+
+        started = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            flight.run("https://x.com/f", lambda: pytest.fail("should not run pipeline"), deadline=Deadline(0.2))
+        assert time.monotonic() - started < 1
@@ -0,0 +1,57 @@
+"""Unit tests for api/spans.py — span recording, aggregation and Server-Timing."""
+
+import time
+
+import pytest
+
+from api.executor import map_concurrent
+from api.spans import current_trace, end_trace, record, span, start_trace
+
+
+@pytest.fixture
+def trace():
+    trace = start_trace()
+    yield trace
+    end_trace()
+
+
+class TestSpans:
+    """Tests for recording spans into the current trace."""
+
+    def test_span_outside_trace_is_a_noop(self):
+        assert current_trace() is None
+        with span("anything"):
+            pass
+
+    def test_repeated_stages_are_summed(self, trace):
+        for _ in range(3):
+            with span("reddit.comments"):
+                time.sleep(0.01)
+        stage = trace.stages()["reddit.comments"]
+        assert stage["calls"] == 3
+        assert stage["duration_ms"] >= 30
+
+    def test_record_from_start_time(self, trace):
+        started = time.perf_counter()
+        record("reddit.url_search", started)
+        assert "reddit.url_search" in trace.stages()
+
+    def test_spans_in_pool_threads_join_the_trace(self, trace):
+        def fetch(n):
+            with span("io.fetch"):
+                return n
+
+        map_concurrent(fetch, range(4))
+        assert trace.stages()["io.fetch"]["calls"] == 4
+
+    def test_server_timing_header(self, trace):
+        with span("extract"):
+            pass
+        with span("llm.openai"):
+            pass
+        with span("llm.openai"):
+            pass
+        header = trace.server_timing()
+        assert header.startswith("extract;dur=")
+        assert 'llm.openai;dur=' in header and ';desc="x2"' in header
+        assert header.split(", ")[-1].startswith("total;dur=")
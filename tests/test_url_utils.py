@@ -0,0 +1,54 @@
+"""Unit tests for api/url_utils.py — canonicalize_url."""
+
+import pytest
+
+from api.url_utils import canonicalize_url
+
+
+class TestCanonicalizeUrl:
+    """Share-link variants of one article must map to one canonical URL."""
+
+    @pytest.mark.parametrize("variant", [
+        "https://www.x.com/a/",
+        "https://x.com/a?utm_source=tw&utm_medium=social",
+        "https://x.com/a#top",
+        "HTTP://WWW.X.COM/a",
+        "https://x.com:443/a",
+        "https://m.x.com/a",
+        "https://amp.x.com/a",
+        "https://x.com/a/amp/",
+        "https://x.com/a.amp",
+        "https://x.com/a?fbclid=abc123",
+        "https://x.com/a?amp=1",
+    ])
+    def test_variants_collapse(self, variant):
+        assert canonicalize_url(variant) == "https://x.com/a"
+
+    def test_keeps_meaningful_query_params_sorted(self):
+        assert (
+            canonicalize_url("https://x.com/a?p=2&id=9&utm_campaign=z")
+            == "https://x.com/a?id=9&p=2"
+        )
+
+    def test_keeps_path_case(self):
+        assert canonicalize_url("https://X.com/Some/Path") == "https://x.com/Some/Path"
+
+    def test_amp_html_suffix(self):
+        assert canonicalize_url("https://x.com/story.amp.html") == "https://x.com/story.html"
+
+    def test_mobile_subdomain_in_middle(self):
+        assert (
+            canonicalize_url("https://en.m.wikipedia.org/wiki/Iran")
+            == "https://en.wikipedia.org/wiki/Iran"
+        )
+
+    def test_keeps_domain_that_looks_like_a_prefix(self):
+        # "m.com" is a domain in its own right, not a mobile variant
+        assert canonicalize_url("https://m.com/a") == "https://m.com/a"
+
+    def test_non_url_queries_pass_through(self):
+        assert canonicalize_url("  climate policy ") == "climate policy"
+
+    def test_empty(self):
+        assert canonicalize_url("") == ""
+        assert canonicalize_url(None) is None